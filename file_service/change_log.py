@@ -0,0 +1,205 @@
+"""
+Журнал изменений файлов хранилища.
+
+События (created, modified, deleted) получают возрастающий номер и
+дописываются в файл журнала в формате NDJSON. Журнал ограничен
+CHANGE_LOG_MAX_EVENTS событиями: когда текущий сегмент заполняется
+наполовину, он становится предыдущим, а более старый сегмент удаляется.
+
+Курсор клиента имеет вид "<log_id>:<seq>". log_id меняется, если журнал
+начат заново, поэтому клиент с курсором от другого журнала или отставший
+сильнее емкости журнала получает ChangeLogGap и должен перечитать список файлов.
+"""
+
+import bisect
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from itertools import islice
+from operator import itemgetter
+from typing import Callable
+from config import CHANGE_LOG_DIR, CHANGE_LOG_MAX_EVENTS
+from logger import logger
+
+
+_SEQ = itemgetter("seq")
+
+
+class ChangeLogGap(Exception):
+    """События после курсора клиента потеряны или курсор относится к другому журналу."""
+
+
+class ChangeLog:
+    """
+    Ограниченный журнал изменений с копией последних событий в памяти.
+
+    Parameters
+    ----------
+    directory : str
+        Директория файлов журнала.
+    max_events : int
+        Максимальное количество хранимых событий.
+    """
+
+    def __init__(self, directory: str = CHANGE_LOG_DIR, max_events: int = CHANGE_LOG_MAX_EVENTS):
+        self.directory = directory
+        self.max_events = max_events
+        self.segment_events = max(1, max_events // 2)
+
+        self._current_path = os.path.join(directory, "changes.log")
+        self._previous_path = os.path.join(directory, "changes.log.1")
+        self._id_path = os.path.join(directory, "changes.id")
+
+        self._lock = threading.Lock()
+        self._events: deque[dict] = deque(maxlen=max_events)
+        self._listeners: list[Callable[[], None]] = []
+        self._segment_size = 0
+        self._file = None
+
+        self.log_id = ""
+        self.last_seq = 0
+
+    def open(self, resume: bool = True):
+        """
+        Открывает журнал, загружая сохраненные события.
+
+        Parameters
+        ----------
+        resume : bool
+            Продолжить существующий журнал. Если False (или журнала нет),
+            журнал начинается заново с новым log_id.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+
+        if resume and os.path.exists(self._id_path):
+            with open(self._id_path, encoding="utf-8") as f:
+                self.log_id = f.read().strip()
+            for path in (self._previous_path, self._current_path):
+                self._load_segment(path)
+        else:
+            for path in (self._previous_path, self._current_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self.log_id = uuid.uuid4().hex[:12]
+            with open(self._id_path, "w", encoding="utf-8") as f:
+                f.write(self.log_id)
+
+        if self._events:
+            self.last_seq = self._events[-1]["seq"]
+        self._file = open(self._current_path, "a", encoding="utf-8")
+        logger.info(
+            f"Change log {self.log_id} opened: {len(self._events)} events, last seq {self.last_seq}"
+        )
+
+    def _load_segment(self, path: str):
+        if not os.path.exists(path):
+            return
+        count = 0
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                    if not isinstance(event.get("seq"), int):
+                        raise ValueError("missing seq")
+                except (ValueError, AttributeError):
+                    # Недописанная строка после аварийной остановки; номера
+                    # событий после нее идут с пропуском
+                    logger.warning(f"Skipping corrupted change log line in {path}")
+                    continue
+                self._events.append(event)
+                count += 1
+        if path == self._current_path:
+            self._segment_size = count
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    def add_listener(self, callback: Callable[[], None]):
+        """Регистрирует функцию, вызываемую после записи новых событий."""
+        self._listeners.append(callback)
+
+    def append(self, changes: list[tuple[str, str]]):
+        """
+        Записывает пачку изменений.
+
+        Parameters
+        ----------
+        changes : list[tuple[str, str]]
+            Пары (тип события, имя файла).
+        """
+        if not changes:
+            return
+        now = round(time.time(), 3)
+        with self._lock:
+            lines = []
+            for kind, name in changes:
+                self.last_seq += 1
+                event = {"seq": self.last_seq, "type": kind, "name": name, "ts": now}
+                self._events.append(event)
+                lines.append(json.dumps(event, ensure_ascii=False) + "\n")
+            self._file.writelines(lines)
+            self._file.flush()
+            self._segment_size += len(lines)
+            if self._segment_size >= self.segment_events:
+                self._rotate()
+
+        for callback in self._listeners:
+            callback()
+
+    def _rotate(self):
+        self._file.close()
+        os.replace(self._current_path, self._previous_path)
+        self._file = open(self._current_path, "a", encoding="utf-8")
+        self._segment_size = 0
+
+    def cursor(self, seq: int | None = None) -> str:
+        return f"{self.log_id}:{self.last_seq if seq is None else seq}"
+
+    def read(self, cursor: str, limit: int) -> tuple[list[dict], str]:
+        """
+        Возвращает события после курсора.
+
+        Parameters
+        ----------
+        cursor : str
+            Курсор из предыдущего ответа.
+        limit : int
+            Максимальное количество событий.
+
+        Returns
+        -------
+        tuple[list[dict], str]
+            События и курсор для следующего запроса.
+
+        Raises
+        ------
+        ChangeLogGap
+            Если курсор от другого журнала или часть событий уже вытеснена.
+        ValueError
+            Если курсор поврежден.
+        """
+        log_id, _, seq = cursor.partition(":")
+        if not seq.isdigit():
+            raise ValueError(f"Invalid cursor: {cursor}")
+        since = int(seq)
+
+        with self._lock:
+            if log_id != self.log_id or since > self.last_seq:
+                raise ChangeLogGap("Cursor belongs to another change log")
+            oldest = self._events[0]["seq"] if self._events else self.last_seq + 1
+            if since < oldest - 1:
+                raise ChangeLogGap("Events after the cursor were evicted")
+
+            # Поиск по номеру, а не по позиции: пропущенные при загрузке
+            # поврежденные строки оставляют пропуски в номерах
+            start = bisect.bisect_right(self._events, since, key=_SEQ)
+            events = list(islice(self._events, start, start + limit))
+
+        next_seq = events[-1]["seq"] if events else since
+        return events, self.cursor(next_seq)
@@ -7,3 +7,47 @@
 import os
 
 BASE_DIR = os.getenv("FILES_BASE_DIR", "/storage")
+
+# Размер блока при отдаче файла (если сервер не поддерживает отправку файла без копирования)
+FILE_STREAM_BLOCK_SIZE = int(os.getenv("FILE_STREAM_BLOCK_SIZE", 64 * 1024))
+
+# Пакетная выдача файлов (POST /files/batch): файлы крупнее порога
+# не встраиваются в ответ, клиент читает их отдельно через /file/{name}/stream
+FILE_BATCH_MAX_INLINE_BYTES = int(os.getenv("FILE_BATCH_MAX_INLINE_BYTES", 1024 * 1024))
+FILE_BATCH_MAX_FILES = int(os.getenv("FILE_BATCH_MAX_FILES", 1000))
+
+# Постраничный список файлов (GET /files/list)
+FILE_LIST_PAGE_SIZE = int(os.getenv("FILE_LIST_PAGE_SIZE", 1000))
+FILE_LIST_MAX_PAGE_SIZE = int(os.getenv("FILE_LIST_MAX_PAGE_SIZE", 10000))
+
+# Кэш etag: пересчитывается, только если изменились inode, размер или mtime файла
+FILE_ETAG_CACHE_SIZE = int(os.getenv("FILE_ETAG_CACHE_SIZE", 1_000_000))
+
+# Журнал изменений хранилища (GET /changes)
+CHANGE_FEED_ENABLED = os.getenv("CHANGE_FEED_ENABLED", "true").lower() == "true"
+CHANGE_LOG_DIR = os.getenv("CHANGE_LOG_DIR", "/var/lib/file_service")
+CHANGE_LOG_MAX_EVENTS = int(os.getenv("CHANGE_LOG_MAX_EVENTS", 100_000))
+# Источник изменений: auto (inotify, если доступен), inotify или poll
+CHANGE_WATCHER = os.getenv("CHANGE_WATCHER", "auto")
+CHANGE_POLL_INTERVAL = float(os.getenv("CHANGE_POLL_INTERVAL", 2.0))
+CHANGE_RESYNC_INTERVAL = float(os.getenv("CHANGE_RESYNC_INTERVAL", 300.0))
+CHANGE_DEBOUNCE = float(os.getenv("CHANGE_DEBOUNCE", 0.2))
+CHANGES_PAGE_SIZE = int(os.getenv("CHANGES_PAGE_SIZE", 1000))
+# Максимальное время ожидания новых событий при long-poll (сек)
+CHANGES_MAX_WAIT = float(os.getenv("CHANGES_MAX_WAIT", 30.0))
+
+# Кэш содержимого файлов в памяти: общий объем и максимальный размер файла (байты)
+FILE_CACHE_MAX_BYTES = int(os.getenv("FILE_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+FILE_CACHE_MAX_ENTRY_BYTES = int(os.getenv("FILE_CACHE_MAX_ENTRY_BYTES", 4 * 1024 * 1024))
+# Хранить сжатые представления файлов (отдаются клиентам с Accept-Encoding)
+FILE_CACHE_COMPRESSED = os.getenv("FILE_CACHE_COMPRESSED", "true").lower() == "true"
+
+# Сжатие ответов (gzip, zstd): файлы меньше порога отдаются без сжатия
+FILE_COMPRESS_MIN_BYTES = int(os.getenv("FILE_COMPRESS_MIN_BYTES", 1024))
+FILE_GZIP_LEVEL = int(os.getenv("FILE_GZIP_LEVEL", 6))
+FILE_ZSTD_LEVEL = int(os.getenv("FILE_ZSTD_LEVEL", 3))
+# Сжатые представления крупных файлов, запрошенных не меньше
+# FILE_COMPRESSED_HOT_REQUESTS раз, хранятся в памяти
+FILE_COMPRESSED_CACHE_MAX_BYTES = int(os.getenv("FILE_COMPRESSED_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+FILE_COMPRESSED_CACHE_MAX_ENTRY_BYTES = int(os.getenv("FILE_COMPRESSED_CACHE_MAX_ENTRY_BYTES", 32 * 1024 * 1024))
+FILE_COMPRESSED_HOT_REQUESTS = int(os.getenv("FILE_COMPRESSED_HOT_REQUESTS", 2))
@@ -0,0 +1,312 @@
+"""
+Кэш содержимого файлов в памяти.
+
+Часто запрашиваемые небольшие файлы (повторные индексации, несколько реплик
+indexer_service) отдаются из памяти без чтения с диска. Объем кэша ограничен
+в байтах; вытесняются давно не использованные файлы. Запись действительна,
+пока у файла не изменились inode, размер и mtime.
+
+Для каждого файла лениво, при первом обращении, сохраняются декодированный
+текст и сжатые представления (gzip, zstd), поэтому повторные запросы
+не декодируют и не сжимают файл заново.
+
+Крупные файлы в кэш содержимого не попадают; для часто запрашиваемых из них
+отдельно хранятся только сжатые представления (CompressedCache).
+"""
+
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+from config import (
+    FILE_CACHE_MAX_BYTES,
+    FILE_CACHE_MAX_ENTRY_BYTES,
+    FILE_CACHE_COMPRESSED,
+    FILE_COMPRESSED_CACHE_MAX_BYTES,
+    FILE_COMPRESSED_CACHE_MAX_ENTRY_BYTES,
+    FILE_COMPRESSED_HOT_REQUESTS,
+)
+from http_compression import compress
+
+
+class CacheEntry:
+    """Содержимое одной версии файла."""
+
+    __slots__ = ("path", "version", "data", "etag", "text", "variants", "size")
+
+    def __init__(self, path: str, version: tuple, data: bytes):
+        self.path = path
+        self.version = version
+        self.data = data
+        self.etag = hashlib.sha256(data).hexdigest()
+        self.text: str | None = None
+        self.variants: dict[str, bytes] = {}
+        self.size = len(data)
+
+
+class ContentCache:
+    """
+    LRU-кэш содержимого файлов, ограниченный по объему.
+
+    Parameters
+    ----------
+    max_bytes : int
+        Максимальный суммарный объем записей (байты, текст и сжатые представления).
+    max_entry_bytes : int
+        Файлы большего размера не кэшируются.
+    compressed : bool
+        Хранить сжатые представления файлов.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = FILE_CACHE_MAX_BYTES,
+        max_entry_bytes: int = FILE_CACHE_MAX_ENTRY_BYTES,
+        compressed: bool = FILE_CACHE_COMPRESSED,
+    ):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = min(max_entry_bytes, max_bytes)
+        self.compressed = compressed
+
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def version(stat: os.stat_result) -> tuple:
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def cacheable(self, stat: os.stat_result) -> bool:
+        return 0 < self.max_bytes and stat.st_size <= self.max_entry_bytes
+
+    def load(self, path: str, stat: os.stat_result) -> CacheEntry | None:
+        """
+        Возвращает содержимое файла из кэша или читает его с диска.
+
+        Parameters
+        ----------
+        path : str
+            Абсолютный путь файла.
+        stat : os.stat_result
+            Результат stat файла, по которому проверяется актуальность записи.
+
+        Returns
+        -------
+        CacheEntry | None
+            Запись или None, если файл слишком велик для кэша.
+        """
+        if not self.cacheable(stat):
+            return None
+
+        version = self.version(stat)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.version == version:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        with open(path, "rb") as f:
+            data = f.read()
+        entry = CacheEntry(path, version, data)
+        # Файл изменился между stat и чтением: отдаем прочитанное, но не кэшируем
+        if len(data) == stat.st_size:
+            self._insert(path, entry)
+        return entry
+
+    def text(self, entry: CacheEntry) -> str:
+        """
+        Возвращает содержимое записи как текст UTF-8.
+
+        Raises
+        ------
+        UnicodeDecodeError
+            Если файл не в кодировке UTF-8.
+        """
+        if entry.text is None:
+            text = entry.data.decode("utf-8")
+            self._grow(entry, "text", text, sys.getsizeof(text))
+        return entry.text
+
+    def variant(self, entry: CacheEntry, encoding: str) -> bytes:
+        """
+        Возвращает сжатое представление записи.
+
+        Представление сохраняется в записи, если включено хранение сжатых представлений.
+        """
+        variant = entry.variants.get(encoding)
+        if variant is None:
+            variant = compress(entry.data, encoding)
+            if self.compressed:
+                self._grow(entry, encoding, variant, len(variant))
+        return variant
+
+    def _insert(self, path: str, entry: CacheEntry):
+        with self._lock:
+            previous = self._entries.pop(path, None)
+            if previous is not None:
+                self.bytes -= previous.size
+            self._entries[path] = entry
+            self.bytes += entry.size
+            self._evict()
+
+    def _grow(self, entry: CacheEntry, kind: str, value, size: int):
+        """Сохраняет в записи производное представление и учитывает его объем."""
+        with self._lock:
+            if kind == "text":
+                if entry.text is not None:
+                    return
+                entry.text = value
+            else:
+                if kind in entry.variants:
+                    return
+                entry.variants[kind] = value
+            entry.size += size
+            # Запись могла быть вытеснена, пока представление вычислялось
+            if self._entries.get(entry.path) is entry:
+                self.bytes += size
+                self._evict()
+
+    def _evict(self):
+        while self.bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= evicted.size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        """
+        Возвращает статистику кэша.
+
+        Returns
+        -------
+        dict
+            Попадания, промахи, доля попаданий, количество записей,
+            занятый и максимальный объем, вытеснения.
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+                "compressed": self.compressed,
+            }
+
+
+class CompressedCache:
+    """
+    LRU-кэш сжатых представлений крупных файлов, ограниченный по объему.
+
+    Считает сжатые запросы каждого файла и разрешает сохранить представление
+    только после FILE_COMPRESSED_HOT_REQUESTS запросов, чтобы однократно
+    прочитанные файлы не вытесняли часто запрашиваемые.
+
+    Parameters
+    ----------
+    max_bytes : int
+        Максимальный суммарный объем сжатых представлений.
+    max_entry_bytes : int
+        Представления большего размера не сохраняются.
+    hot_requests : int
+        Сколько запросов файла нужно, чтобы сохранить его представление.
+    """
+
+    # Сколько файлов помнит счетчик запросов
+    MAX_TRACKED = 100_000
+
+    def __init__(
+        self,
+        max_bytes: int = FILE_COMPRESSED_CACHE_MAX_BYTES,
+        max_entry_bytes: int = FILE_COMPRESSED_CACHE_MAX_ENTRY_BYTES,
+        hot_requests: int = FILE_COMPRESSED_HOT_REQUESTS,
+    ):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = min(max_entry_bytes, max_bytes)
+        self.hot_requests = hot_requests
+
+        self._entries: OrderedDict[tuple[str, str], tuple[tuple, bytes]] = OrderedDict()
+        self._requests: OrderedDict[str, tuple[tuple, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, path: str, stat: os.stat_result, encoding: str) -> bytes | None:
+        """
+        Возвращает сохраненное сжатое представление или регистрирует промах.
+
+        Returns
+        -------
+        bytes | None
+            Сжатые байты или None; после промаха should_store() сообщает,
+            стоит ли сохранить представление, сжатое при отдаче.
+        """
+        version = ContentCache.version(stat)
+        with self._lock:
+            cached = self._entries.get((path, encoding))
+            if cached is not None and cached[0] == version:
+                self._entries.move_to_end((path, encoding))
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+            previous = self._requests.pop(path, None)
+            count = previous[1] + 1 if previous and previous[0] == version else 1
+            self._requests[path] = (version, count)
+            while len(self._requests) > self.MAX_TRACKED:
+                self._requests.popitem(last=False)
+        return None
+
+    def should_store(self, path: str, stat: os.stat_result) -> bool:
+        with self._lock:
+            tracked = self._requests.get(path)
+        return (
+            self.max_bytes > 0
+            and tracked is not None
+            and tracked[0] == ContentCache.version(stat)
+            and tracked[1] >= self.hot_requests
+        )
+
+    def put(self, path: str, stat: os.stat_result, encoding: str, data: bytes):
+        if len(data) > self.max_entry_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop((path, encoding), None)
+            if previous is not None:
+                self.bytes -= len(previous[1])
+            self._entries[(path, encoding)] = (ContentCache.version(stat), data)
+            self.bytes += len(data)
+            while self.bytes > self.max_bytes and self._entries:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= len(evicted)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        """Возвращает статистику в том же формате, что и ContentCache.stats()."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+            }
+
+
+content_cache = ContentCache()
+compressed_cache = CompressedCache()
@@ -1,12 +1,219 @@
 """
 Предоставляет функции для получения списка и чтения файлов из папки хранилища.
+
+Имена файлов - пути относительно BASE_DIR с разделителем "/", поэтому
+файлы во вложенных директориях адресуются так же, как в корне.
 """
 
+import base64
+import fnmatch
+import hashlib
+import itertools
 import os
-from config import BASE_DIR
+import threading
+from collections import OrderedDict
+from typing import Iterator
+from config import (
+    BASE_DIR,
+    FILE_BATCH_MAX_INLINE_BYTES,
+    FILE_LIST_PAGE_SIZE,
+    FILE_ETAG_CACHE_SIZE,
+)
+from content_cache import CacheEntry, ContentCache, content_cache
 from logger import logger
 
 
+class InvalidPathError(ValueError):
+    """Имя файла указывает за пределы хранилища."""
+
+
+def resolve_path(name: str) -> str:
+    """
+    Возвращает абсолютный путь файла хранилища.
+
+    Parameters
+    ----------
+    name : str
+        Имя файла относительно BASE_DIR.
+
+    Returns
+    -------
+    str
+        Путь внутри BASE_DIR.
+
+    Raises
+    ------
+    InvalidPathError
+        Если путь (в том числе через "..", абсолютный путь или симлинк) выходит за BASE_DIR.
+    """
+    base = os.path.realpath(BASE_DIR)
+    path = os.path.realpath(os.path.join(base, name))
+    if path == base or os.path.commonpath([base, path]) != base:
+        raise InvalidPathError(f"Invalid file name: {name}")
+    return path
+
+
+class EtagCache:
+    """
+    LRU-кэш etag файлов.
+
+    Запись действительна, пока у файла не изменились inode, размер и mtime,
+    поэтому содержимое неизменившихся файлов повторно не хэшируется.
+    """
+
+    def __init__(self, max_entries: int = FILE_ETAG_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[tuple, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _version(stat: os.stat_result) -> tuple:
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def get(self, path: str, stat: os.stat_result) -> str | None:
+        with self._lock:
+            cached = self._entries.get(path)
+            if cached is None or cached[0] != self._version(stat):
+                return None
+            self._entries.move_to_end(path)
+            return cached[1]
+
+    def put(self, path: str, stat: os.stat_result, etag: str):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[path] = (self._version(stat), etag)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+etag_cache = EtagCache()
+
+
+def file_etag(path: str, stat: os.stat_result) -> str:
+    """Возвращает sha256 содержимого файла, используя кэш etag."""
+    etag = etag_cache.get(path, stat)
+    if etag is None:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        etag = digest.hexdigest()
+        etag_cache.put(path, stat, etag)
+    return etag
+
+
+def _walk(directory: str, prefix: str, recursive: bool, after: str | None) -> Iterator[tuple[str, os.DirEntry]]:
+    """
+    Обходит директорию в лексикографическом порядке относительных путей.
+
+    Директории сортируются по имени с завершающим "/", поэтому порядок обхода
+    в глубину совпадает с порядком сортировки полных путей. Это позволяет
+    продолжить обход с курсора, пропуская целые поддеревья, лежащие до него.
+    Симлинки пропускаются.
+    """
+    try:
+        with os.scandir(directory) as it:
+            entries = []
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    entries.append((entry.name + "/", entry, True))
+                elif entry.is_file(follow_symlinks=False):
+                    entries.append((entry.name, entry, False))
+    except OSError as e:
+        logger.error(f"Failed to list {directory}: {e}")
+        return
+
+    entries.sort(key=lambda item: item[0])
+    for key, entry, is_dir in entries:
+        path = prefix + key
+        if is_dir:
+            if not recursive:
+                continue
+            if after is not None and path < after and not after.startswith(path):
+                continue
+            yield from _walk(entry.path, path, recursive, after)
+        elif after is None or path > after:
+            yield path, entry
+
+
+def encode_cursor(name: str) -> str:
+    return base64.urlsafe_b64encode(name.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> str:
+    """
+    Raises
+    ------
+    ValueError
+        Если курсор поврежден.
+    """
+    try:
+        name = base64.b64decode(cursor.encode("ascii"), altchars=b"-_", validate=True).decode("utf-8")
+    except (ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not name:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return name
+
+
+def list_files_page(
+    cursor: str | None = None,
+    limit: int = FILE_LIST_PAGE_SIZE,
+    recursive: bool = True,
+    with_etag: bool = True,
+) -> dict:
+    """
+    Возвращает страницу списка файлов хранилища с метаданными.
+
+    Обход идет через os.scandir, поэтому размер и тип файла берутся из
+    записей директории без отдельного открытия файлов; etag считается
+    только для файлов, которые изменились с прошлого вычисления.
+
+    Parameters
+    ----------
+    cursor : str, optional
+        Курсор из next_cursor предыдущей страницы.
+    limit : int
+        Максимальное количество файлов на странице.
+    recursive : bool
+        Обходить вложенные директории.
+    with_etag : bool
+        Добавлять etag (sha256 содержимого) к каждому файлу.
+
+    Returns
+    -------
+    dict
+        {"files": [{"name", "size", "mtime", "etag"}, ...], "next_cursor": str | None}.
+
+    Raises
+    ------
+    ValueError
+        Если курсор поврежден.
+    """
+    after = decode_cursor(cursor) if cursor else None
+    base = os.path.realpath(BASE_DIR)
+    # Одна лишняя запись показывает, есть ли следующая страница
+    entries = list(itertools.islice(_walk(base, "", recursive, after), limit + 1))
+
+    files = []
+    for name, entry in entries[:limit]:
+        try:
+            stat = entry.stat(follow_symlinks=False)
+            item = {"name": name, "size": stat.st_size, "mtime": stat.st_mtime}
+            if with_etag:
+                item["etag"] = file_etag(entry.path, stat)
+        except OSError as e:
+            # Файл удален или недоступен во время обхода
+            logger.warning(f"Skipping {entry.path}: {e}")
+            continue
+        files.append(item)
+
+    next_cursor = encode_cursor(entries[limit - 1][0]) if len(entries) > limit else None
+    return {"files": files, "next_cursor": next_cursor}
+
+
 def list_available_files() -> list:
     """
     Возвращает список всех доступных файлов в директории хранилища.
@@ -14,10 +221,10 @@ def list_available_files() -> list:
     Returns
     -------
     list
-        Список имен файлов, находящихся в BASE_DIR.
+        Имена файлов BASE_DIR и вложенных директорий (без самих директорий).
     """
     logger.info(f"Listing files in {BASE_DIR}")
-    return os.listdir(BASE_DIR)
+    return [name for name, _ in _walk(os.path.realpath(BASE_DIR), "", True, None)]
 
 
 def read_file(name: str) -> str:
@@ -38,9 +245,166 @@ def read_file(name: str) -> str:
     ------
     FileNotFoundError
         Если файл не существует.
+    InvalidPathError
+        Если имя указывает за пределы хранилища.
     """
-    path = os.path.join(BASE_DIR, name)
+    path = resolve_path(name)
     logger.info(f"Reading file: {path}")
 
+    entry = content_cache.load(path, os.stat(path))
+    if entry is not None:
+        return content_cache.text(entry)
     with open(path, "r", encoding="utf-8") as f:
         return f.read()
+
+
+def load_content(path: str, stat: os.stat_result) -> CacheEntry:
+    """
+    Возвращает содержимое файла через кэш содержимого.
+
+    Файлы, не помещающиеся в кэш, читаются с диска без сохранения.
+    etag содержимого запоминается в кэше etag.
+    """
+    entry = content_cache.load(path, stat)
+    if entry is None:
+        with open(path, "rb") as f:
+            entry = CacheEntry(path, ContentCache.version(stat), f.read())
+    if len(entry.data) == stat.st_size:
+        etag_cache.put(path, stat, entry.etag)
+    return entry
+
+
+def file_info(name: str) -> tuple[str, os.stat_result, str, CacheEntry | None]:
+    """
+    Возвращает путь, stat, etag и содержимое из кэша для отдачи файла.
+
+    Parameters
+    ----------
+    name : str
+        Имя файла.
+
+    Returns
+    -------
+    tuple[str, os.stat_result, str, CacheEntry | None]
+        Абсолютный путь, результат stat, etag (sha256 содержимого) и запись
+        кэша содержимого (None для файлов, не помещающихся в кэш).
+
+    Raises
+    ------
+    FileNotFoundError
+        Если файл не существует.
+    IsADirectoryError
+        Если имя указывает на директорию.
+    InvalidPathError
+        Если имя указывает за пределы хранилища.
+    """
+    path = resolve_path(name)
+    stat = os.stat(path)
+    if not os.path.isfile(path):
+        raise IsADirectoryError(path)
+    if content_cache.cacheable(stat):
+        # Небольшой файл читается в кэш содержимого, etag считается по прочитанному
+        entry = load_content(path, stat)
+        return path, stat, entry.etag, entry
+    return path, stat, file_etag(path, stat), None
+
+
+def file_metadata(name: str) -> dict:
+    """
+    Возвращает метаданные файла: размер, время изменения и хэш содержимого.
+
+    Хэш берется из кэша etag, если файл не менялся с прошлого вычисления.
+
+    Parameters
+    ----------
+    name : str
+        Имя файла.
+
+    Returns
+    -------
+    dict
+        {"name": ..., "size": ..., "mtime": ..., "etag": sha256 содержимого}.
+
+    Raises
+    ------
+    FileNotFoundError
+        Если файл не существует.
+    InvalidPathError
+        Если имя указывает за пределы хранилища.
+    """
+    path = resolve_path(name)
+    stat = os.stat(path)
+    return {
+        "name": name,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "etag": file_etag(path, stat),
+    }
+
+
+def select_files(names: list[str] | None = None, pattern: str | None = None) -> list[str]:
+    """
+    Выбирает файлы для пакетной выдачи по списку имен и/или glob-шаблону.
+
+    Parameters
+    ----------
+    names : list[str], optional
+        Явно перечисленные имена файлов.
+    pattern : str, optional
+        Glob-шаблон, применяемый к списку файлов хранилища.
+
+    Returns
+    -------
+    list[str]
+        Имена файлов без повторов в порядке перечисления.
+    """
+    selected = list(names or [])
+    if pattern:
+        selected += sorted(fnmatch.filter(list_available_files(), pattern))
+    return list(dict.fromkeys(selected))
+
+
+def iter_file_records(
+    names: list[str], max_inline_bytes: int = FILE_BATCH_MAX_INLINE_BYTES
+) -> Iterator[dict]:
+    """
+    Последовательно читает файлы и возвращает записи с метаданными и содержимым.
+
+    Файл читается один раз: etag считается по уже прочитанным байтам.
+
+    Parameters
+    ----------
+    names : list[str]
+        Имена файлов.
+    max_inline_bytes : int
+        Файлы большего размера возвращаются без содержимого (content = None,
+        inline = False), чтобы не держать их в памяти целиком.
+
+    Returns
+    -------
+    Iterator[dict]
+        {"name", "size", "mtime", "etag", "inline", "content"} для каждого файла
+        или {"name", "error"}, если файл не удалось прочитать.
+    """
+    for name in names:
+        try:
+            path = resolve_path(name)
+            stat = os.stat(path)
+            if stat.st_size > max_inline_bytes:
+                yield {**file_metadata(name), "inline": False, "content": None}
+                continue
+
+            entry = load_content(path, stat)
+            yield {
+                "name": name,
+                "size": len(entry.data),
+                "mtime": stat.st_mtime,
+                "etag": entry.etag,
+                "inline": True,
+                "content": content_cache.text(entry),
+            }
+        except FileNotFoundError:
+            yield {"name": name, "error": "not_found"}
+        except (OSError, UnicodeDecodeError, InvalidPathError) as e:
+            logger.error(f"Failed to read {name}: {e}")
+            yield {"name": name, "error": str(e)}
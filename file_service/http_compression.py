@@ -0,0 +1,97 @@
+"""
+Сжатие ответов file_service по Accept-Encoding.
+
+Поддерживаются gzip и zstd. zstd доступен, если установлен модуль
+compression.zstd (Python 3.14+) или пакет backports.zstd - тот же, которым
+urllib3 распаковывает ответы на стороне клиента. При равном q в Accept-Encoding
+предпочитается zstd: он быстрее сжимает и распаковывает при сопоставимой степени сжатия.
+"""
+
+import gzip
+import zlib
+from typing import Iterable, Iterator
+from config import FILE_GZIP_LEVEL, FILE_ZSTD_LEVEL
+
+try:
+    from compression import zstd
+except ImportError:
+    try:
+        from backports import zstd
+    except ImportError:
+        zstd = None
+
+# Кодировки в порядке предпочтения сервера
+ENCODINGS = ("zstd", "gzip") if zstd is not None else ("gzip",)
+
+
+def negotiate(accept_encoding: str | None) -> str | None:
+    """
+    Выбирает кодировку ответа по заголовку Accept-Encoding.
+
+    Parameters
+    ----------
+    accept_encoding : str, optional
+        Значение заголовка.
+
+    Returns
+    -------
+    str | None
+        "zstd", "gzip" или None, если клиент не принимает ни одну из них.
+    """
+    weights: dict[str, float] = {}
+    for item in (accept_encoding or "").split(","):
+        encoding, *params = (part.strip() for part in item.split(";"))
+        if not encoding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[encoding.lower()] = q
+
+    best, best_q = None, 0.0
+    for encoding in ENCODINGS:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """Сжимает данные целиком."""
+    if encoding == "zstd":
+        return zstd.compress(data, level=FILE_ZSTD_LEVEL)
+    return gzip.compress(data, compresslevel=FILE_GZIP_LEVEL, mtime=0)
+
+
+def compress_stream(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    """
+    Сжимает поток блоков, не накапливая его в памяти.
+
+    Parameters
+    ----------
+    chunks : Iterable[bytes]
+        Исходные блоки.
+    encoding : str
+        "zstd" или "gzip".
+
+    Returns
+    -------
+    Iterator[bytes]
+        Сжатые блоки (пустые блоки не возвращаются).
+    """
+    if encoding == "zstd":
+        compressor = zstd.ZstdCompressor(level=FILE_ZSTD_LEVEL)
+    else:
+        # wbits=31: формат gzip (заголовок и контрольная сумма)
+        compressor = zlib.compressobj(FILE_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    for chunk in chunks:
+        if out := compressor.compress(chunk):
+            yield out
+    if out := compressor.flush():
+        yield out
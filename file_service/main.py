@@ -4,18 +4,190 @@
 Предоставляет эндпоинты для получения списка файлов и их содержимого.
 """
 
-from fastapi import FastAPI, HTTPException
-from file_reader import list_available_files, read_file
+import asyncio
+import json
+import time
+from typing import Literal
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse, JSONResponse, FileResponse
+from pydantic import BaseModel
+from config import (
+    FILE_BATCH_MAX_FILES,
+    FILE_LIST_PAGE_SIZE,
+    FILE_LIST_MAX_PAGE_SIZE,
+    FILE_STREAM_BLOCK_SIZE,
+    FILE_COMPRESS_MIN_BYTES,
+    CHANGE_FEED_ENABLED,
+    CHANGES_PAGE_SIZE,
+    CHANGES_MAX_WAIT,
+)
+from change_log import ChangeLog, ChangeLogGap
+from http_compression import negotiate, compress_stream
+from content_cache import content_cache, compressed_cache
+from watcher import StorageWatcher
+from file_reader import (
+    InvalidPathError,
+    list_available_files,
+    list_files_page,
+    read_file,
+    file_metadata,
+    file_info,
+    select_files,
+    iter_file_records,
+)
 from logger import logger
 
 app = FastAPI(title="File Service")
 
+change_log = ChangeLog()
+watcher = StorageWatcher(change_log) if CHANGE_FEED_ENABLED else None
+
+
+class ChangeNotifier:
+    """Будит запросы /changes, ожидающие новых событий (long-poll)."""
+
+    def __init__(self):
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._waiters: set[asyncio.Future] = set()
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+
+    def notify(self):
+        """Вызывается из потока наблюдателя после записи событий."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        self._waiters.clear()
+
+    def waiter(self) -> asyncio.Future:
+        waiter = self._loop.create_future()
+        self._waiters.add(waiter)
+        return waiter
+
+    def discard(self, waiter: asyncio.Future):
+        self._waiters.discard(waiter)
+
+
+notifier = ChangeNotifier()
+
 
 @app.on_event("startup")
 async def startup():
+    if watcher:
+        notifier.bind(asyncio.get_running_loop())
+        change_log.add_listener(notifier.notify)
+        watcher.start()
     logger.info("File service started.")
 
 
+@app.on_event("shutdown")
+def shutdown():
+    if watcher:
+        watcher.stop()
+
+
+@app.exception_handler(InvalidPathError)
+async def invalid_path_handler(request: Request, exc: InvalidPathError):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Проверяет, есть ли etag среди перечисленных в If-None-Match (слабое сравнение)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip().removeprefix("W/").strip('"') for tag in if_none_match.split(","))
+    return etag in candidates
+
+
+def _read_blocks(path: str):
+    with open(path, "rb") as f:
+        while block := f.read(FILE_STREAM_BLOCK_SIZE):
+            yield block
+
+
+def _compressed_file(path: str, stat, encoding: str):
+    """
+    Сжимает файл потоком при отдаче.
+
+    Если файл часто запрашивается, сжатый результат сохраняется
+    в compressed_cache, и следующие запросы его не сжимают.
+    """
+    store = compressed_cache.should_store(path, stat)
+    parts, size, read = [], 0, 0
+
+    def counted(blocks):
+        nonlocal read
+        for block in blocks:
+            read += len(block)
+            yield block
+
+    for out in compress_stream(counted(_read_blocks(path)), encoding):
+        if store:
+            size += len(out)
+            if size <= compressed_cache.max_entry_bytes:
+                parts.append(out)
+            else:
+                store, parts = False, []
+        yield out
+    # Файл изменился во время чтения: отданное не сохраняем
+    if store and read == stat.st_size:
+        compressed_cache.put(path, stat, encoding, b"".join(parts))
+
+
+def _file_response(name: str, request: Request) -> Response:
+    """
+    Отдает байты файла через FileResponse.
+
+    FileResponse обрабатывает Range и If-Range и передает файл серверу целиком
+    (http.response.pathsend), если сервер это поддерживает, иначе читает его
+    блоками FILE_STREAM_BLOCK_SIZE. ETag - sha256 содержимого, поэтому
+    совпадает с etag из /files/list и /file/{name}/meta.
+
+    Клиенту, принимающему zstd или gzip, файл без Range отдается сжатым:
+    небольшие файлы - из кэша содержимого, крупные - из compressed_cache
+    или сжатыми потоком при отдаче.
+    """
+    try:
+        path, stat, etag, entry = file_info(name)
+    except (FileNotFoundError, IsADirectoryError):
+        raise HTTPException(status_code=404, detail="File not found")
+
+    headers = {"ETag": f'"{etag}"', "Vary": "Accept-Encoding"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    encoding = None
+    if "range" not in request.headers and stat.st_size >= FILE_COMPRESS_MIN_BYTES:
+        encoding = negotiate(request.headers.get("accept-encoding"))
+    if encoding:
+        # Сжатое представление отличается по байтам, поэтому ETag слабый
+        headers.update({"ETag": f'W/"{etag}"', "Content-Encoding": encoding})
+        if entry is not None:
+            body = content_cache.variant(entry, encoding)
+        else:
+            body = compressed_cache.get(path, stat, encoding)
+        if body is not None:
+            return Response(body, headers=headers, media_type="text/plain; charset=utf-8")
+        return StreamingResponse(
+            _compressed_file(path, stat, encoding),
+            headers=headers,
+            media_type="text/plain; charset=utf-8",
+        )
+
+    response = FileResponse(
+        path, stat_result=stat, headers=headers, media_type="text/plain; charset=utf-8"
+    )
+    response.chunk_size = FILE_STREAM_BLOCK_SIZE
+    return response
+
+
 @app.get("/files")
 def get_files():
     """
@@ -24,32 +196,255 @@ def get_files():
     Returns
     -------
     list
-        Список имен файлов.
+        Список имен файлов, включая вложенные директории.
     """
     return list_available_files()
 
 
-@app.get("/file/{name}")
-def get_file(name: str):
+@app.get("/files/list")
+def get_files_page(
+    cursor: str | None = None,
+    limit: int = Query(FILE_LIST_PAGE_SIZE, ge=1, le=FILE_LIST_MAX_PAGE_SIZE),
+    recursive: bool = True,
+    etag: bool = True,
+):
+    """
+    Возвращает страницу списка файлов с размером, mtime и etag.
+
+    Parameters
+    ----------
+    cursor : str, optional
+        next_cursor предыдущей страницы.
+    limit : int
+        Размер страницы.
+    recursive : bool
+        Включать файлы вложенных директорий.
+    etag : bool
+        Добавлять etag файлов.
+
+    Returns
+    -------
+    dict
+        {"files": [...], "next_cursor": ...}; next_cursor = None на последней странице.
+
+    Raises
+    ------
+    HTTPException(400)
+        Если курсор поврежден.
+    """
+    try:
+        return list_files_page(cursor, limit, recursive=recursive, with_etag=etag)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+class BatchRequest(BaseModel):
+    names: list[str] = []
+    glob: str | None = None
+
+
+@app.post("/files/batch")
+def get_files_batch(body: BatchRequest, request: Request):
+    """
+    Отдает много файлов одним потоковым ответом в формате NDJSON.
+
+    Каждая строка ответа - JSON-запись одного файла с метаданными и содержимым
+    (см. file_reader.iter_file_records). Записи формируются по мере чтения файлов,
+    поэтому клиент начинает обработку, не дожидаясь конца ответа.
+    Клиенту, принимающему zstd или gzip, поток сжимается.
+
+    Parameters
+    ----------
+    body : BatchRequest
+        Список имен файлов и/или glob-шаблон.
+    request : Request
+        Запрос (заголовок Accept-Encoding).
+
+    Returns
+    -------
+    StreamingResponse
+        Поток записей application/x-ndjson.
+
+    Raises
+    ------
+    HTTPException(400)
+        Если выбрано больше FILE_BATCH_MAX_FILES файлов.
+    """
+    names = select_files(body.names, body.glob)
+    if len(names) > FILE_BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many files in batch: {len(names)} > {FILE_BATCH_MAX_FILES}",
+        )
+    logger.info(f"Batch of {len(names)} files requested")
+
+    lines = (
+        json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+        for record in iter_file_records(names)
+    )
+    headers = {"Vary": "Accept-Encoding"}
+    encoding = negotiate(request.headers.get("accept-encoding"))
+    if encoding:
+        lines = compress_stream(lines, encoding)
+        headers["Content-Encoding"] = encoding
+    return StreamingResponse(lines, headers=headers, media_type="application/x-ndjson")
+
+
+@app.get("/metrics/content-cache")
+def content_cache_stats():
+    """Возвращает статистику кэша содержимого файлов и кэша сжатых файлов."""
+    return {**content_cache.stats(), "compressed_cache": compressed_cache.stats()}
+
+
+@app.get("/changes")
+async def get_changes(
+    since: str | None = None,
+    limit: int = Query(CHANGES_PAGE_SIZE, ge=1, le=FILE_LIST_MAX_PAGE_SIZE),
+    wait: float = Query(0, ge=0, le=CHANGES_MAX_WAIT),
+):
+    """
+    Возвращает изменения файлов хранилища после курсора.
+
+    Без since возвращает только текущий курсор: клиент получает полный список
+    файлов и дальше следит за изменениями с этого курсора.
+
+    Parameters
+    ----------
+    since : str, optional
+        Курсор из предыдущего ответа.
+    limit : int
+        Максимальное количество событий.
+    wait : float
+        Сколько секунд ждать новых событий, если их пока нет (long-poll).
+
+    Returns
+    -------
+    dict
+        {"events": [{"seq", "type", "name", "ts"}, ...], "cursor": ...};
+        type - created, modified или deleted.
+
+    Raises
+    ------
+    HTTPException(404)
+        Если журнал изменений выключен.
+    HTTPException(410)
+        Если события после курсора потеряны; клиенту нужно перечитать список
+        файлов и продолжить с текущего курсора.
+    HTTPException(400)
+        Если курсор поврежден.
+    """
+    if watcher is None:
+        raise HTTPException(status_code=404, detail="Change feed is disabled")
+    if since is None:
+        return {"events": [], "cursor": change_log.cursor()}
+
+    deadline = time.monotonic() + wait
+    try:
+        while True:
+            # Ожидание регистрируется до чтения, чтобы не пропустить событие между ними
+            waiter = notifier.waiter()
+            try:
+                events, cursor = change_log.read(since, limit)
+                remaining = deadline - time.monotonic()
+                if events or remaining <= 0:
+                    return {"events": events, "cursor": cursor}
+                await asyncio.wait_for(waiter, remaining)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                notifier.discard(waiter)
+    except ChangeLogGap as e:
+        raise HTTPException(
+            status_code=410, detail={"message": str(e), "cursor": change_log.cursor()}
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/file/{name:path}/meta")
+def get_file_meta(name: str):
+    """
+    Возвращает метаданные указанного файла без его содержимого.
+
+    Parameters
+    ----------
+    name : str
+        Имя файла.
+
+    Returns
+    -------
+    dict
+        Размер, время изменения и etag (sha256 содержимого).
+
+    Raises
+    ------
+    HTTPException(404)
+        Если файл не существует.
+    HTTPException(400)
+        Если имя указывает за пределы хранилища.
+    """
+    try:
+        return file_metadata(name)
+    except (FileNotFoundError, IsADirectoryError):
+        raise HTTPException(status_code=404, detail="File not found")
+
+
+@app.get("/file/{name:path}/stream")
+def stream_file(name: str, request: Request):
+    """
+    Отдает байты файла без загрузки в память, с поддержкой Range и If-None-Match.
+
+    Parameters
+    ----------
+    name : str
+        Имя файла для получения.
+
+    Returns
+    -------
+    Response
+        Байты файла в кодировке UTF-8 (200 или 206) или 304, если etag совпал.
+
+    Raises
+    ------
+    HTTPException(404)
+        Если файл не существует.
+    HTTPException(400)
+        Если имя указывает за пределы хранилища.
+    """
+    return _file_response(name, request)
+
+
+# Объявлен последним: шаблон {name:path} иначе перехватил бы /meta и /stream
+@app.get("/file/{name:path}")
+def get_file(name: str, request: Request, format: Literal["raw", "json"] = "raw"):
     """
     Возвращает содержимое указанного файла.
 
+    По умолчанию отдает байты файла как /file/{name}/stream (Range, ETag, 304).
+    С format=json возвращает содержимое JSON-строкой, как раньше.
+
     Parameters
     ----------
     name : str
         Имя файла для получения.
+    format : {"raw", "json"}
+        Формат ответа.
 
     Returns
     -------
-    str
-        Содержимое файла.
+    Response | str
+        Байты файла или содержимое JSON-строкой.
 
     Raises
     ------
     HTTPException(404)
         Если файл не существует.
+    HTTPException(400)
+        Если имя указывает за пределы хранилища.
     """
+    if format == "raw":
+        return _file_response(name, request)
     try:
         return read_file(name)
-    except FileNotFoundError:
+    except (FileNotFoundError, IsADirectoryError):
         raise HTTPException(status_code=404, detail="File not found")
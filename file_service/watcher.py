@@ -0,0 +1,264 @@
+"""
+Отслеживание изменений файлов хранилища для журнала изменений.
+
+Наблюдатель хранит снимок хранилища (inode, размер и mtime каждого файла
+по директориям) и записывает в журнал разницу между снимком и диском.
+Источник сигналов об изменениях:
+- inotify (если установлен пакет inotify_simple): пересканируются только
+  директории, в которых произошли события; раз в CHANGE_RESYNC_INTERVAL
+  выполняется полная сверка на случай пропущенных событий;
+- опрос: полное сканирование раз в CHANGE_POLL_INTERVAL секунд.
+
+При штатной остановке снимок сохраняется рядом с журналом, и после
+перезапуска изменения, сделанные пока сервис не работал, тоже попадают
+в журнал. Без сохраненного снимка журнал начинается заново.
+"""
+
+import json
+import os
+import threading
+import time
+from config import (
+    BASE_DIR,
+    CHANGE_LOG_DIR,
+    CHANGE_WATCHER,
+    CHANGE_POLL_INTERVAL,
+    CHANGE_RESYNC_INTERVAL,
+    CHANGE_DEBOUNCE,
+)
+from change_log import ChangeLog
+from logger import logger
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None
+
+# (inode, размер, mtime в наносекундах)
+Version = tuple[int, int, int]
+
+
+def _parent(rel: str) -> str:
+    return rel.rsplit("/", 1)[0] if "/" in rel else ""
+
+
+class StorageWatcher:
+    """
+    Фоновый поток, записывающий изменения хранилища в журнал.
+
+    Parameters
+    ----------
+    change_log : ChangeLog
+        Журнал изменений.
+    mode : str
+        "inotify", "poll" или "auto" (inotify, если доступен).
+    """
+
+    def __init__(self, change_log: ChangeLog, mode: str = CHANGE_WATCHER):
+        self.change_log = change_log
+        self.mode = mode
+        self.base = os.path.realpath(BASE_DIR)
+        self._state_path = os.path.join(CHANGE_LOG_DIR, "snapshot.json")
+
+        # Файлы по директориям (пути относительно BASE_DIR, "" - корень)
+        self._dirs: dict[str, dict[str, Version]] = {}
+        self._children: dict[str, set[str]] = {}
+
+        self._inotify = None
+        self._wd_dirs: dict[int, str] = {}
+        self._dir_wds: dict[str, int] = {}
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="storage-watcher", daemon=True)
+
+    def start(self):
+        resume = self._load_state()
+        self.change_log.open(resume=resume)
+
+        if self.mode in ("auto", "inotify"):
+            if INotify is not None:
+                self._inotify = INotify()
+            elif self.mode == "inotify":
+                logger.warning("inotify_simple is not installed, falling back to polling")
+        logger.info(f"Starting storage watcher ({'inotify' if self._inotify else 'polling'})")
+
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self._save_state()
+        self.change_log.close()
+        if self._inotify:
+            self._inotify.close()
+
+    def _run(self):
+        # Первое сканирование: при продолжении журнала записываем изменения,
+        # сделанные пока сервис не работал, иначе только строим снимок
+        resumed = bool(self._dirs)
+        self._scan_and_record(recursive_dirs=[""], record=resumed)
+
+        if self._inotify:
+            self._inotify_loop()
+        else:
+            while not self._stop.wait(CHANGE_POLL_INTERVAL):
+                self._scan_and_record(recursive_dirs=[""])
+
+    def _scan_and_record(self, recursive_dirs=(), shallow_dirs=(), record: bool = True):
+        changes: list[tuple[str, str]] = []
+        try:
+            for rel in recursive_dirs:
+                self._scan_dir(rel, True, changes)
+            for rel in shallow_dirs:
+                # Директория могла быть удалена вместе с родителем
+                if rel in self._dirs:
+                    self._scan_dir(rel, False, changes)
+        except Exception as e:
+            logger.error(f"Storage scan failed: {e}", exc_info=True)
+        if record and changes:
+            self.change_log.append(changes)
+            logger.info(f"Recorded {len(changes)} storage changes")
+
+    def _inotify_loop(self):
+        last_resync = time.monotonic()
+        while not self._stop.is_set():
+            events = self._inotify.read(timeout=1000)
+            if events:
+                # Ждем продолжения серии событий, чтобы пересканировать директорию один раз
+                events += self._inotify.read(timeout=int(CHANGE_DEBOUNCE * 1000))
+
+            dirty: set[str] = set()
+            overflow = False
+            for event in events:
+                if event.mask & flags.Q_OVERFLOW:
+                    overflow = True
+                elif event.mask & flags.IGNORED:
+                    rel = self._wd_dirs.pop(event.wd, None)
+                    if rel is not None and self._dir_wds.get(rel) == event.wd:
+                        del self._dir_wds[rel]
+                elif event.wd in self._wd_dirs:
+                    dirty.add(self._wd_dirs[event.wd])
+
+            if overflow or time.monotonic() - last_resync >= CHANGE_RESYNC_INTERVAL:
+                if overflow:
+                    logger.warning("inotify queue overflow, rescanning storage")
+                self._scan_and_record(recursive_dirs=[""])
+                last_resync = time.monotonic()
+            elif dirty:
+                self._scan_and_record(shallow_dirs=sorted(dirty))
+
+    def _watch(self, rel: str):
+        if self._inotify is None or rel in self._dir_wds:
+            return
+        mask = (
+            flags.CREATE | flags.DELETE | flags.CLOSE_WRITE
+            | flags.MOVED_FROM | flags.MOVED_TO | flags.ATTRIB
+        )
+        try:
+            wd = self._inotify.add_watch(os.path.join(self.base, rel), mask)
+        except OSError as e:
+            # Например, исчерпан fs.inotify.max_user_watches: директорию
+            # подхватит периодическая полная сверка
+            logger.warning(f"Cannot watch {rel or '/'}: {e}")
+            return
+        self._wd_dirs[wd] = rel
+        self._dir_wds[rel] = wd
+
+    def _scan_dir(self, rel: str, recursive: bool, changes: list):
+        """
+        Сверяет директорию со снимком и дописывает изменения в changes.
+
+        Новые поддиректории сканируются целиком; известные - только при recursive.
+        """
+        path = os.path.join(self.base, rel) if rel else self.base
+        files: dict[str, Version] = {}
+        subdirs: set[str] = set()
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.add(entry.name)
+                        elif entry.is_file(follow_symlinks=False):
+                            stat = entry.stat(follow_symlinks=False)
+                            files[entry.name] = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+                    except FileNotFoundError:
+                        continue
+        except (FileNotFoundError, NotADirectoryError):
+            if rel:
+                self._drop_dir(rel, changes)
+            return
+
+        self._watch(rel)
+        prefix = rel + "/" if rel else ""
+
+        old = self._dirs.get(rel, {})
+        for name, version in files.items():
+            previous = old.get(name)
+            if previous is None:
+                changes.append(("created", prefix + name))
+            elif previous != version:
+                changes.append(("modified", prefix + name))
+        for name in old.keys() - files.keys():
+            changes.append(("deleted", prefix + name))
+        self._dirs[rel] = files
+
+        children = self._children.setdefault(rel, set())
+        for child in children - {prefix + name for name in subdirs}:
+            self._drop_dir(child, changes)
+        for name in sorted(subdirs):
+            child = prefix + name
+            if recursive or child not in self._dirs:
+                children.add(child)
+                self._scan_dir(child, True, changes)
+
+    def _drop_dir(self, rel: str, changes: list):
+        """Удаляет из снимка исчезнувшую директорию со всем содержимым."""
+        for child in self._children.pop(rel, set()):
+            self._drop_dir(child, changes)
+        prefix = rel + "/"
+        for name in self._dirs.pop(rel, {}):
+            changes.append(("deleted", prefix + name))
+        self._children.get(_parent(rel), set()).discard(rel)
+
+        wd = self._dir_wds.pop(rel, None)
+        if wd is not None and self._wd_dirs.get(wd) == rel:
+            del self._wd_dirs[wd]
+
+    def _load_state(self) -> bool:
+        """Загружает снимок, сохраненный при штатной остановке."""
+        if not os.path.exists(self._state_path):
+            return False
+        try:
+            with open(self._state_path, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Cannot load storage snapshot: {e}")
+            return False
+        finally:
+            # Снимок действителен только до следующего запуска: после аварийной
+            # остановки он устарел бы, а пропущенные изменения потерялись
+            os.remove(self._state_path)
+
+        try:
+            self._dirs = {
+                rel: {name: tuple(version) for name, version in files.items()}
+                for rel, files in state["dirs"].items()
+            }
+        except (KeyError, TypeError, AttributeError) as e:
+            logger.warning(f"Cannot load storage snapshot: malformed state ({e!r})")
+            self._dirs = {}
+            return False
+        for rel in self._dirs:
+            if rel:
+                self._children.setdefault(_parent(rel), set()).add(rel)
+        return True
+
+    def _save_state(self):
+        tmp_path = self._state_path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"dirs": self._dirs}, f, ensure_ascii=False)
+            os.replace(tmp_path, self._state_path)
+        except OSError as e:
+            logger.warning(f"Cannot save storage snapshot: {e}")
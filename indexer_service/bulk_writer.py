@@ -0,0 +1,280 @@
+"""
+Пакетная запись документов в OpenSearch через _bulk API.
+
+Документы копятся в буфере и отправляются пачками, ограниченными по
+количеству документов и по объему в байтах. Пачка также отправляется,
+если с момента предыдущей отправки прошло больше BULK_FLUSH_INTERVAL секунд.
+
+При перегрузке кластера (429) или частичных ошибках повторно отправляются
+только упавшие документы, а размер пачки адаптивно уменьшается.
+"""
+
+import time
+from opensearchpy import TransportError, ConnectionError as OpenSearchConnectionError
+from opensearchpy.helpers import expand_action
+from config import (
+    INDEX_NAME,
+    BULK_BATCH_DOCS,
+    BULK_BATCH_BYTES,
+    BULK_FLUSH_INTERVAL,
+    BULK_MAX_RETRIES,
+    BULK_RETRY_BACKOFF,
+    BULK_MIN_BATCH_DOCS,
+)
+from clients.opensearch import client as default_client
+from logger import logger
+
+# Статусы, при которых документ имеет смысл отправить повторно
+RETRYABLE_STATUSES = {429, 502, 503, 504}
+# Нижняя граница объема пачки при уменьшении после 413 (байты)
+MIN_BATCH_BYTES = 64 * 1024
+
+
+class BulkWriter:
+    """
+    Буферизующий писатель документов в OpenSearch.
+
+    Параметры
+    ---------
+    client : OpenSearch, optional
+        Клиент OpenSearch.
+    index : str, optional
+        Имя индекса для записи.
+    batch_docs : int, optional
+        Максимальное количество документов в одном _bulk запросе.
+    batch_bytes : int, optional
+        Максимальный объем тела одного _bulk запроса в байтах.
+    flush_interval : float, optional
+        Максимальное время (сек) между отправками непустого буфера.
+    max_retries : int, optional
+        Количество повторных попыток для упавших документов.
+    progress : Progress, optional
+        Счетчики прогресса, в которые добавляются записанные документы.
+    """
+
+    def __init__(
+        self,
+        client=None,
+        index: str = INDEX_NAME,
+        batch_docs: int = BULK_BATCH_DOCS,
+        batch_bytes: int = BULK_BATCH_BYTES,
+        flush_interval: float = BULK_FLUSH_INTERVAL,
+        max_retries: int = BULK_MAX_RETRIES,
+        progress=None,
+    ):
+        self.client = client or default_client
+        self.progress = progress
+        self.index = index
+        self.max_batch_docs = batch_docs
+        self.max_batch_bytes = batch_bytes
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+
+        # Текущий (адаптивный) размер пачки
+        self.batch_docs = batch_docs
+        self.batch_bytes = batch_bytes
+
+        self.indexed = 0
+        self.failed = 0
+        # Метки (например, имена файлов), у которых хотя бы один документ не записан
+        self.failed_tags: set = set()
+
+        self._buffer: list[tuple[str, int, object]] = []
+        self._buffer_bytes = 0
+        self._last_flush = time.monotonic()
+
+    def add(self, document: dict, doc_id: str | None = None, tag=None):
+        """
+        Добавляет документ в буфер и при необходимости отправляет пачку.
+
+        Параметры
+        ---------
+        document : dict
+            Тело документа.
+        doc_id : str, optional
+            Идентификатор документа. Если не задан, OpenSearch сгенерирует его сам.
+        tag : hashable, optional
+            Метка документа; попадает в failed_tags, если документ не удалось записать.
+        """
+        action = {"_index": self.index, "_source": document}
+        if doc_id is not None:
+            action["_id"] = doc_id
+
+        meta, source = expand_action(action)
+        serializer = self.client.transport.serializer
+        line = serializer.dumps(meta) + "\n" + serializer.dumps(source) + "\n"
+        size = len(line.encode("utf-8"))
+
+        self._buffer.append((line, size, tag))
+        self._buffer_bytes += size
+
+        if (
+            len(self._buffer) >= self.batch_docs
+            or self._buffer_bytes >= self.batch_bytes
+        ):
+            self.flush()
+        else:
+            self.flush_if_due()
+
+    def flush_if_due(self):
+        """Отправляет буфер, если истек интервал BULK_FLUSH_INTERVAL."""
+        if self._buffer and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Отправляет все накопленные документы пачками текущего размера."""
+        pending = self._buffer
+        self._buffer = []
+        self._buffer_bytes = 0
+
+        attempt = 0
+        while pending:
+            batch, rest = self._take_batch(pending)
+            retry = self._send_safely(batch)
+
+            if not retry:
+                attempt = 0
+                self._grow()
+                pending = rest
+                continue
+
+            attempt += 1
+            if attempt > self.max_retries:
+                logger.error(
+                    f"Превышено число повторов bulk запроса, "
+                    f"потеряно документов: {len(retry)}"
+                )
+                self._fail(retry)
+                attempt = 0
+                pending = rest
+                continue
+
+            time.sleep(BULK_RETRY_BACKOFF * 2 ** (attempt - 1))
+            pending = retry + rest
+
+        self._last_flush = time.monotonic()
+
+    def close(self) -> int:
+        """
+        Отправляет остаток буфера.
+
+        Возвращает
+        ----------
+        int
+            Количество успешно проиндексированных документов.
+        """
+        self.flush()
+        if self.failed:
+            logger.warning(f"Не удалось проиндексировать документов: {self.failed}")
+        return self.indexed
+
+    def _take_batch(self, items: list) -> tuple[list, list]:
+        """Отделяет от списка пачку, ограниченную по количеству и байтам."""
+        size = 0
+        count = 0
+        for _, item_size, _ in items:
+            if count >= self.batch_docs or (count and size + item_size > self.batch_bytes):
+                break
+            size += item_size
+            count += 1
+        return items[:count], items[count:]
+
+    def _send_safely(self, batch: list) -> list:
+        """
+        Отправляет пачку, превращая временные ошибки кластера в повтор.
+
+        Документы пачки, отклоненной с постоянной ошибкой, считаются незаписанными.
+        """
+        try:
+            return self._send(batch)
+        except OpenSearchConnectionError as e:
+            # ConnectionError и ConnectionTimeout - подклассы TransportError,
+            # поэтому обрабатываются первыми
+            logger.warning(f"Ошибка соединения при bulk запросе: {e}")
+            return batch
+        except TransportError as e:
+            if e.status_code == 413 or e.status_code in RETRYABLE_STATUSES:
+                self._shrink(too_large=e.status_code == 413)
+                logger.warning(
+                    f"Bulk запрос отклонен ({e.status_code}), размер пачки уменьшен "
+                    f"до {self.batch_docs} док. / {self.batch_bytes // 1024} КБ"
+                )
+                return batch
+            logger.error(f"Bulk запрос завершился ошибкой ({e.status_code}): {e}")
+            self._fail(batch)
+            return []
+
+    def _send(self, batch: list) -> list:
+        """
+        Отправляет одну пачку через _bulk.
+
+        Возвращает
+        ----------
+        list
+            Документы, которые нужно отправить повторно.
+        """
+        body = "".join(line for line, _, _ in batch)
+        size = sum(item_size for _, item_size, _ in batch)
+
+        started = time.monotonic()
+        resp = self.client.bulk(body=body)
+        elapsed = max(time.monotonic() - started, 1e-6)
+
+        if not resp.get("errors"):
+            self._count_indexed(len(batch))
+            logger.info(
+                f"Bulk: {len(batch)} док., {size / 1024:.1f} КБ за {elapsed:.3f} с "
+                f"({len(batch) / elapsed:.0f} док/с, {size / elapsed / 1024 / 1024:.2f} МБ/с)"
+            )
+            return []
+
+        retry = []
+        ok = 0
+        throttled = False
+        for item, entry in zip(resp["items"], batch):
+            result = next(iter(item.values()))
+            status = result.get("status", 500)
+            if status < 300:
+                ok += 1
+            elif status in RETRYABLE_STATUSES:
+                throttled = throttled or status == 429
+                retry.append(entry)
+            else:
+                self._fail([entry])
+                logger.error(f"Документ отклонен OpenSearch ({status}): {result.get('error')}")
+
+        self._count_indexed(ok)
+        logger.info(
+            f"Bulk: {ok}/{len(batch)} док. за {elapsed:.3f} с "
+            f"({ok / elapsed:.0f} док/с), к повтору: {len(retry)}"
+        )
+        if throttled:
+            self._shrink()
+        return retry
+
+    def _count_indexed(self, count: int):
+        self.indexed += count
+        if self.progress is not None:
+            self.progress.add_chunks(count)
+
+    def _fail(self, entries: list):
+        self.failed += len(entries)
+        self.failed_tags.update(tag for _, _, tag in entries if tag is not None)
+
+    def _shrink(self, too_large: bool = False):
+        self.batch_docs = max(BULK_MIN_BATCH_DOCS, self.batch_docs // 2)
+        if too_large:
+            # 413 вызван объемом тела: одного уменьшения числа документов может не хватить
+            self.batch_bytes = max(min(MIN_BATCH_BYTES, self.max_batch_bytes), self.batch_bytes // 2)
+
+    def _grow(self):
+        if self.batch_docs < self.max_batch_docs:
+            self.batch_docs = min(
+                self.max_batch_docs,
+                self.batch_docs + max(1, self.batch_docs // 4),
+            )
+        if self.batch_bytes < self.max_batch_bytes:
+            self.batch_bytes = min(
+                self.max_batch_bytes,
+                self.batch_bytes + max(1, self.batch_bytes // 4),
+            )
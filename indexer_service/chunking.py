@@ -0,0 +1,76 @@
+"""
+Разбиение текста на чанки и построение идентификаторов чанков.
+"""
+import hashlib
+from itertools import islice
+from typing import Iterable, Iterator
+
+
+def chunk_text(text: str, size: int) -> list[str]:
+    """
+    Разбивает текст на чанки заданного размера.
+    
+    Параметры
+    ---------
+    text : str
+        Текст для разбиения.
+    size : int
+        Размер чанка.
+    
+    Возвращает
+    ----------
+    list[str]
+        Список чанков текста.
+    """
+    return [text[i:i+size] for i in range(0, len(text), size)]
+
+
+def iter_chunks(pieces: Iterable[str], size: int) -> Iterator[str]:
+    """
+    Разбивает поток фрагментов текста на чанки заданного размера.
+
+    Границы чанков не зависят от того, как текст был разбит на фрагменты:
+    результат совпадает с chunk_text для склеенного текста.
+
+    Параметры
+    ---------
+    pieces : Iterable[str]
+        Фрагменты текста (например, блоки из сетевого потока).
+    size : int
+        Размер чанка.
+
+    Возвращает
+    ----------
+    Iterator[str]
+        Чанки текста.
+    """
+    buffer = ""
+    for piece in pieces:
+        buffer += piece
+        if len(buffer) < size:
+            continue
+        full = len(buffer) - len(buffer) % size
+        for i in range(0, full, size):
+            yield buffer[i:i+size]
+        buffer = buffer[full:]
+    if buffer:
+        yield buffer
+
+
+def iter_batches(items: Iterable, size: int) -> Iterator[list]:
+    """Группирует элементы итератора в списки длиной не более size."""
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def chunk_document_id(doc_id: str, chunk_id: int, content: str) -> str:
+    """
+    Строит детерминированный _id чанка из имени файла, номера и хэша текста.
+
+    Повторная индексация того же чанка перезаписывает документ,
+    а не создает дубликат.
+    """
+    content_hash = hashlib.sha1(content.encode("utf-8")).hexdigest()
+    key = f"{doc_id}\x00{chunk_id}\x00{content_hash}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
@@ -2,18 +2,144 @@
 HTTP-клиент для взаимодействия с file_service (внутренний клиент).
 """
 
+import codecs
+import json
+from typing import Iterator
+from urllib.parse import quote
 import requests
-from config import FILE_SERVICE_URL
+from requests.adapters import HTTPAdapter
+from urllib3.response import HAS_ZSTD
+from config import (
+    FILE_SERVICE_URL,
+    STREAM_READ_SIZE,
+    FETCH_WORKERS,
+    LIST_PAGE_SIZE,
+    FETCH_COMPRESSION,
+)
 from logger import logger
 
+# Общая сессия переиспользует соединения между запросами. Поток чтения
+# может держать одновременно пакетный ответ и поток крупного файла
+session = requests.Session()
+session.mount("http://", HTTPAdapter(pool_maxsize=max(2 * FETCH_WORKERS, 10)))
+
+
+def _accept_encoding(mode: str) -> str:
+    """
+    Значение Accept-Encoding для запросов к file_service.
+
+    urllib3 распаковывает ответ блоками при чтении (iter_content, iter_lines),
+    поэтому сжатый поток не собирается в памяти целиком. zstd urllib3 умеет
+    распаковывать только при установленном compression.zstd или backports.zstd.
+    """
+    if mode == "none":
+        return "identity"
+    if mode == "zstd" and not HAS_ZSTD:
+        logger.warning("zstd decoder is not installed, falling back to gzip")
+        mode = "gzip"
+    if mode == "auto":
+        return "zstd, gzip" if HAS_ZSTD else "gzip"
+    return mode
+
+
+session.headers["Accept-Encoding"] = _accept_encoding(FETCH_COMPRESSION)
+
+# list_files и fetch_file используются только устаревшим indexer_service.py;
+# конвейер индексации работает через list_files_meta, fetch_batch и stream_file
 def list_files():
-    response = requests.get(f"{FILE_SERVICE_URL}/files")
+    response = session.get(f"{FILE_SERVICE_URL}/files")
     response.raise_for_status()
     return response.json()
 
+def list_files_meta(page_size: int = LIST_PAGE_SIZE) -> list[dict]:
+    """
+    Получает список всех файлов хранилища с метаданными постранично.
+
+    Параметры
+    ---------
+    page_size : int, optional
+        Количество файлов в одном запросе.
+
+    Возвращает
+    ----------
+    list[dict]
+        Записи name, size, mtime, etag; имена вложенных файлов содержат "/".
+    """
+    files = []
+    cursor = None
+    while True:
+        params = {"limit": page_size}
+        if cursor:
+            params["cursor"] = cursor
+        response = session.get(f"{FILE_SERVICE_URL}/files/list", params=params)
+        response.raise_for_status()
+        page = response.json()
+        files.extend(page["files"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            return files
+
 def fetch_file(name: str):
     logger.info(f"Fetching file: {name}")
-    response = requests.get(f"{FILE_SERVICE_URL}/file/{name}")
+    response = session.get(f"{FILE_SERVICE_URL}/file/{quote(name)}")
     response.raise_for_status()
     return response.text
 
+
+def fetch_batch(names: list[str]) -> Iterator[dict]:
+    """
+    Читает много файлов одним запросом POST /files/batch.
+
+    Ответ разбирается по мере поступления, поэтому в памяти находится
+    только текущая запись; пока потребитель не забрал запись, чтение
+    ответа приостанавливается.
+
+    Параметры
+    ---------
+    names : list[str]
+        Имена файлов.
+
+    Возвращает
+    ----------
+    Iterator[dict]
+        Записи файлов: name, size, mtime, etag, inline, content
+        (None для файлов, которые нужно читать через stream_file) или error.
+    """
+    logger.info(f"Fetching batch of {len(names)} files")
+    with session.post(
+        f"{FILE_SERVICE_URL}/files/batch", json={"names": names}, stream=True
+    ) as response:
+        response.raise_for_status()
+        for line in response.iter_lines(chunk_size=STREAM_READ_SIZE):
+            if line:
+                yield json.loads(line)
+
+def stream_file(name: str) -> Iterator[str]:
+    """
+    Читает файл из file_service потоком и возвращает его по частям.
+
+    Многобайтовые символы UTF-8, разрезанные между сетевыми чтениями,
+    собираются инкрементальным декодером, поэтому в памяти одновременно
+    находится не больше одного блока.
+
+    Параметры
+    ---------
+    name : str
+        Имя файла.
+
+    Возвращает
+    ----------
+    Iterator[str]
+        Фрагменты текста файла.
+    """
+    logger.info(f"Streaming file: {name}")
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    with session.get(f"{FILE_SERVICE_URL}/file/{quote(name)}/stream", stream=True) as response:
+        response.raise_for_status()
+        for block in response.iter_content(chunk_size=STREAM_READ_SIZE):
+            text = decoder.decode(block)
+            if text:
+                yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
@@ -1,48 +1,323 @@
-from opensearchpy import OpenSearch
-from config import OPENSEARCH_HOST, INDEX_NAME, VECTOR_DIM
+from opensearchpy import OpenSearch, NotFoundError
+from config import (
+    OPENSEARCH_HOST,
+    INDEX_NAME,
+    VECTOR_DIM,
+    KNN_ENGINE,
+    KNN_SPACE_TYPE,
+    KNN_M,
+    KNN_EF_CONSTRUCTION,
+    KNN_EF_SEARCH,
+    VECTOR_QUANTIZATION,
+    INDEX_REFRESH_INTERVAL,
+    INDEX_REPLICAS,
+    INDEX_KEEP_VERSIONS,
+    INDEX_FORCE_MERGE_SEGMENTS,
+)
 from logger import logger
 
 client = OpenSearch(
     hosts=[OPENSEARCH_HOST],
 )
 
-def ensure_index():
-    """Создает индекс в OpenSearch, если он не существует."""
-    try:
-        exists = client.indices.exists(index=INDEX_NAME)
-        if exists:
-            logger.info(f"Индекс {INDEX_NAME} уже существует.")
-            return
-    except Exception as e:
-        logger.warning(f"Ошибка при проверке существования индекса: {e}")
+# Префикс версионированных индексов: docs_v1, docs_v2, ...
+VERSION_PREFIX = f"{INDEX_NAME}_v"
+
+
+def vector_mapping() -> dict:
+    """
+    Возвращает маппинг поля vector согласно настройкам KNN_* и VECTOR_QUANTIZATION.
 
-    body = {
+    Raises
+    ------
+    ValueError
+        Если выбранное квантование не поддерживается движком.
+    """
+    if VECTOR_QUANTIZATION not in ("none", "fp16", "byte"):
+        raise ValueError(f"Неизвестный тип квантования: {VECTOR_QUANTIZATION}")
+    if VECTOR_QUANTIZATION == "fp16" and KNN_ENGINE != "faiss":
+        raise ValueError("Квантование fp16 поддерживается только движком faiss")
+    if VECTOR_QUANTIZATION == "byte" and KNN_ENGINE not in ("faiss", "lucene"):
+        raise ValueError("Байтовые векторы поддерживаются только движками faiss и lucene")
+
+    parameters = {"m": KNN_M, "ef_construction": KNN_EF_CONSTRUCTION}
+    if VECTOR_QUANTIZATION == "fp16":
+        parameters["encoder"] = {"name": "sq", "parameters": {"type": "fp16"}}
+
+    mapping = {
+        "type": "knn_vector",
+        "dimension": VECTOR_DIM,
+        "method": {
+            "name": "hnsw",
+            "space_type": KNN_SPACE_TYPE,
+            "engine": KNN_ENGINE,
+            "parameters": parameters,
+        }
+    }
+    if VECTOR_QUANTIZATION == "byte":
+        mapping["data_type"] = "byte"
+    return mapping
+
+
+def index_body(bulk_load: bool = False) -> dict:
+    """
+    Возвращает настройки и маппинг индекса документов.
+
+    Параметры
+    ---------
+    bulk_load : bool
+        Настройки для первичной загрузки: без refresh и без реплик.
+    """
+    settings = {"knn": True}
+    if KNN_ENGINE != "lucene":
+        # Для lucene ef_search задается размером кандидатов в запросе
+        settings["knn.algo_param.ef_search"] = KNN_EF_SEARCH
+    if bulk_load:
+        settings.update({"refresh_interval": "-1", "number_of_replicas": 0})
+    else:
+        settings.update({
+            "refresh_interval": INDEX_REFRESH_INTERVAL,
+            "number_of_replicas": INDEX_REPLICAS,
+        })
+
+    return {
         "settings": {
-            "index": {"knn": True}
+            "index": settings
         },
         "mappings": {
             "properties": {
                 "doc_id": {"type": "keyword"},
                 "chunk_id": {"type": "integer"},
+                "file_hash": {"type": "keyword"},
                 "content": {"type": "text"},
-                "vector": {
-                    "type": "knn_vector",
-                    "dimension": VECTOR_DIM,
-                    "method": {
-                        "name": "hnsw",
-                        "space_type": "l2",
-                        "engine": "nmslib"
-                    }
-                }
+                "indexed_at": {"type": "date", "format": "epoch_millis"},
+                "vector": vector_mapping()
             }
         }
     }
 
-    logger.info(f"Создание индекса {INDEX_NAME} в OpenSearch...")
+
+def ensure_index() -> bool:
+    """
+    Создает индекс в OpenSearch, если он не существует.
+
+    Новый индекс создается как <INDEX_NAME>_v1 с алиасом INDEX_NAME,
+    чтобы последующие перестроения могли атомарно переключить алиас.
+
+    Возвращает
+    ----------
+    bool
+        True, если индекс был создан заново.
+    """
     try:
-        client.indices.create(index=INDEX_NAME, body=body)
-        logger.info(f"Индекс {INDEX_NAME} успешно создан.")
+        exists = client.indices.exists(index=INDEX_NAME)
+        if exists:
+            logger.info(f"Индекс {INDEX_NAME} уже существует.")
+            return False
+    except Exception as e:
+        logger.warning(f"Ошибка при проверке существования индекса: {e}")
+
+    name = f"{VERSION_PREFIX}{_latest_version() + 1}"
+    body = index_body()
+    body["aliases"] = {INDEX_NAME: {}}
+
+    logger.info(f"Создание индекса {name} с алиасом {INDEX_NAME} в OpenSearch...")
+    try:
+        client.indices.create(index=name, body=body)
+        logger.info(f"Индекс {name} успешно создан.")
     except Exception as e:
         logger.error(f"Ошибка при создании индекса: {e}")
         raise
+    return True
+
+
+def _versions() -> dict[int, str]:
+    """Возвращает существующие версионированные индексы: номер версии -> имя."""
+    try:
+        indices = client.indices.get(index=f"{VERSION_PREFIX}*")
+    except NotFoundError:
+        return {}
+    versions = {}
+    for name in indices:
+        suffix = name[len(VERSION_PREFIX):]
+        if suffix.isdigit():
+            versions[int(suffix)] = name
+    return versions
+
+
+def _latest_version() -> int:
+    return max(_versions(), default=0)
+
+
+def _alias_targets() -> list[str]:
+    """Возвращает индексы, на которые сейчас указывает алиас INDEX_NAME."""
+    try:
+        return list(client.indices.get_alias(name=INDEX_NAME))
+    except NotFoundError:
+        return []
+
+
+def create_rebuild_index() -> str:
+    """
+    Создает новую версию индекса с настройками для быстрой загрузки.
+
+    Возвращает
+    ----------
+    str
+        Имя созданного индекса (<INDEX_NAME>_v<N>).
+    """
+    name = f"{VERSION_PREFIX}{_latest_version() + 1}"
+    client.indices.create(index=name, body=index_body(bulk_load=True))
+    logger.info(f"Создан индекс {name} для перестроения (refresh выключен, без реплик)")
+    return name
+
+
+def publish_index(name: str):
+    """
+    Готовит загруженный индекс к поиску и переключает на него алиас INDEX_NAME.
+
+    Шаги: force merge, прогрев k-NN графов, восстановление refresh и реплик,
+    атомарное переключение алиаса, удаление старых версий.
+
+    Исключение возможно только до переключения алиаса: ошибки удаления
+    старых версий записываются в лог и не прерывают публикацию.
+
+    Параметры
+    ---------
+    name : str
+        Имя загруженного индекса.
+    """
+    client.indices.refresh(index=name)
+
+    logger.info(f"Force merge индекса {name} до {INDEX_FORCE_MERGE_SEGMENTS} сегментов...")
+    client.indices.forcemerge(
+        index=name,
+        max_num_segments=INDEX_FORCE_MERGE_SEGMENTS,
+        request_timeout=3600,
+    )
+
+    try:
+        client.transport.perform_request("GET", f"/_plugins/_knn/warmup/{name}")
+        logger.info(f"k-NN графы индекса {name} загружены в память")
+    except Exception as e:
+        logger.warning(f"Не удалось прогреть k-NN индекс {name}: {e}")
+
+    client.indices.put_settings(
+        index=name,
+        body={"index": {
+            "refresh_interval": INDEX_REFRESH_INTERVAL,
+            "number_of_replicas": INDEX_REPLICAS,
+        }},
+    )
+
+    actions = [{"add": {"index": name, "alias": INDEX_NAME}}]
+    targets = _alias_targets()
+    actions += [{"remove": {"index": old, "alias": INDEX_NAME}} for old in targets if old != name]
+    if not targets and client.indices.exists(index=INDEX_NAME):
+        # Старый индекс без версий с именем алиаса удаляется в том же атомарном запросе
+        actions.append({"remove_index": {"index": INDEX_NAME}})
+
+    client.indices.update_aliases(body={"actions": actions})
+    logger.info(f"Алиас {INDEX_NAME} переключен на {name}")
+
+    try:
+        _delete_old_versions(current=name)
+    except Exception as e:
+        # Алиас уже указывает на новую версию: лишние версии удалит следующая перестройка
+        logger.warning(f"Не удалось удалить старые версии индекса: {e}")
+
+
+def drop_index(name: str):
+    """Удаляет индекс (например, недостроенную версию)."""
+    try:
+        client.indices.delete(index=name)
+        logger.info(f"Индекс {name} удален")
+    except NotFoundError:
+        pass
+
+
+def _delete_old_versions(current: str):
+    """Удаляет версии индекса сверх INDEX_KEEP_VERSIONS, кроме текущей."""
+    versions = _versions()
+    keep = set(sorted(versions, reverse=True)[:max(INDEX_KEEP_VERSIONS, 1)])
+    for number, name in versions.items():
+        if number not in keep and name != current:
+            try:
+                drop_index(name)
+            except Exception as e:
+                logger.warning(f"Не удалось удалить старую версию индекса {name}: {e}")
+
+
+def delete_stale_chunks(
+    file_hashes: dict[str, str],
+    index: str = INDEX_NAME,
+    batch_size: int = 500,
+) -> int:
+    """
+    Удаляет чанки файлов, относящиеся к прежним версиям их содержимого.
+
+    Параметры
+    ---------
+    file_hashes : dict[str, str]
+        Текущий хэш содержимого для каждого doc_id.
+    index : str
+        Индекс или алиас.
+    batch_size : int
+        Количество файлов в одном запросе _delete_by_query.
+
+    Возвращает
+    ----------
+    int
+        Количество удаленных чанков.
+    """
+    items = list(file_hashes.items())
+    deleted = 0
+    for start in range(0, len(items), batch_size):
+        should = [
+            {
+                "bool": {
+                    "filter": [{"term": {"doc_id": doc_id}}],
+                    "must_not": [{"term": {"file_hash": file_hash}}],
+                }
+            }
+            for doc_id, file_hash in items[start:start + batch_size]
+        ]
+        body = {"query": {"bool": {"should": should, "minimum_should_match": 1}}}
+        resp = client.delete_by_query(
+            index=index, body=body, conflicts="proceed"
+        )
+        deleted += resp.get("deleted", 0)
+    return deleted
+
+
+def delete_documents(
+    doc_ids: list[str],
+    index: str = INDEX_NAME,
+    batch_size: int = 500,
+) -> int:
+    """
+    Удаляет все чанки указанных файлов.
+
+    Параметры
+    ---------
+    doc_ids : list[str]
+        Имена файлов (значения поля doc_id).
+    index : str
+        Индекс или алиас.
+    batch_size : int
+        Количество файлов в одном запросе _delete_by_query.
+
+    Возвращает
+    ----------
+    int
+        Количество удаленных чанков.
+    """
+    deleted = 0
+    for start in range(0, len(doc_ids), batch_size):
+        body = {"query": {"terms": {"doc_id": doc_ids[start:start + batch_size]}}}
+        resp = client.delete_by_query(
+            index=index, body=body, conflicts="proceed"
+        )
+        deleted += resp.get("deleted", 0)
+    return deleted
 
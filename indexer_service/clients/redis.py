@@ -0,0 +1,14 @@
+"""
+Клиент Redis для indexer_service.
+
+Используется для хранения состояния заданий индексации и межрепличной блокировки.
+"""
+
+import redis
+from config import REDIS_HOST, REDIS_PORT
+
+# Глобальное подключение к Redis
+redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+
+# Подключение без декодирования ответов: для хранения бинарных значений (векторов)
+redis_binary_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT)
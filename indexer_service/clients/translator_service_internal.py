@@ -6,6 +6,9 @@ import requests
 from logger import logger
 from config import TRANSLATOR_SERVICE_URL
 
+# Сессия переиспользует соединения с translator_service между отправками
+_session = requests.Session()
+
 
 def send_result_to_translator(result: str):
     """
@@ -23,7 +26,7 @@ def send_result_to_translator(result: str):
     }
 
     try:
-        response = requests.post(TRANSLATOR_SERVICE_URL, json=payload, timeout=10)
+        response = _session.post(TRANSLATOR_SERVICE_URL, json=payload, timeout=10)
         response.raise_for_status()
         logger.info(
             f"Результат успешно отправлен в translator_service: "
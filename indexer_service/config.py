@@ -3,12 +3,89 @@ import os
 OPENSEARCH_HOST = os.getenv("OPENSEARCH_HOST", "http://opensearch:9200")
 FILE_SERVICE_URL = os.getenv("FILE_SERVICE_URL", "http://file_service:9001")
 INDEX_NAME = os.getenv("INDEX_NAME", "docs")
-VECTOR_DIM = 10
+
+REDIS_HOST = os.getenv("REDIS_HOST", "redis")
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+VECTOR_DIM = int(os.getenv("VECTOR_DIM", 10))
 CHUNK_SIZE = 50
 
+# Параметры k-NN индекса (применяются к новым версиям индекса, см. mode=rebuild)
+KNN_ENGINE = os.getenv("KNN_ENGINE", "nmslib")  # nmslib | faiss | lucene
+KNN_SPACE_TYPE = os.getenv("KNN_SPACE_TYPE", "l2")
+KNN_M = int(os.getenv("KNN_M", 16))
+KNN_EF_CONSTRUCTION = int(os.getenv("KNN_EF_CONSTRUCTION", 100))
+KNN_EF_SEARCH = int(os.getenv("KNN_EF_SEARCH", 100))
+# Квантование векторов: none | fp16 (faiss) | byte (faiss/lucene)
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none")
+# Множитель для перевода float-векторов в диапазон int8 при VECTOR_QUANTIZATION=byte
+VECTOR_BYTE_SCALE = float(os.getenv("VECTOR_BYTE_SCALE", 127.0))
+
+# Размер одного чтения из потока file_service (байты)
+STREAM_READ_SIZE = int(os.getenv("STREAM_READ_SIZE", 64 * 1024))
+
+# Размер страницы списка файлов (GET /files/list)
+LIST_PAGE_SIZE = int(os.getenv("LIST_PAGE_SIZE", 1000))
+
+# Количество файлов в одном запросе пакетного чтения (POST /files/batch)
+FETCH_BATCH_FILES = int(os.getenv("FETCH_BATCH_FILES", 100))
+
+# Сжатие ответов file_service: auto (zstd, если доступен, и gzip), zstd, gzip или none.
+# Ответы распаковываются потоком по мере чтения
+FETCH_COMPRESSION = os.getenv("FETCH_COMPRESSION", "auto").lower()
+
+# Версионированные индексы: INDEX_NAME - алиас на <INDEX_NAME>_v<N>
+INDEX_REFRESH_INTERVAL = os.getenv("INDEX_REFRESH_INTERVAL", "1s")
+INDEX_REPLICAS = int(os.getenv("INDEX_REPLICAS", 1))
+INDEX_KEEP_VERSIONS = int(os.getenv("INDEX_KEEP_VERSIONS", 2))
+INDEX_FORCE_MERGE_SEGMENTS = int(os.getenv("INDEX_FORCE_MERGE_SEGMENTS", 1))
+
+# Инкрементальная индексация: пропуск неизменившихся файлов по манифесту
+INDEX_INCREMENTAL = os.getenv("INDEX_INCREMENTAL", "true").lower() == "true"
+MANIFEST_INDEX = os.getenv("MANIFEST_INDEX", f"{INDEX_NAME}_manifest")
+
+# Ключ Redis с номером поколения индекса: увеличивается после каждой индексации,
+# rag_service по нему сбрасывает кэш результатов поиска
+INDEX_GENERATION_KEY = os.getenv("INDEX_GENERATION_KEY", f"{INDEX_NAME}:generation")
+
+# Embedder: имя из реестра embedder.EMBEDDERS или путь вида "module:Class"
+EMBEDDER = os.getenv("EMBEDDER", "stub")
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 64))
+
+# Кэш векторов: локальный LRU (0 - выключен) и общий уровень в Redis
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", 100_000))
+EMBED_CACHE_REDIS = os.getenv("EMBED_CACHE_REDIS", "false").lower() == "true"
+EMBED_CACHE_REDIS_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_REDIS_MAX_ENTRIES", 1_000_000))
+
+# Параллелизм стадий pipeline индексации: чтение -> векторизация -> запись
+FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", 4))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", 2))
+WRITE_WORKERS = int(os.getenv("WRITE_WORKERS", 2))
+# Емкость очередей между стадиями (в пачках чанков)
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", 16))
+
+# Распределенная индексация: задание делится на партиции файлов,
+# которые разбирают все реплики indexer_service через очередь в Redis
+DISTRIBUTED_INDEXING = os.getenv("DISTRIBUTED_INDEXING", "false").lower() == "true"
+PARTITION_FILES = int(os.getenv("PARTITION_FILES", 100))
+PARTITION_LEASE_TTL = int(os.getenv("PARTITION_LEASE_TTL", 30))
+PARTITION_POLL_INTERVAL = float(os.getenv("PARTITION_POLL_INTERVAL", 1.0))
+
+# Пакетная запись в OpenSearch через _bulk API
+BULK_BATCH_DOCS = int(os.getenv("BULK_BATCH_DOCS", 500))
+BULK_BATCH_BYTES = int(os.getenv("BULK_BATCH_BYTES", 5 * 1024 * 1024))
+BULK_FLUSH_INTERVAL = float(os.getenv("BULK_FLUSH_INTERVAL", 5.0))
+BULK_MAX_RETRIES = int(os.getenv("BULK_MAX_RETRIES", 5))
+BULK_RETRY_BACKOFF = float(os.getenv("BULK_RETRY_BACKOFF", 0.5))
+BULK_MIN_BATCH_DOCS = int(os.getenv("BULK_MIN_BATCH_DOCS", 10))
+
+# Фоновые задания индексации
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", 1.0))
+JOB_LOCK_TTL = int(os.getenv("JOB_LOCK_TTL", 30))
+JOB_PROGRESS_INTERVAL = float(os.getenv("JOB_PROGRESS_INTERVAL", 1.0))
+JOB_TTL = int(os.getenv("JOB_TTL", 7 * 24 * 3600))
+
 # URL translator_service для отправки результатов
 TRANSLATOR_SERVICE_URL = os.getenv(
     "TRANSLATOR_SERVICE_URL",
     "http://translator_service:8005/result/indexer"
 )
-
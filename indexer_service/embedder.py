@@ -0,0 +1,94 @@
+"""
+Интерфейс embedder-а и выбор реализации по конфигурации.
+
+Все реализации получают тексты пачками: реальные модели эффективны
+только при батчевом инференсе.
+"""
+
+import functools
+import importlib
+from abc import ABC, abstractmethod
+import numpy as np
+from config import EMBEDDER, VECTOR_QUANTIZATION, VECTOR_BYTE_SCALE
+from logger import logger
+
+# Встроенные реализации: имя -> "module:Class"
+EMBEDDERS = {
+    "stub": "embeddings_stub:StubEmbedder",
+}
+
+
+class Embedder(ABC):
+    """
+    Базовый класс embedder-а.
+
+    Атрибуты
+    --------
+    model_id : str
+        Идентификатор модели (используется в ключах кэшей и логах).
+    dim : int
+        Размерность возвращаемых векторов.
+    """
+
+    model_id: str
+    dim: int
+
+    @abstractmethod
+    def embed_batch(self, texts: list[str]) -> np.ndarray:
+        """
+        Вычисляет векторы для пачки текстов.
+
+        Параметры
+        ---------
+        texts : list[str]
+            Тексты для векторизации.
+
+        Возвращает
+        ----------
+        np.ndarray
+            Матрица float32 формы (len(texts), dim).
+        """
+
+
+@functools.cache
+def get_embedder(name: str = EMBEDDER) -> Embedder:
+    """
+    Создает embedder по имени из реестра или по пути "module:Class".
+
+    Экземпляр создается один раз на процесс и оборачивается кэшем векторов
+    (см. embedding_cache), чтобы кэш сохранялся между заданиями индексации.
+
+    Параметры
+    ---------
+    name : str
+        Имя реализации.
+
+    Возвращает
+    ----------
+    Embedder
+        Экземпляр embedder-а.
+    """
+    target = EMBEDDERS.get(name, name)
+    module_name, _, class_name = target.partition(":")
+    if not class_name:
+        raise ValueError(f"Неизвестный embedder: {name}")
+
+    embedder_cls = getattr(importlib.import_module(module_name), class_name)
+    embedder = embedder_cls()
+    logger.info(f"Используется embedder {embedder.model_id} (dim={embedder.dim})")
+
+    # Импорт здесь: embedding_cache сам зависит от этого модуля
+    from embedding_cache import with_cache
+    return with_cache(embedder)
+
+
+def to_index_vector(vector: np.ndarray) -> list:
+    """
+    Преобразует вектор embedder-а в значение поля vector документа.
+
+    При VECTOR_QUANTIZATION=byte вектор масштабируется на VECTOR_BYTE_SCALE
+    и округляется до int8; иначе записывается как есть.
+    """
+    if VECTOR_QUANTIZATION == "byte":
+        return np.clip(np.rint(vector * VECTOR_BYTE_SCALE), -128, 127).astype(np.int8).tolist()
+    return vector.tolist()
@@ -0,0 +1,203 @@
+"""
+Кэш векторов перед embedder-ом.
+
+Ключ - хэш пары (model_id, текст чанка), поэтому повторная индексация
+неизменившихся файлов и одинаковые фрагменты в разных документах
+не векторизуются повторно.
+
+Уровни кэша:
+1. Локальный LRU в памяти процесса (EMBED_CACHE_SIZE записей).
+2. Необязательный общий уровень в Redis (EMBED_CACHE_REDIS), ограниченный
+   EMBED_CACHE_REDIS_MAX_ENTRIES записями; вытесняются давно не использованные.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from config import EMBED_CACHE_SIZE, EMBED_CACHE_REDIS, EMBED_CACHE_REDIS_MAX_ENTRIES
+from clients.redis import redis_binary_client
+from embedder import Embedder
+from logger import logger
+
+REDIS_KEY_PREFIX = "indexer:embcache:"
+REDIS_LRU_KEY = "indexer:embcache:lru"
+
+
+class RedisVectorStore:
+    """
+    Хранилище векторов в Redis с вытеснением давно не использованных.
+
+    Время последнего обращения к ключу хранится в отсортированном множестве.
+    """
+
+    def __init__(self, client, max_entries: int = EMBED_CACHE_REDIS_MAX_ENTRIES):
+        self.client = client
+        self.max_entries = max_entries
+        self.evictions = 0
+
+    def get_many(self, keys: list[str]) -> list[bytes | None]:
+        values = self.client.mget([REDIS_KEY_PREFIX + key for key in keys])
+        hits = {key: time.time() for key, value in zip(keys, values) if value is not None}
+        if hits:
+            self.client.zadd(REDIS_LRU_KEY, hits)
+        return values
+
+    def set_many(self, items: dict[str, bytes]):
+        now = time.time()
+        pipe = self.client.pipeline(transaction=False)
+        pipe.mset({REDIS_KEY_PREFIX + key: value for key, value in items.items()})
+        pipe.zadd(REDIS_LRU_KEY, {key: now for key in items})
+        pipe.zcard(REDIS_LRU_KEY)
+        size = pipe.execute()[-1]
+
+        excess = size - self.max_entries
+        if excess > 0:
+            evicted = [key for key, _ in self.client.zpopmin(REDIS_LRU_KEY, excess)]
+            if evicted:
+                self.client.delete(*[REDIS_KEY_PREFIX + key.decode() for key in evicted])
+                self.evictions += len(evicted)
+
+
+class CachedEmbedder(Embedder):
+    """
+    Embedder с кэшем векторов перед вложенной реализацией.
+
+    Параметры
+    ---------
+    inner : Embedder
+        Реальный embedder, вызываемый только для промахов кэша.
+    max_entries : int, optional
+        Емкость локального LRU.
+    store : RedisVectorStore, optional
+        Общий уровень кэша.
+    """
+
+    def __init__(self, inner: Embedder, max_entries: int = EMBED_CACHE_SIZE, store=None):
+        self.inner = inner
+        self.model_id = inner.model_id
+        self.dim = inner.dim
+        self.max_entries = max_entries
+        self.store = store
+
+        self._lru: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits_local = 0
+        self.hits_shared = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _key(self, text: str) -> str:
+        data = f"{self.model_id}\x00{text}".encode("utf-8")
+        return hashlib.sha256(data).hexdigest()
+
+    def embed_batch(self, texts: list[str]) -> np.ndarray:
+        keys = [self._key(text) for text in texts]
+        vectors = np.empty((len(texts), self.dim), dtype=np.float32)
+        missing: dict[str, list[int]] = {}
+
+        with self._lock:
+            for row, key in enumerate(keys):
+                cached = self._lru.get(key)
+                if cached is None:
+                    missing.setdefault(key, []).append(row)
+                else:
+                    self._lru.move_to_end(key)
+                    vectors[row] = cached
+            self.hits_local += len(texts) - sum(map(len, missing.values()))
+
+        if missing and self.store is not None:
+            found = self._fetch_shared(list(missing), vectors, missing)
+            for key in found:
+                del missing[key]
+
+        if missing:
+            # Одинаковые тексты внутри пачки векторизуются один раз
+            rows = [positions[0] for positions in missing.values()]
+            computed = self.inner.embed_batch([texts[row] for row in rows])
+            for (key, positions), vector in zip(missing.items(), computed):
+                vectors[positions] = vector
+                self._remember(key, vector)
+            if self.store is not None:
+                self._store_shared(dict(zip(missing, computed)))
+            with self._lock:
+                self.misses += sum(map(len, missing.values()))
+
+        return vectors
+
+    def _fetch_shared(self, keys: list[str], vectors: np.ndarray, positions: dict) -> list[str]:
+        try:
+            values = self.store.get_many(keys)
+        except Exception as e:
+            logger.warning(f"Общий кэш векторов недоступен: {e}")
+            return []
+
+        found = []
+        for key, value in zip(keys, values):
+            if value is None or len(value) != self.dim * 4:
+                continue
+            vector = np.frombuffer(value, dtype=np.float32)
+            vectors[positions[key]] = vector
+            self._remember(key, vector)
+            found.append(key)
+
+        with self._lock:
+            self.hits_shared += sum(len(positions[key]) for key in found)
+        return found
+
+    def _store_shared(self, items: dict[str, np.ndarray]):
+        try:
+            self.store.set_many(
+                {key: np.asarray(vector, dtype=np.float32).tobytes() for key, vector in items.items()}
+            )
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить векторы в общий кэш: {e}")
+
+    def _remember(self, key: str, vector: np.ndarray):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._lru[key] = np.array(vector, dtype=np.float32)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        """
+        Возвращает статистику кэша.
+
+        Возвращает
+        ----------
+        dict
+            Попадания по уровням, промахи, доля попаданий, размер и вытеснения.
+        """
+        with self._lock:
+            hits = self.hits_local + self.hits_shared
+            total = hits + self.misses
+            return {
+                "model_id": self.model_id,
+                "hits_local": self.hits_local,
+                "hits_shared": self.hits_shared,
+                "misses": self.misses,
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+                "local_entries": len(self._lru),
+                "local_evictions": self.evictions,
+                "shared_evictions": self.store.evictions if self.store else 0,
+            }
+
+
+def with_cache(embedder: Embedder) -> Embedder:
+    """Оборачивает embedder кэшем согласно конфигурации."""
+    if EMBED_CACHE_SIZE <= 0 and not EMBED_CACHE_REDIS:
+        return embedder
+
+    store = RedisVectorStore(redis_binary_client) if EMBED_CACHE_REDIS else None
+
+    logger.info(
+        f"Кэш векторов включен: локально {EMBED_CACHE_SIZE} записей, "
+        f"Redis: {'да' if store else 'нет'}"
+    )
+    return CachedEmbedder(embedder, max_entries=max(EMBED_CACHE_SIZE, 0), store=store)
@@ -1,7 +1,31 @@
+import hashlib
 import numpy as np
 from config import VECTOR_DIM
+from embedder import Embedder
+
 
 def generate_vector():
     """Имитация работы embedder-а."""
     return np.random.rand(VECTOR_DIM).tolist()
 
+
+class StubEmbedder(Embedder):
+    """
+    Детерминированная заглушка embedder-а.
+
+    Вектор текста генерируется ГПСЧ, инициализированным хэшем текста,
+    поэтому одинаковый текст всегда дает одинаковый вектор.
+    """
+
+    model_id = "stub-blake2b-v1"
+
+    def __init__(self, dim: int = VECTOR_DIM):
+        self.dim = dim
+
+    def embed_batch(self, texts: list[str]) -> np.ndarray:
+        vectors = np.empty((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+            rng = np.random.default_rng(int.from_bytes(digest, "little"))
+            vectors[row] = rng.random(self.dim, dtype=np.float32)
+        return vectors
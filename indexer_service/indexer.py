@@ -4,32 +4,104 @@
 """
 
 import json
+from config import INDEX_INCREMENTAL, INDEX_GENERATION_KEY
 from logger import logger
+from clients.redis import redis_client
 from clients.translator_service_internal import send_result_to_translator
 from indexer_service_module import index_all_files
-from clients.opensearch import ensure_index
+from manifest import Manifest
+from pipeline import Progress
+from clients.opensearch import ensure_index, create_rebuild_index, publish_index, drop_index
 
+# Режимы индексации:
+# incremental - только изменившиеся файлы в текущий индекс;
+# full - все файлы в текущий индекс;
+# rebuild - все файлы в новую версию индекса с переключением алиаса.
+INDEX_MODES = ("incremental", "full", "rebuild")
 
-def run_indexing_pipeline():
+
+def default_mode() -> str:
+    return "incremental" if INDEX_INCREMENTAL else "full"
+
+
+def _rebuild(progress: Progress | None) -> int:
+    """Строит новую версию индекса и переключает на нее алиас."""
+    target = create_rebuild_index()
+    manifest = Manifest.load()
+    try:
+        total = index_all_files(incremental=False, progress=progress, index=target, manifest=manifest)
+        # publish_index бросает исключение только до переключения алиаса
+        publish_index(target)
+    except Exception:
+        # Алиас не переключен, поиск продолжает работать по старой версии;
+        # недостроенную удаляем. Манифест не сохранялся и по-прежнему
+        # описывает старую версию
+        drop_index(target)
+        raise
+    # Манифест описывает новую версию только после переключения алиаса
+    manifest.save()
+    return total
+
+
+def _bump_generation():
+    """
+    Увеличивает поколение индекса, чтобы rag_service сбросил кэш результатов.
+
+    Вызывается и после неудачной индексации: часть чанков могла быть записана.
+    """
+    try:
+        generation = redis_client.incr(INDEX_GENERATION_KEY)
+        logger.info(f"Поколение индекса: {generation}")
+    except Exception as e:
+        logger.warning(f"Не удалось обновить поколение индекса: {e}")
+
+
+def run_indexing_pipeline(
+    mode: str | None = None,
+    progress: Progress | None = None,
+    job_id: str | None = None,
+) -> dict:
     """
     Запускает реальную индексацию файлов и отправляет результат в translator_service.
+
+    Параметры
+    ---------
+    mode : str, optional
+        Режим индексации из INDEX_MODES. По умолчанию определяется INDEX_INCREMENTAL.
+    progress : Progress, optional
+        Счетчики прогресса задания.
+    job_id : str, optional
+        Идентификатор задания; добавляется в результат.
+
+    Возвращает
+    ----------
+    dict
+        Результат индексации, отправленный в translator_service.
     """
-    logger.info("Запуск pipeline индексации...")
-    
-    # Убеждаемся, что индекс создан
-    ensure_index()
-    
+    mode = mode or default_mode()
+    logger.info(f"Запуск pipeline индексации (режим: {mode})...")
+
     # Запускаем индексацию
     try:
-        total = index_all_files()
+        if mode == "rebuild":
+            total = _rebuild(progress)
+        else:
+            # Убеждаемся, что индекс создан; в новый индекс нужно записать все файлы
+            created = ensure_index()
+            incremental = mode == "incremental" and not created
+            total = index_all_files(incremental=incremental, progress=progress)
         result = {"status": "ok", "count": total}
         logger.info(f"Индексация завершена успешно: создано {total} чанков.")
     except Exception as e:
         logger.error(f"Ошибка при индексации: {e}", exc_info=True)
         result = {"status": "error", "message": str(e), "count": 0}
+    _bump_generation()
+
+    if job_id:
+        result["job_id"] = job_id
     
     # Отправляем результат в translator_service
     body = json.dumps(result)
     send_result_to_translator(body)
     logger.info("Результат индексации отправлен в translator_service")
-
+    return result
@@ -1,90 +1,121 @@
 """
 Реальная логика индексации файлов в OpenSearch.
 """
-from config import CHUNK_SIZE, INDEX_NAME
-from clients.file_service_internal import list_files, fetch_file
-from clients.opensearch import client
+from config import INDEX_INCREMENTAL, INDEX_NAME, VECTOR_DIM, DISTRIBUTED_INDEXING
+from clients.file_service_internal import list_files_meta
+from clients.opensearch import delete_stale_chunks, delete_documents
+from manifest import Manifest
+from pipeline import IndexingPipeline, Progress
+from partitions import run_partitioned
 from logger import logger
-from embeddings_stub import generate_vector
+from embedder import get_embedder
 
 
-def chunk_text(text: str, size: int) -> list[str]:
+def index_all_files(
+    incremental: bool = INDEX_INCREMENTAL,
+    progress: Progress | None = None,
+    index: str = INDEX_NAME,
+    manifest: Manifest | None = None,
+) -> int:
     """
-    Разбивает текст на чанки заданного размера.
-    
-    Параметры
-    ---------
-    text : str
-        Текст для разбиения.
-    size : int
-        Размер чанка.
+    Индексирует все файлы из file_service в OpenSearch.
     
-    Возвращает
-    ----------
-    list[str]
-        Список чанков текста.
-    """
-    return [text[i:i+size] for i in range(0, len(text), size)]
+    В инкрементальном режиме файлы, etag которых в списке file_service совпадает
+    с манифестом, пропускаются без запросов их содержимого. Остальные файлы
+    обрабатываются конкурентным IndexingPipeline, а при DISTRIBUTED_INDEXING
+    раздаются партициями всем репликам indexer_service. Для каждого файла:
+    1. Читает содержимое (пачками файлов или потоком)
+    2. Разбивает содержимое на чанки
+    3. Генерирует векторы пачками по EMBED_BATCH_SIZE чанков
+    4. Записывает документы в OpenSearch пачками через BulkWriter
 
+    После записи удаляет чанки прежних версий измененных файлов
+    и все чанки удаленных файлов, затем сохраняет манифест (если манифест
+    передан вызывающим, сохранять его должен вызывающий).
 
-def index_all_files() -> int:
-    """
-    Индексирует все файлы из file_service в OpenSearch.
-    
-    Для каждого файла:
-    1. Получает содержимое
-    2. Разбивает на чанки
-    3. Генерирует вектор для каждого чанка
-    4. Сохраняет в OpenSearch
+    Параметры
+    ---------
+    incremental : bool
+        Пропускать файлы, не изменившиеся с прошлой индексации.
+    progress : Progress, optional
+        Счетчики прогресса для отображения состояния задания.
+    index : str
+        Индекс (или алиас) для записи чанков.
+    manifest : Manifest, optional
+        Манифест, который обновляется без сохранения. Нужен, когда
+        манифест можно сохранить только после публикации индекса.
     
     Возвращает
     ----------
     int
         Общее количество проиндексированных чанков.
     """
-    logger.info("Начало индексации файлов...")
-    files = list_files()
+    logger.info(f"Начало индексации файлов (инкрементально: {incremental})...")
+    listing = list_files_meta()
+    files = [meta["name"] for meta in listing]
     logger.info(f"Найдено файлов для индексации: {len(files)}")
-    
-    total = 0
 
-    for file_name in files:
-        try:
-            text = fetch_file(file_name)
-            chunks = chunk_text(text, CHUNK_SIZE)
-            logger.info(f"Обработка файла {file_name}: {len(chunks)} чанков")
+    progress = progress or Progress()
+    progress.files_total = len(files)
 
-            for i, chunk in enumerate(chunks):
-                vec = generate_vector()
+    save_manifest = manifest is None
+    if manifest is None:
+        manifest = Manifest.load()
+    previous = set(manifest.entries)
+    if incremental:
+        changed = [meta["name"] for meta in listing if not manifest.is_unchanged(meta)]
+    else:
+        manifest.clear()
+        changed = files
+    skipped = len(files) - len(changed)
+    progress.add_files(skipped)
 
-                # Используем правильный API для OpenSearch
-                document = {
-                    "doc_id": file_name,
-                    "chunk_id": i,
-                    "content": chunk,
-                    "vector": vec,
-                }
-                
-                # В новых версиях opensearch-py используется document вместо body
-                try:
-                    client.index(
-                        index=INDEX_NAME,
-                        document=document
-                    )
-                except TypeError:
-                    # Fallback для старых версий
-                    client.index(
-                        index=INDEX_NAME,
-                        body=document
-                    )
+    embedder = get_embedder()
+    if embedder.dim != VECTOR_DIM:
+        raise ValueError(
+            f"Размерность embedder-а {embedder.model_id} ({embedder.dim}) "
+            f"не совпадает с VECTOR_DIM={VECTOR_DIM}"
+        )
 
-                total += 1
+    if DISTRIBUTED_INDEXING:
+        result = run_partitioned(changed, index, progress=progress)
+    else:
+        result = IndexingPipeline(embedder, progress=progress, index=index)
+        result.run(changed)
 
-            logger.info(f"Проиндексировано {len(chunks)} чанков из файла {file_name}")
-        except Exception as e:
-            logger.error(f"Ошибка при индексации файла {file_name}: {e}")
-            continue
+    # Количество считается по ответам _bulk, а не по отправленным документам
+    total = result.indexed
 
-    logger.info(f"Индексация завершена. Всего проиндексировано чанков: {total}")
-    return total
+    # Файлы с незаписанными чанками не попадают в манифест и будут
+    # переиндексированы при следующем запуске
+    done = {
+        name: value for name, value in result.files.items()
+        if name not in result.failed_files
+    }
+    if done:
+        stale = delete_stale_chunks(
+            {name: meta["etag"] for name, (meta, _) in done.items()}, index=index
+        )
+        logger.info(f"Удалено устаревших чанков измененных файлов: {stale}")
+    for meta, chunks_count in done.values():
+        manifest.update(meta, chunks_count)
 
+    removed = sorted(previous - set(files))
+    if removed:
+        deleted = delete_documents(removed, index=index)
+        logger.info(f"Удалено чанков {deleted} из {len(removed)} удаленных файлов")
+        for name in removed:
+            manifest.remove(name)
+
+    if save_manifest:
+        manifest.save()
+
+    if hasattr(embedder, "stats"):
+        logger.info(f"Кэш векторов: {embedder.stats()}")
+
+    logger.info(
+        f"Индексация завершена. Всего проиндексировано чанков: {total}, "
+        f"пропущено неизменившихся файлов: {skipped + result.skipped}, "
+        f"с ошибками: {len(result.failed_files)}"
+    )
+    return total
@@ -0,0 +1,230 @@
+"""
+Фоновые задания индексации.
+
+POST /index только ставит задание в очередь и сразу возвращает его id.
+Состояние заданий хранится в Redis, поэтому прогресс доступен через
+любую реплику indexer_service, а одновременно выполняется не больше
+одного задания на все реплики (блокировка в Redis).
+
+Повторные запросы, пришедшие пока задание ожидает запуска, объединяются
+с ним: в очереди всегда не больше одного задания.
+"""
+
+import threading
+import time
+import uuid
+from config import (
+    JOB_POLL_INTERVAL,
+    JOB_LOCK_TTL,
+    JOB_PROGRESS_INTERVAL,
+    JOB_TTL,
+)
+from clients.redis import redis_client
+from indexer import run_indexing_pipeline, default_mode
+from pipeline import Progress
+from logger import logger
+
+JOB_KEY_PREFIX = "indexer:job:"
+PENDING_KEY = "indexer:jobs:pending"
+RUNNING_KEY = "indexer:jobs:running"
+LOCK_KEY = "indexer:jobs:lock"
+
+# Атомарно присоединяет запрос к ожидающему заданию или создает новое.
+# Более сильный режим поглощает более слабый: rebuild > full > incremental.
+_SUBMIT_SCRIPT = redis_client.register_script("""
+local rank = {incremental = 1, full = 2, rebuild = 3}
+local pending = redis.call('GET', KEYS[1])
+if pending then
+    local current = redis.call('HGET', ARGV[5] .. pending, 'mode')
+    if (rank[ARGV[2]] or 0) > (rank[current] or 0) then
+        redis.call('HSET', ARGV[5] .. pending, 'mode', ARGV[2])
+    end
+    redis.call('HINCRBY', ARGV[5] .. pending, 'triggers', 1)
+    return {pending, 1}
+end
+local key = ARGV[5] .. ARGV[1]
+redis.call('SET', KEYS[1], ARGV[1])
+redis.call('HSET', key, 'id', ARGV[1], 'status', 'pending', 'mode', ARGV[2],
+           'created_at', ARGV[3], 'triggers', 1)
+redis.call('EXPIRE', key, ARGV[4])
+return {ARGV[1], 0}
+""")
+
+# Забирает ожидающее задание на выполнение
+_CLAIM_SCRIPT = redis_client.register_script("""
+local pending = redis.call('GET', KEYS[1])
+if not pending then
+    return false
+end
+redis.call('DEL', KEYS[1])
+redis.call('SET', KEYS[2], pending)
+redis.call('HSET', ARGV[1] .. pending, 'status', 'running', 'started_at', ARGV[2])
+return pending
+""")
+
+# Продлевает или снимает блокировку, только если она принадлежит владельцу
+_RENEW_SCRIPT = redis_client.register_script("""
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+""")
+_RELEASE_SCRIPT = redis_client.register_script("""
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+""")
+
+
+def submit_job(mode: str | None = None) -> dict:
+    """
+    Ставит задание индексации в очередь или присоединяется к ожидающему.
+
+    Параметры
+    ---------
+    mode : str, optional
+        Режим индексации из indexer.INDEX_MODES. По умолчанию определяется INDEX_INCREMENTAL.
+
+    Возвращает
+    ----------
+    dict
+        {"job_id": ..., "coalesced": True, если запрос объединен с уже ожидающим заданием}.
+    """
+    mode = mode or default_mode()
+
+    job_id, coalesced = _SUBMIT_SCRIPT(
+        keys=[PENDING_KEY],
+        args=[uuid.uuid4().hex, mode, time.time(), JOB_TTL, JOB_KEY_PREFIX],
+    )
+    if coalesced:
+        logger.info(f"Запрос на индексацию объединен с ожидающим заданием {job_id}")
+    else:
+        logger.info(f"Создано задание индексации {job_id} (режим: {mode})")
+    return {"job_id": job_id, "coalesced": bool(coalesced)}
+
+
+def get_job(job_id: str) -> dict | None:
+    """
+    Возвращает состояние задания.
+
+    Параметры
+    ---------
+    job_id : str
+        Идентификатор задания.
+
+    Возвращает
+    ----------
+    dict | None
+        Поля задания или None, если задание не найдено.
+    """
+    job = redis_client.hgetall(JOB_KEY_PREFIX + job_id)
+    return job or None
+
+
+class JobRunner:
+    """
+    Фоновый поток, выполняющий задания из очереди.
+
+    Запускается в каждой реплике; задание выполняет та реплика,
+    которая первой захватила блокировку.
+    """
+
+    def __init__(self):
+        self._token = uuid.uuid4().hex
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="indexer-jobs", daemon=True)
+
+    def start(self):
+        logger.info("Запуск обработчика заданий индексации")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(JOB_POLL_INTERVAL):
+            try:
+                if redis_client.exists(PENDING_KEY) and self._acquire():
+                    try:
+                        self._run_pending()
+                    finally:
+                        _RELEASE_SCRIPT(keys=[LOCK_KEY], args=[self._token])
+            except Exception as e:
+                logger.error(f"Ошибка обработчика заданий: {e}", exc_info=True)
+
+    def _acquire(self) -> bool:
+        return bool(redis_client.set(LOCK_KEY, self._token, nx=True, ex=JOB_LOCK_TTL))
+
+    def _run_pending(self):
+        # Задание, оставшееся "running" после падения реплики, уже не выполняется:
+        # блокировка истекла, иначе мы не смогли бы ее захватить
+        stale = redis_client.get(RUNNING_KEY)
+        if stale:
+            redis_client.hset(JOB_KEY_PREFIX + stale, mapping={
+                "status": "error",
+                "message": "Задание прервано: реплика indexer_service остановилась",
+                "finished_at": time.time(),
+            })
+            redis_client.delete(RUNNING_KEY)
+
+        job_id = _CLAIM_SCRIPT(
+            keys=[PENDING_KEY, RUNNING_KEY], args=[JOB_KEY_PREFIX, time.time()]
+        )
+        if not job_id:
+            return
+
+        key = JOB_KEY_PREFIX + job_id
+        mode = redis_client.hget(key, "mode")
+        logger.info(f"Запуск задания индексации {job_id} (режим: {mode})")
+
+        progress = Progress()
+        done = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat, args=(key, progress, done), daemon=True
+        )
+        heartbeat.start()
+
+        try:
+            result = run_indexing_pipeline(mode=mode, progress=progress, job_id=job_id)
+            status = result["status"]
+            fields = {"count": result["count"], "message": result.get("message", "")}
+        except Exception as e:
+            logger.error(f"Задание индексации {job_id} завершилось ошибкой: {e}", exc_info=True)
+            status = "error"
+            fields = {"message": str(e)}
+        finally:
+            done.set()
+            heartbeat.join()
+
+        redis_client.hset(key, mapping={
+            **self._progress_fields(progress),
+            **fields,
+            "status": "done" if status == "ok" else "error",
+            "finished_at": time.time(),
+        })
+        redis_client.expire(key, JOB_TTL)
+        redis_client.delete(RUNNING_KEY)
+        logger.info(f"Задание индексации {job_id} завершено со статусом {status}")
+
+    def _heartbeat(self, key: str, progress: Progress, done: threading.Event):
+        """Продлевает блокировку и публикует прогресс, пока задание выполняется."""
+        renew_every = max(JOB_LOCK_TTL / 3, 0.1)
+        last_renew = time.monotonic()
+        while not done.wait(JOB_PROGRESS_INTERVAL):
+            try:
+                redis_client.hset(key, mapping=self._progress_fields(progress))
+                if time.monotonic() - last_renew >= renew_every:
+                    if not _RENEW_SCRIPT(keys=[LOCK_KEY], args=[self._token, JOB_LOCK_TTL * 1000]):
+                        logger.warning("Блокировка заданий индексации потеряна")
+                    last_renew = time.monotonic()
+            except Exception as e:
+                logger.warning(f"Не удалось обновить состояние задания: {e}")
+
+    @staticmethod
+    def _progress_fields(progress: Progress) -> dict:
+        snapshot = progress.snapshot()
+        # Redis не хранит None
+        if snapshot["eta_sec"] is None:
+            snapshot["eta_sec"] = ""
+        return snapshot
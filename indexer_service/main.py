@@ -1,13 +1,51 @@
-from fastapi import FastAPI
-from indexer import run_indexing_pipeline
+from fastapi import FastAPI, HTTPException
+from config import DISTRIBUTED_INDEXING
+from jobs import JobRunner, submit_job, get_job
+from partitions import PartitionWorker
+from indexer import INDEX_MODES
+from embedder import get_embedder
 from logger import logger
 
 app = FastAPI()
 
+job_runner = JobRunner()
+partition_worker = PartitionWorker() if DISTRIBUTED_INDEXING else None
+
+
+@app.on_event("startup")
+def startup():
+    job_runner.start()
+    if partition_worker:
+        partition_worker.start()
+
+
+@app.on_event("shutdown")
+def shutdown():
+    job_runner.stop()
+    if partition_worker:
+        partition_worker.stop()
+
+
 @app.post("/index")
-def trigger_indexing():
-    logger.info("Получен запрос на индексацию.")
-    run_indexing_pipeline()
-    return {"status": "accepted"}
+def trigger_indexing(mode: str | None = None):
+    logger.info(f"Получен запрос на индексацию (режим: {mode or 'по умолчанию'}).")
+    if mode is not None and mode not in INDEX_MODES:
+        raise HTTPException(status_code=400, detail=f"Неизвестный режим индексации: {mode}")
+    job = submit_job(mode)
+    return {"status": "accepted", **job}
+
+
+@app.get("/jobs/{job_id}")
+def get_job_status(job_id: str):
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 
+@app.get("/metrics/embedding-cache")
+def embedding_cache_stats():
+    embedder = get_embedder()
+    if not hasattr(embedder, "stats"):
+        return {"enabled": False}
+    return {"enabled": True, **embedder.stats()}
@@ -0,0 +1,118 @@
+"""
+Манифест проиндексированных файлов для инкрементальной индексации.
+
+Для каждого файла хранит etag (sha256 содержимого), размер, время изменения
+и количество чанков. Манифест лежит в отдельном индексе OpenSearch, поэтому
+он общий для всех реплик indexer_service и переживает перезапуск контейнера.
+"""
+
+import hashlib
+import time
+from opensearchpy.helpers import bulk, scan
+from clients.opensearch import client
+from config import MANIFEST_INDEX
+from logger import logger
+
+
+def _entry_id(name: str) -> str:
+    return hashlib.sha1(name.encode("utf-8")).hexdigest()
+
+
+class Manifest:
+    """
+    Манифест файлов, загруженный в память.
+
+    Изменения накапливаются и записываются одной пачкой в save().
+    """
+
+    def __init__(self):
+        self.entries: dict[str, dict] = {}
+        self._updated: dict[str, dict] = {}
+        self._removed: set[str] = set()
+
+    @classmethod
+    def load(cls) -> "Manifest":
+        """Загружает манифест из OpenSearch, создавая индекс при необходимости."""
+        manifest = cls()
+        if not client.indices.exists(index=MANIFEST_INDEX):
+            client.indices.create(
+                index=MANIFEST_INDEX,
+                body={
+                    "mappings": {
+                        "properties": {
+                            "name": {"type": "keyword"},
+                            "etag": {"type": "keyword"},
+                            "size": {"type": "long"},
+                            "mtime": {"type": "double"},
+                            "chunks": {"type": "integer"},
+                            "indexed_at": {"type": "double"},
+                        }
+                    }
+                },
+            )
+            logger.info(f"Создан индекс манифеста {MANIFEST_INDEX}")
+            return manifest
+
+        for hit in scan(client, index=MANIFEST_INDEX, query={"query": {"match_all": {}}}):
+            entry = hit["_source"]
+            manifest.entries[entry["name"]] = entry
+
+        logger.info(f"Загружен манифест: {len(manifest.entries)} файлов")
+        return manifest
+
+    def is_unchanged(self, meta: dict) -> bool:
+        """
+        Проверяет, совпадает ли файл с уже проиндексированной версией.
+
+        Параметры
+        ---------
+        meta : dict
+            Метаданные файла от file_service (name, size, mtime, etag).
+        """
+        entry = self.entries.get(meta["name"])
+        return entry is not None and entry["etag"] == meta["etag"]
+
+    def update(self, meta: dict, chunks: int):
+        """Запоминает новую проиндексированную версию файла."""
+        entry = {
+            "name": meta["name"],
+            "etag": meta["etag"],
+            "size": meta["size"],
+            "mtime": meta["mtime"],
+            "chunks": chunks,
+            "indexed_at": time.time(),
+        }
+        self.entries[meta["name"]] = entry
+        self._updated[meta["name"]] = entry
+        self._removed.discard(meta["name"])
+
+    def remove(self, name: str):
+        """Удаляет файл из манифеста."""
+        self.entries.pop(name, None)
+        self._updated.pop(name, None)
+        self._removed.add(name)
+
+    def clear(self):
+        """Забывает все файлы (полная переиндексация)."""
+        for name in list(self.entries):
+            self.remove(name)
+
+    def save(self):
+        """Записывает накопленные изменения в OpenSearch."""
+        actions = [
+            {"_index": MANIFEST_INDEX, "_id": _entry_id(name), "_source": entry}
+            for name, entry in self._updated.items()
+        ]
+        actions += [
+            {"_op_type": "delete", "_index": MANIFEST_INDEX, "_id": _entry_id(name)}
+            for name in self._removed
+        ]
+        if actions:
+            # Отсутствующие при удалении записи (404) ошибкой не считаются
+            bulk(client, actions, raise_on_error=False)
+            logger.info(
+                f"Манифест сохранен: обновлено {len(self._updated)}, "
+                f"удалено {len(self._removed)}"
+            )
+        self._updated.clear()
+        self._removed.clear()
@@ -0,0 +1,291 @@
+"""
+Распределенная индексация по партициям файлов.
+
+Реплика, захватившая задание (координатор), делит список файлов на партиции
+по PARTITION_FILES файлов и кладет их в общую очередь в Redis. Партиции
+разбирают потоки PartitionWorker во всех репликах, включая координатора.
+
+Взятая партиция защищена арендой (ключ с TTL), которую исполнитель продлевает,
+пока обрабатывает ее. Если реплика упала, аренда истекает, и координатор
+возвращает партицию в очередь. Повторная обработка безопасна: идентификаторы
+чанков детерминированы, а в результатах учитывается только первый ответ.
+
+Манифест, удаление устаревших чанков и итоговый счетчик остаются
+за координатором, который собирает результаты всех партиций.
+"""
+
+import json
+import threading
+import time
+import uuid
+from config import (
+    JOB_TTL,
+    PARTITION_FILES,
+    PARTITION_LEASE_TTL,
+    PARTITION_POLL_INTERVAL,
+)
+from clients.redis import redis_client
+from embedder import get_embedder
+from pipeline import IndexingPipeline, Progress
+from logger import logger
+
+QUEUE_KEY = "indexer:partitions:queue"
+PROCESSING_KEY = "indexer:partitions:processing"
+LEASE_KEY_PREFIX = "indexer:partitions:lease:"
+RUN_KEY_PREFIX = "indexer:partitions:run:"
+
+# Берет партицию из очереди и сразу же оформляет аренду, чтобы
+# координатор не счел ее брошенной между этими двумя шагами
+_CLAIM_SCRIPT = redis_client.register_script("""
+local entry = redis.call('LMOVE', KEYS[1], KEYS[2], 'RIGHT', 'LEFT')
+if not entry then
+    return false
+end
+redis.call('SET', ARGV[1] .. entry, ARGV[2], 'PX', ARGV[3])
+return entry
+""")
+
+# Продлевает аренду, только если она принадлежит исполнителю
+_RENEW_SCRIPT = redis_client.register_script("""
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+""")
+
+# Сохраняет результат партиции; побеждает первый завершивший исполнитель
+_COMPLETE_SCRIPT = redis_client.register_script("""
+redis.call('LREM', KEYS[1], 0, ARGV[1])
+if redis.call('GET', KEYS[2]) == ARGV[2] then
+    redis.call('DEL', KEYS[2])
+end
+return redis.call('HSETNX', KEYS[3], ARGV[3], ARGV[4])
+""")
+
+# Возвращает в очередь партиции, аренда которых истекла
+_REAP_SCRIPT = redis_client.register_script("""
+local requeued = 0
+for _, entry in ipairs(redis.call('LRANGE', KEYS[1], 0, -1)) do
+    if redis.call('EXISTS', ARGV[1] .. entry) == 0 then
+        redis.call('LREM', KEYS[1], 0, entry)
+        redis.call('LPUSH', KEYS[2], entry)
+        requeued = requeued + 1
+    end
+end
+return requeued
+""")
+
+
+def _run_keys(run_id: str) -> tuple[str, str, str]:
+    """Ключи хэшей запуска: описания партиций, результаты и прогресс."""
+    prefix = RUN_KEY_PREFIX + run_id
+    return f"{prefix}:payload", f"{prefix}:results", f"{prefix}:progress"
+
+
+class PartitionedRun:
+    """
+    Результат распределенной индексации, собранный из результатов партиций.
+
+    Атрибуты совпадают с атрибутами IndexingPipeline после run().
+    """
+
+    def __init__(self):
+        self.indexed = 0
+        self.files: dict[str, tuple[dict, int]] = {}
+        self.failed_files: set[str] = set()
+        self.skipped = 0
+
+    def merge(self, result: dict):
+        self.indexed += result["indexed"]
+        self.skipped += result["skipped"]
+        self.failed_files.update(result["failed"])
+        for name, (meta, chunks) in result["files"].items():
+            self.files[name] = (meta, chunks)
+
+
+def run_partitioned(
+    files: list[str],
+    index: str,
+    progress: Progress | None = None,
+) -> PartitionedRun:
+    """
+    Раздает файлы партициями всем репликам и дожидается результатов.
+
+    Параметры
+    ---------
+    files : list[str]
+        Имена файлов для индексации.
+    index : str
+        Индекс (или алиас) для записи чанков.
+    progress : Progress, optional
+        Счетчики прогресса; к ним добавляется прогресс всех исполнителей.
+
+    Возвращает
+    ----------
+    PartitionedRun
+        Суммарные результаты всех партиций.
+    """
+    run_id = uuid.uuid4().hex
+    payload_key, results_key, progress_key = _run_keys(run_id)
+    partitions = {
+        str(number): json.dumps({"index": index, "files": part})
+        for number, part in enumerate(
+            files[i:i + PARTITION_FILES] for i in range(0, len(files), PARTITION_FILES)
+        )
+    }
+    run = PartitionedRun()
+    if not partitions:
+        return run
+
+    entries = [f"{run_id}:{number}" for number in partitions]
+    progress = progress or Progress()
+    base = progress.snapshot()
+    pipe = redis_client.pipeline()
+    pipe.hset(payload_key, mapping=partitions)
+    pipe.expire(payload_key, JOB_TTL)
+    pipe.lpush(QUEUE_KEY, *entries)
+    pipe.execute()
+    logger.info(
+        f"Индексация {run_id} разделена на {len(partitions)} партиций "
+        f"по {PARTITION_FILES} файлов"
+    )
+
+    try:
+        while True:
+            requeued = _REAP_SCRIPT(
+                keys=[PROCESSING_KEY, QUEUE_KEY], args=[LEASE_KEY_PREFIX]
+            )
+            if requeued:
+                logger.warning(f"Возвращено в очередь партиций с истекшей арендой: {requeued}")
+
+            counts = [
+                tuple(map(int, value.split(":")))
+                for value in redis_client.hvals(progress_key)
+            ]
+            progress.set_counts(
+                files_done=base["files_done"] + sum(files for files, _ in counts),
+                chunks_done=base["chunks_done"] + sum(chunks for _, chunks in counts),
+            )
+
+            completed = redis_client.hlen(results_key)
+            if completed >= len(partitions):
+                break
+            time.sleep(PARTITION_POLL_INTERVAL)
+
+        for value in redis_client.hvals(results_key):
+            run.merge(json.loads(value))
+    finally:
+        pipe = redis_client.pipeline()
+        for entry in entries:
+            pipe.lrem(QUEUE_KEY, 0, entry)
+            pipe.lrem(PROCESSING_KEY, 0, entry)
+        pipe.delete(payload_key, results_key, progress_key)
+        pipe.execute()
+
+    logger.info(f"Собраны результаты {len(partitions)} партиций индексации {run_id}")
+    return run
+
+
+class PartitionWorker:
+    """
+    Фоновый поток, обрабатывающий партиции из общей очереди.
+
+    Запускается в каждой реплике при DISTRIBUTED_INDEXING.
+    """
+
+    def __init__(self):
+        self._token = uuid.uuid4().hex
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="indexer-partitions", daemon=True)
+
+    def start(self):
+        logger.info("Запуск обработчика партиций индексации")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                entry = _CLAIM_SCRIPT(
+                    keys=[QUEUE_KEY, PROCESSING_KEY],
+                    args=[LEASE_KEY_PREFIX, self._token, PARTITION_LEASE_TTL * 1000],
+                )
+                if entry:
+                    self._process(entry)
+                    continue
+            except Exception as e:
+                logger.error(f"Ошибка обработчика партиций: {e}", exc_info=True)
+            self._stop.wait(PARTITION_POLL_INTERVAL)
+
+    def _process(self, entry: str):
+        run_id, number = entry.rsplit(":", 1)
+        payload_key, results_key, progress_key = _run_keys(run_id)
+        lease_key = LEASE_KEY_PREFIX + entry
+
+        raw = redis_client.hget(payload_key, number)
+        if raw is None:
+            # Координатор уже завершил или бросил этот запуск
+            redis_client.lrem(PROCESSING_KEY, 0, entry)
+            redis_client.delete(lease_key)
+            return
+        partition = json.loads(raw)
+        files = partition["files"]
+        logger.info(f"Обработка партиции {entry}: {len(files)} файлов")
+
+        progress = Progress()
+        done = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat,
+            args=(lease_key, progress_key, number, progress, done),
+            daemon=True,
+        )
+        heartbeat.start()
+
+        pipeline = IndexingPipeline(get_embedder(), progress=progress, index=partition["index"])
+        try:
+            pipeline.run(files)
+            result = {
+                "indexed": pipeline.indexed,
+                "skipped": pipeline.skipped,
+                "files": pipeline.files,
+                "failed": sorted(pipeline.failed_files),
+            }
+        except Exception as e:
+            logger.error(f"Партиция {entry} завершилась ошибкой: {e}", exc_info=True)
+            result = {"indexed": pipeline.indexed, "skipped": 0, "files": {}, "failed": files}
+        finally:
+            done.set()
+            heartbeat.join()
+
+        redis_client.hset(progress_key, number, f"{len(files)}:{result['indexed']}")
+        stored = _COMPLETE_SCRIPT(
+            keys=[PROCESSING_KEY, lease_key, results_key],
+            args=[entry, self._token, number, json.dumps(result)],
+        )
+        redis_client.expire(results_key, JOB_TTL)
+        redis_client.expire(progress_key, JOB_TTL)
+        if not stored:
+            logger.info(f"Партиция {entry} уже обработана другим исполнителем")
+        logger.info(f"Партиция {entry} обработана: записано чанков {result['indexed']}")
+
+    def _heartbeat(
+        self,
+        lease_key: str,
+        progress_key: str,
+        number: str,
+        progress: Progress,
+        done: threading.Event,
+    ):
+        """Продлевает аренду партиции и публикует ее прогресс для координатора."""
+        while not done.wait(max(PARTITION_LEASE_TTL / 3, 0.1)):
+            try:
+                if not _RENEW_SCRIPT(keys=[lease_key], args=[self._token, PARTITION_LEASE_TTL * 1000]):
+                    logger.warning(f"Аренда партиции {lease_key} потеряна")
+                snapshot = progress.snapshot()
+                redis_client.hset(
+                    progress_key, number, f"{snapshot['files_done']}:{snapshot['chunks_done']}"
+                )
+            except Exception as e:
+                logger.warning(f"Не удалось продлить аренду партиции: {e}")
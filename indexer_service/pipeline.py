@@ -0,0 +1,326 @@
+"""
+Конкурентный pipeline индексации: чтение -> векторизация -> запись.
+
+Стадии работают в отдельных пулах потоков и связаны ограниченными
+очередями. Стадия чтения забирает файлы пачками по FETCH_BATCH_FILES
+одним запросом к file_service; одновременно выполняется не больше
+FETCH_WORKERS таких запросов. Когда запись в OpenSearch не успевает, очередь перед ней
+заполняется и блокирует векторизацию, а та, в свою очередь, чтение
+файлов, поэтому память ограничена емкостью очередей.
+"""
+
+import queue
+import threading
+import time
+from typing import Callable
+from config import (
+    INDEX_NAME,
+    CHUNK_SIZE,
+    EMBED_BATCH_SIZE,
+    FETCH_BATCH_FILES,
+    FETCH_WORKERS,
+    EMBED_WORKERS,
+    WRITE_WORKERS,
+    PIPELINE_QUEUE_SIZE,
+    BULK_FLUSH_INTERVAL,
+)
+from clients.file_service_internal import stream_file, fetch_batch
+from bulk_writer import BulkWriter
+from chunking import iter_chunks, iter_batches, chunk_document_id
+from embedder import Embedder, to_index_vector
+from logger import logger
+
+# Маркер завершения для потоков стадии
+_STOP = object()
+
+
+class Progress:
+    """
+    Потокобезопасные счетчики прогресса индексации.
+
+    Атрибуты
+    --------
+    files_total : int
+        Количество файлов в задании (0, пока список не получен).
+    files_done : int
+        Количество обработанных стадией чтения файлов (включая пропущенные).
+    chunks_done : int
+        Количество записанных в OpenSearch чанков.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.files_total = 0
+        self.files_done = 0
+        self.chunks_done = 0
+
+    def add_files(self, count: int = 1):
+        with self._lock:
+            self.files_done += count
+
+    def add_chunks(self, count: int):
+        with self._lock:
+            self.chunks_done += count
+
+    def set_counts(self, files_done: int, chunks_done: int):
+        """Заменяет счетчики значениями, собранными с других исполнителей."""
+        with self._lock:
+            self.files_done = files_done
+            self.chunks_done = chunks_done
+
+    def snapshot(self) -> dict:
+        """
+        Возвращает текущее состояние с производительностью и оценкой времени.
+
+        Возвращает
+        ----------
+        dict
+            files_total, files_done, chunks_done, chunks_per_sec и eta_sec
+            (None, пока оценка невозможна).
+        """
+        with self._lock:
+            files_total, files_done, chunks_done = (
+                self.files_total, self.files_done, self.chunks_done
+            )
+        elapsed = max(time.time() - self.started_at, 1e-6)
+
+        eta = None
+        if files_total and files_done:
+            eta = round((files_total - files_done) * elapsed / files_done, 1)
+
+        return {
+            "files_total": files_total,
+            "files_done": files_done,
+            "chunks_done": chunks_done,
+            "chunks_per_sec": round(chunks_done / elapsed, 1),
+            "eta_sec": eta,
+        }
+
+
+class ChunkBatch:
+    """Пачка подряд идущих чанков одного файла."""
+
+    __slots__ = ("file_name", "file_hash", "first_chunk_id", "chunks", "vectors")
+
+    def __init__(self, file_name: str, file_hash: str, first_chunk_id: int, chunks: list[str]):
+        self.file_name = file_name
+        self.file_hash = file_hash
+        self.first_chunk_id = first_chunk_id
+        self.chunks = chunks
+        self.vectors = None
+
+
+class IndexingPipeline:
+    """
+    Pipeline индексации набора файлов.
+
+    Параметры
+    ---------
+    embedder : Embedder
+        Embedder для векторизации чанков.
+    skip : Callable[[dict], bool], optional
+        Проверка метаданных файла; файлы, для которых она вернула True, пропускаются.
+    fetch_workers, embed_workers, write_workers : int, optional
+        Количество потоков на каждой стадии.
+    queue_size : int, optional
+        Емкость очередей между стадиями (в пачках).
+    progress : Progress, optional
+        Счетчики, которые обновляются по мере обработки.
+    index : str, optional
+        Индекс (или алиас) для записи.
+
+    Атрибуты (после run)
+    --------------------
+    indexed : int
+        Количество успешно записанных чанков.
+    files : dict[str, tuple[dict, int]]
+        Прочитанные файлы: метаданные и количество чанков.
+    failed_files : set[str]
+        Файлы, которые не удалось полностью прочитать, векторизовать или записать.
+    skipped : int
+        Количество пропущенных файлов.
+    """
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        skip: Callable[[dict], bool] | None = None,
+        fetch_workers: int = FETCH_WORKERS,
+        embed_workers: int = EMBED_WORKERS,
+        write_workers: int = WRITE_WORKERS,
+        queue_size: int = PIPELINE_QUEUE_SIZE,
+        progress: Progress | None = None,
+        index: str = INDEX_NAME,
+    ):
+        self.embedder = embedder
+        self.index = index
+        self.skip = skip
+        self.progress = progress or Progress()
+        self.fetch_workers = fetch_workers
+        self.embed_workers = embed_workers
+        self.write_workers = write_workers
+
+        self._files_q: queue.Queue = queue.Queue()
+        self._embed_q: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._write_q: queue.Queue = queue.Queue(maxsize=queue_size)
+
+        self._lock = threading.Lock()
+        self._writers: list[BulkWriter] = []
+
+        self.indexed = 0
+        self.files: dict[str, tuple[dict, int]] = {}
+        self.failed_files: set[str] = set()
+        self.skipped = 0
+
+    def run(self, file_names: list[str]):
+        """
+        Индексирует файлы и дожидается завершения всех стадий.
+
+        Параметры
+        ---------
+        file_names : list[str]
+            Имена файлов для индексации.
+        """
+        for names in iter_batches(file_names, FETCH_BATCH_FILES):
+            self._files_q.put(names)
+
+        fetchers = self._start(self._fetch_loop, self.fetch_workers, "fetch")
+        embedders = self._start(self._embed_loop, self.embed_workers, "embed")
+        writers = self._start(self._write_loop, self.write_workers, "write")
+
+        # Остановка по стадиям: каждая следующая стадия получает маркеры
+        # завершения только после того, как предыдущая полностью отработала
+        for _ in fetchers:
+            self._files_q.put(_STOP)
+        self._join(fetchers)
+
+        for _ in embedders:
+            self._embed_q.put(_STOP)
+        self._join(embedders)
+
+        for _ in writers:
+            self._write_q.put(_STOP)
+        self._join(writers)
+
+        for writer in self._writers:
+            self.indexed += writer.indexed
+            self.failed_files |= writer.failed_tags
+
+    def _start(self, target, count: int, name: str) -> list[threading.Thread]:
+        threads = [
+            threading.Thread(target=target, name=f"indexer-{name}-{i}", daemon=True)
+            for i in range(max(1, count))
+        ]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    @staticmethod
+    def _join(threads: list[threading.Thread]):
+        for thread in threads:
+            thread.join()
+
+    def _mark_failed(self, file_name: str):
+        with self._lock:
+            self.failed_files.add(file_name)
+
+    def _fetch_loop(self):
+        while (names := self._files_q.get()) is not _STOP:
+            pending = set(names)
+            try:
+                for record in fetch_batch(names):
+                    pending.discard(record["name"])
+                    try:
+                        self._fetch_file(record)
+                    except Exception as e:
+                        logger.error(f"Ошибка при индексации файла {record['name']}: {e}")
+                        self._mark_failed(record["name"])
+                    self.progress.add_files()
+            except Exception as e:
+                logger.error(f"Ошибка пакетного чтения файлов: {e}")
+
+            # Файлы, до которых не дошел оборванный ответ
+            for file_name in pending:
+                self._mark_failed(file_name)
+                self.progress.add_files()
+
+    def _fetch_file(self, record: dict):
+        file_name = record["name"]
+        if "error" in record:
+            raise RuntimeError(f"file_service: {record['error']}")
+
+        meta = {key: record[key] for key in ("name", "size", "mtime", "etag")}
+        if self.skip and self.skip(meta):
+            with self._lock:
+                self.skipped += 1
+            return
+
+        logger.info(f"Обработка файла {file_name} ({meta['size']} байт)")
+
+        # Небольшие файлы приходят в пакетном ответе, крупные читаются потоком;
+        # put() блокируется, пока векторизация не освободит место
+        pieces = [record["content"]] if record["inline"] else stream_file(file_name)
+        chunks = iter_chunks(pieces, CHUNK_SIZE)
+        chunks_count = 0
+        for batch in iter_batches(chunks, EMBED_BATCH_SIZE):
+            self._embed_q.put(ChunkBatch(file_name, meta["etag"], chunks_count, batch))
+            chunks_count += len(batch)
+
+        with self._lock:
+            self.files[file_name] = (meta, chunks_count)
+        logger.info(f"Поставлено в обработку {chunks_count} чанков из файла {file_name}")
+
+    def _embed_loop(self):
+        while (batch := self._embed_q.get()) is not _STOP:
+            try:
+                batch.vectors = self.embedder.embed_batch(batch.chunks)
+            except Exception as e:
+                logger.error(f"Ошибка векторизации файла {batch.file_name}: {e}")
+                self._mark_failed(batch.file_name)
+                continue
+            self._write_q.put(batch)
+
+    def _write_loop(self):
+        writer = BulkWriter(index=self.index, progress=self.progress)
+        with self._lock:
+            self._writers.append(writer)
+
+        while True:
+            try:
+                batch = self._write_q.get(timeout=BULK_FLUSH_INTERVAL)
+            except queue.Empty:
+                # Входной поток иссяк: не держим документы в буфере дольше интервала
+                writer.flush_if_due()
+                continue
+            if batch is _STOP:
+                break
+
+            try:
+                self._write_batch(writer, batch)
+            except Exception as e:
+                logger.error(f"Ошибка записи чанков файла {batch.file_name}: {e}")
+                self._mark_failed(batch.file_name)
+
+        writer.close()
+
+    @staticmethod
+    def _write_batch(writer: BulkWriter, batch: ChunkBatch):
+        # Время записи: по нему rag_service дочитывает новые чанки в локальный индекс
+        indexed_at = int(time.time() * 1000)
+        for chunk_id, (chunk, vec) in enumerate(
+            zip(batch.chunks, batch.vectors), start=batch.first_chunk_id
+        ):
+            document = {
+                "doc_id": batch.file_name,
+                "chunk_id": chunk_id,
+                "file_hash": batch.file_hash,
+                "content": chunk,
+                "vector": to_index_vector(vec),
+                "indexed_at": indexed_at,
+            }
+            writer.add(
+                document,
+                doc_id=chunk_document_id(batch.file_name, chunk_id, chunk),
+                tag=batch.file_name,
+            )
@@ -0,0 +1,116 @@
+"""
+Тесты режима rebuild: манифест сохраняется только после переключения алиаса.
+
+Запуск (из каталога indexer_service):
+    python -m pytest -q test_indexer.py
+"""
+
+import pytest
+import indexer
+import indexer_service_module
+from config import VECTOR_DIM
+from manifest import Manifest
+
+# Список файлов file_service: имя -> метаданные
+listing: dict[str, dict] = {}
+
+
+class FakeEmbedder:
+    dim = VECTOR_DIM
+    model_id = "fake"
+
+
+class FakePipeline:
+    """Вместо чтения, векторизации и записи запоминает обработанные файлы."""
+
+    runs: list[list[str]] = []
+
+    def __init__(self, embedder, progress=None, index=None):
+        self.indexed = 0
+        self.files = {}
+        self.failed_files = set()
+        self.skipped = 0
+
+    def run(self, names: list[str]):
+        FakePipeline.runs.append(list(names))
+        for name in names:
+            self.files[name] = (listing[name], 1)
+            self.indexed += 1
+
+
+def _meta(name: str, etag: str) -> dict:
+    return {"name": name, "etag": etag, "size": 1, "mtime": 0.0}
+
+
+@pytest.fixture
+def env(monkeypatch):
+    """Подменяет file_service, OpenSearch и embedder; манифест хранится в памяти."""
+    stored: dict[str, dict] = {}
+
+    def load(cls):
+        manifest = cls()
+        manifest.entries = {name: dict(entry) for name, entry in stored.items()}
+        return manifest
+
+    def save(self):
+        stored.update(self._updated)
+        for name in self._removed:
+            stored.pop(name, None)
+        self._updated, self._removed = {}, set()
+
+    monkeypatch.setattr(Manifest, "load", classmethod(load))
+    monkeypatch.setattr(Manifest, "save", save)
+    monkeypatch.setattr(indexer_service_module, "list_files_meta", lambda: list(listing.values()))
+    monkeypatch.setattr(indexer_service_module, "get_embedder", lambda: FakeEmbedder())
+    monkeypatch.setattr(indexer_service_module, "IndexingPipeline", FakePipeline)
+    monkeypatch.setattr(indexer_service_module, "DISTRIBUTED_INDEXING", False)
+    monkeypatch.setattr(indexer_service_module, "delete_stale_chunks", lambda etags, index=None: 0)
+    monkeypatch.setattr(indexer_service_module, "delete_documents", lambda names, index=None: 0)
+    monkeypatch.setattr(indexer, "create_rebuild_index", lambda: "docs_v2")
+    dropped = []
+    monkeypatch.setattr(indexer, "drop_index", dropped.append)
+
+    listing.clear()
+    listing["a.txt"] = _meta("a.txt", "v1")
+    FakePipeline.runs = []
+    indexer_service_module.index_all_files(incremental=True)
+    assert stored["a.txt"]["etag"] == "v1"
+    FakePipeline.runs = []
+    return stored, dropped
+
+
+def test_failed_publish_keeps_manifest(env, monkeypatch):
+    stored, dropped = env
+
+    def publish_index(target):
+        raise RuntimeError("alias swap failed")
+
+    monkeypatch.setattr(indexer, "publish_index", publish_index)
+    listing["a.txt"] = _meta("a.txt", "v2")
+
+    with pytest.raises(RuntimeError):
+        indexer._rebuild(None)
+
+    assert dropped == ["docs_v2"]
+    assert stored["a.txt"]["etag"] == "v1"
+
+    # Новое содержимое не попало в живой индекс: следующий инкрементальный
+    # запуск должен заново векторизовать файл
+    FakePipeline.runs = []
+    indexer_service_module.index_all_files(incremental=True)
+    assert FakePipeline.runs == [["a.txt"]]
+
+
+def test_published_rebuild_saves_manifest(env, monkeypatch):
+    stored, dropped = env
+    monkeypatch.setattr(indexer, "publish_index", lambda target: None)
+    listing["a.txt"] = _meta("a.txt", "v2")
+
+    assert indexer._rebuild(None) == 1
+
+    assert dropped == []
+    assert stored["a.txt"]["etag"] == "v2"
+
+    FakePipeline.runs = []
+    indexer_service_module.index_all_files(incremental=True)
+    assert FakePipeline.runs == [[]]
@@ -4,8 +4,8 @@
 Используется для выполнения векторного поиска.
 """
 
-from opensearchpy import OpenSearch
-from config import OPENSEARCH_HOST
+from opensearchpy import OpenSearch, AsyncOpenSearch
+from config import OPENSEARCH_HOST, WORKER_CONCURRENCY
 from logger import logger
 
 logger.info(f"Подключение к OpenSearch: {OPENSEARCH_HOST}")
@@ -14,3 +14,17 @@ client = OpenSearch(
     hosts=[OPENSEARCH_HOST],
 )
 
+
+
+def get_async_client() -> AsyncOpenSearch:
+    """
+    Создаёт асинхронный клиент OpenSearch для воркера.
+
+    Пул соединений рассчитан на WORKER_CONCURRENCY одновременных запросов.
+
+    Returns
+    -------
+    AsyncOpenSearch
+        Асинхронный клиент (требует пакет aiohttp).
+    """
+    return AsyncOpenSearch(hosts=[OPENSEARCH_HOST], maxsize=WORKER_CONCURRENCY)
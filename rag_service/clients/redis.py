@@ -5,6 +5,7 @@
 """
 
 import redis
+import redis.asyncio
 from config import REDIS_HOST, REDIS_PORT
 from logger import logger
 
@@ -21,3 +22,22 @@ def get_redis_client() -> redis.Redis:
     logger.info(f"Подключение к Redis {REDIS_HOST}:{REDIS_PORT}")
     return redis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
 
+
+
+def get_async_redis_client(decode_responses: bool = True) -> redis.asyncio.Redis:
+    """
+    Создаёт и возвращает асинхронное подключение к Redis.
+
+    Parameters
+    ----------
+    decode_responses : bool
+        Декодировать ответы в str; False - для очередей, в которых
+        могут быть двоичные сообщения.
+
+    Returns
+    -------
+    redis.asyncio.Redis
+        Асинхронный клиент Redis.
+    """
+    logger.info(f"Подключение к Redis {REDIS_HOST}:{REDIS_PORT} (asyncio)")
+    return redis.asyncio.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=decode_responses)
@@ -2,9 +2,13 @@
 HTTP-клиент для отправки результатов в translator_service (внутренний клиент).
 """
 
+import httpx
 import requests
 from logger import logger
-from config import TRANSLATOR_SERVICE_URL
+from config import TRANSLATOR_SERVICE_URL, TRANSLATOR_TIMEOUT, WORKER_CONCURRENCY
+
+# Сессия переиспользует соединения с translator_service между отправками
+_session = requests.Session()
 
 
 def send_result_to_translator(source_queue: str, result: str):
@@ -29,7 +33,7 @@ def send_result_to_translator(source_queue: str, result: str):
     }
 
     try:
-        response = requests.post(TRANSLATOR_SERVICE_URL, json=payload, timeout=10)
+        response = _session.post(TRANSLATOR_SERVICE_URL, json=payload, timeout=TRANSLATOR_TIMEOUT)
         response.raise_for_status()
         logger.info(
             f"Результат успешно отправлен в translator_service: "
@@ -42,3 +46,21 @@ def send_result_to_translator(source_queue: str, result: str):
         )
         raise
 
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    Создаёт асинхронный HTTP-клиент для отправки результатов.
+
+    Соединения с translator_service переиспользуются (keep-alive);
+    пул рассчитан на WORKER_CONCURRENCY одновременных отправок.
+
+    Returns
+    -------
+    httpx.AsyncClient
+        Асинхронный HTTP-клиент.
+    """
+    limits = httpx.Limits(
+        max_connections=WORKER_CONCURRENCY,
+        max_keepalive_connections=WORKER_CONCURRENCY,
+    )
+    return httpx.AsyncClient(timeout=TRANSLATOR_TIMEOUT, limits=limits)
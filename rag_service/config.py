@@ -12,14 +12,138 @@ REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 OPENSEARCH_HOST = os.getenv("OPENSEARCH_HOST", "http://opensearch:9200")
 INDEX_NAME = os.getenv("INDEX_NAME", "docs")
 
+# Квантование векторов индекса (должно совпадать с настройкой indexer_service)
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none")
+VECTOR_BYTE_SCALE = float(os.getenv("VECTOR_BYTE_SCALE", 127.0))
+
 QUEUE_CHATS = os.getenv("QUEUE_CHATS", "chats")
 QUEUE_EMAIL = os.getenv("QUEUE_EMAIL", "email")
 
+
+def _queue_settings(name: str, default: str) -> dict[str, str]:
+    """Разбирает настройку вида "очередь=значение,очередь=значение"."""
+    items = (item.partition("=") for item in os.getenv(name, default).split(","))
+    return {queue.strip(): value.strip() for queue, _, value in items if queue.strip()}
+
+
+# Очереди, которые читает воркер (через запятую)
+WORKER_QUEUES = [
+    queue.strip()
+    for queue in os.getenv("WORKER_QUEUES", f"{QUEUE_CHATS},{QUEUE_EMAIL}").split(",")
+    if queue.strip()
+]
+# Планировщик очередей (deficit round robin): за круг очередь получает
+# сообщения пропорционально весу; очереди без веса получают вес 1.
+# Веса по умолчанию задаются только для читаемых воркером очередей
+_DEFAULT_WEIGHTS = {QUEUE_CHATS: 3, QUEUE_EMAIL: 1}
+QUEUE_WEIGHTS = {
+    queue: float(weight)
+    for queue, weight in _queue_settings(
+        "QUEUE_WEIGHTS",
+        ",".join(f"{queue}={weight}" for queue, weight in _DEFAULT_WEIGHTS.items() if queue in WORKER_QUEUES),
+    ).items()
+}
+# Очереди строгого приоритета по убыванию (через запятую): обслуживаются
+# раньше остальных, пока в них есть сообщения
+QUEUE_PRIORITY = [queue.strip() for queue in os.getenv("QUEUE_PRIORITY", "").split(",") if queue.strip()]
+# Ограничение числа одновременно обрабатываемых сообщений очереди ("email=16")
+QUEUE_MAX_CONCURRENCY = {
+    queue: int(limit) for queue, limit in _queue_settings("QUEUE_MAX_CONCURRENCY", "").items()
+}
+
 # URL translator_service для отправки результатов
 TRANSLATOR_SERVICE_URL = os.getenv(
     "TRANSLATOR_SERVICE_URL",
     "http://translator_service:8005/result/rag"
 )
+# URL пакетной отправки результатов (POST /result/rag/batch)
+TRANSLATOR_BATCH_URL = os.getenv("TRANSLATOR_BATCH_URL", TRANSLATOR_SERVICE_URL.rstrip("/") + "/batch")
+
+# Транспорт очередей (должен совпадать с translator_service):
+# list - списки Redis (BRPOP), stream - потоки Redis с группой потребителей.
+# Время ожидания сообщений в очереди (метрика wait_ms) считается только для stream
+QUEUE_BACKEND = os.getenv("QUEUE_BACKEND", "list")
+STREAM_GROUP = os.getenv("STREAM_GROUP", "rag")
+# Имя потребителя в группе; по умолчанию <хост>-<pid>
+STREAM_CONSUMER = os.getenv("STREAM_CONSUMER", "")
+# Сообщения, не подтвержденные дольше (мс), забираются у потребителя
+STREAM_CLAIM_IDLE_MS = int(os.getenv("STREAM_CLAIM_IDLE_MS", 60_000))
+# Как часто искать такие сообщения (с)
+STREAM_CLAIM_INTERVAL = float(os.getenv("STREAM_CLAIM_INTERVAL", 10))
+# После стольких доставок сообщение переносится в поток "<очередь>:stream:dead"
+STREAM_MAX_DELIVERIES = int(os.getenv("STREAM_MAX_DELIVERIES", 5))
+STREAM_DEAD_MAXLEN = int(os.getenv("STREAM_DEAD_MAXLEN", 100_000))
+# Количество процессов воркера в контейнере
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", 1))
+
+# Воркер: максимальное число одновременно обрабатываемых сообщений
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", 64))
+# Таймаут блокирующего чтения очереди (с); определяет, как быстро воркер замечает остановку
+WORKER_POP_TIMEOUT = float(os.getenv("WORKER_POP_TIMEOUT", 1))
+# Сколько ждать завершения начатых сообщений при остановке (с)
+WORKER_DRAIN_TIMEOUT = float(os.getenv("WORKER_DRAIN_TIMEOUT", 30))
+# Таймаут HTTP-запроса к translator_service (с)
+TRANSLATOR_TIMEOUT = float(os.getenv("TRANSLATOR_TIMEOUT", 10))
+
+# Отправка результатов пачками: результаты копятся до RESULT_BATCH_SIZE штук
+# или RESULT_BATCH_WAIT_MS мс и уходят одним запросом (1 - по одному)
+RESULT_BATCH_SIZE = int(os.getenv("RESULT_BATCH_SIZE", 64))
+RESULT_BATCH_WAIT_MS = float(os.getenv("RESULT_BATCH_WAIT_MS", 5))
+# Повторы отправки пачки при ошибке и пауза перед первым повтором (с, удваивается)
+RESULT_SEND_RETRIES = int(os.getenv("RESULT_SEND_RETRIES", 3))
+RESULT_RETRY_BACKOFF = float(os.getenv("RESULT_RETRY_BACKOFF", 0.5))
+# Максимум неотправленных результатов в памяти; сверх него отправка ждет освобождения места
+RESULT_MAX_PENDING = int(os.getenv("RESULT_MAX_PENDING", 10_000))
+
+# Движок k-NN индекса (должен совпадать с KNN_ENGINE indexer_service): фильтры
+# передаются внутрь knn-запроса для faiss и lucene, для nmslib применяются к результатам
+KNN_ENGINE = os.getenv("KNN_ENGINE", "nmslib")
+
+# Параметры поиска по умолчанию: количество чанков в ответе, максимум для
+# запроса и минимальная оценка (пусто - без отсечения)
+SEARCH_TOP_K = int(os.getenv("SEARCH_TOP_K", 1))
+SEARCH_MAX_K = int(os.getenv("SEARCH_MAX_K", 100))
+SEARCH_MIN_SCORE = float(os.getenv("SEARCH_MIN_SCORE")) if os.getenv("SEARCH_MIN_SCORE") else None
+
+# Микробатчинг поиска: запросы копятся до SEARCH_BATCH_SIZE штук или
+# SEARCH_BATCH_WAIT_MS мс и отправляются одним _msearch (1 - без батчинга)
+SEARCH_BATCH_SIZE = int(os.getenv("SEARCH_BATCH_SIZE", 32))
+SEARCH_BATCH_WAIT_MS = float(os.getenv("SEARCH_BATCH_WAIT_MS", 2))
+
+# Кэш результатов поиска: размер локального уровня (0 - выключен), TTL (с),
+# общий уровень в Redis, шаг квантования вектора запроса для ключа
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", 10000))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", 300))
+RESULT_CACHE_SHARED = os.getenv("RESULT_CACHE_SHARED", "true").lower() == "true"
+RESULT_CACHE_QUANT_STEP = float(os.getenv("RESULT_CACHE_QUANT_STEP", 1e-3))
+# Как часто проверять версию индекса (алиас и поколение), с
+RESULT_CACHE_VERSION_INTERVAL = float(os.getenv("RESULT_CACHE_VERSION_INTERVAL", 2))
+# Ключ Redis с поколением индекса (увеличивает indexer_service)
+INDEX_GENERATION_KEY = os.getenv("INDEX_GENERATION_KEY", f"{INDEX_NAME}:generation")
+
+# Локальный ANN-индекс: векторы индекса загружаются в память воркера,
+# и поиск выполняется без обращения к OpenSearch
+LOCAL_ANN_ENABLED = os.getenv("LOCAL_ANN_ENABLED", "false").lower() == "true"
+# Метрика (должна совпадать с KNN_SPACE_TYPE indexer_service): l2, cosinesimil, innerproduct
+LOCAL_ANN_SPACE = os.getenv("LOCAL_ANN_SPACE", "l2")
+# Как часто проверять версию индекса и дочитывать изменения (с)
+LOCAL_ANN_REFRESH_INTERVAL = float(os.getenv("LOCAL_ANN_REFRESH_INTERVAL", 5))
+# Индекс считается устаревшим, если версию не удавалось проверить дольше (с)
+LOCAL_ANN_MAX_STALENESS = float(os.getenv("LOCAL_ANN_MAX_STALENESS", 60))
+LOCAL_ANN_SCAN_SIZE = int(os.getenv("LOCAL_ANN_SCAN_SIZE", 1000))
+# Запас при дочитывании по indexed_at: чанки, ставшие видимыми с задержкой
+LOCAL_ANN_WATERMARK_LAG_MS = int(os.getenv("LOCAL_ANN_WATERMARK_LAG_MS", 60_000))
+LOCAL_ANN_SNAPSHOT_DIR = os.getenv("LOCAL_ANN_SNAPSHOT_DIR", "/var/lib/rag_service/ann")
+LOCAL_ANN_SNAPSHOT_INTERVAL = float(os.getenv("LOCAL_ANN_SNAPSHOT_INTERVAL", 300))
+# HNSW-граф (пакет hnswlib) строится для индексов от LOCAL_ANN_HNSW_MIN_ROWS чанков,
+# меньшие ищутся точным перебором
+LOCAL_ANN_HNSW_MIN_ROWS = int(os.getenv("LOCAL_ANN_HNSW_MIN_ROWS", 200_000))
+LOCAL_ANN_HNSW_M = int(os.getenv("LOCAL_ANN_HNSW_M", 16))
+LOCAL_ANN_HNSW_EF_CONSTRUCTION = int(os.getenv("LOCAL_ANN_HNSW_EF_CONSTRUCTION", 200))
+LOCAL_ANN_HNSW_EF = int(os.getenv("LOCAL_ANN_HNSW_EF", 100))
+
+# Порт HTTP-сервера воркера (/health, /metrics); 0 - не запускать
+METRICS_PORT = int(os.getenv("METRICS_PORT", 8006))
 
 TASKIQ_BROKER_URL = f"redis://{REDIS_HOST}:{REDIS_PORT}"
 
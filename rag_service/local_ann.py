@@ -0,0 +1,492 @@
+"""
+Локальный ANN-индекс rag_service.
+
+Векторы индекса INDEX_NAME загружаются (scroll) в непрерывную float32-матрицу
+NumPy, и KNN-запрос считается векторизованно в процессе воркера, без сетевого
+запроса к OpenSearch. Для крупных индексов (от LOCAL_ANN_HNSW_MIN_ROWS чанков)
+при установленном пакете hnswlib поверх матрицы строится HNSW-граф.
+
+Фоновый поток раз в LOCAL_ANN_REFRESH_INTERVAL секунд проверяет версию индекса
+(цели алиаса и поколение INDEX_GENERATION_KEY, как кэш результатов):
+- изменились цели алиаса (перестроение индекса) - индекс загружается заново;
+- изменилось поколение - дочитываются чанки с indexed_at не старше последнего
+  загруженного (с запасом LOCAL_ANN_WATERMARK_LAG_MS); если после этого число
+  чанков расходится с индексом, удаленные чанки вычищаются по списку id.
+
+Пока локальный индекс не загружен или отстает от версии индекса, поиск
+выполняется в OpenSearch. Поиск идет по неизменяемому снимку, обновление
+строит новый снимок и подменяет его целиком.
+
+Снимок сохраняется в LOCAL_ANN_SNAPSHOT_DIR (матрица в формате .npy
+открывается через mmap), поэтому после перезапуска индекс доступен сразу
+и только дочитывает изменения. Процессы воркера делят одну директорию:
+снимок пишет один из них, файлы каждого снимка имеют свой идентификатор.
+"""
+
+import fcntl
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Iterator
+import numpy as np
+from opensearchpy import helpers
+from clients.opensearch import client
+from clients.redis import get_redis_client
+from config import (
+    INDEX_NAME,
+    INDEX_GENERATION_KEY,
+    LOCAL_ANN_SPACE,
+    LOCAL_ANN_REFRESH_INTERVAL,
+    LOCAL_ANN_MAX_STALENESS,
+    LOCAL_ANN_SCAN_SIZE,
+    LOCAL_ANN_WATERMARK_LAG_MS,
+    LOCAL_ANN_SNAPSHOT_DIR,
+    LOCAL_ANN_SNAPSHOT_INTERVAL,
+    LOCAL_ANN_HNSW_MIN_ROWS,
+    LOCAL_ANN_HNSW_M,
+    LOCAL_ANN_HNSW_EF_CONSTRUCTION,
+    LOCAL_ANN_HNSW_EF,
+)
+from logger import logger
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+# Поля _source, которые хранятся в памяти для ответа
+SOURCE_FIELDS = ["doc_id", "chunk_id", "file_hash", "content"]
+
+HNSW_SPACES = {"l2": "l2", "cosinesimil": "cosine", "innerproduct": "ip"}
+
+
+class _Snapshot:
+    """Неизменяемое состояние локального индекса."""
+
+    __slots__ = ("ids", "sources", "matrix", "sq_norms", "hnsw", "version", "targets", "watermark")
+
+    def __init__(self, ids, sources, matrix, sq_norms, hnsw, version, targets, watermark):
+        self.ids: list[str] = ids
+        self.sources: list[dict] = sources
+        self.matrix: np.ndarray = matrix
+        self.sq_norms: np.ndarray = sq_norms
+        self.hnsw = hnsw
+        self.version: str = version
+        self.targets: list[str] = targets
+        self.watermark: int = watermark
+
+
+class LocalAnnIndex:
+    """
+    Копия векторов индекса в памяти воркера.
+
+    Parameters
+    ----------
+    space : str
+        Метрика: l2, cosinesimil или innerproduct.
+    snapshot_dir : str
+        Директория снимка; пустая строка - не сохранять снимок.
+    """
+
+    def __init__(self, space: str = LOCAL_ANN_SPACE, snapshot_dir: str = LOCAL_ANN_SNAPSHOT_DIR):
+        if space not in HNSW_SPACES:
+            raise ValueError(f"Неизвестная метрика локального индекса: {space}")
+        self.space = space
+        self.snapshot_dir = snapshot_dir
+        self.redis = get_redis_client()
+
+        self._snapshot: _Snapshot | None = None
+        self._observed_version = ""
+        self._checked_at = 0.0
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="local-ann", daemon=True)
+
+        self.searches = 0
+        self.full_loads = 0
+        self.incremental_loads = 0
+
+    def start(self):
+        logger.info(f"Запуск локального ANN-индекса (метрика {self.space})")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        if self._dirty:
+            self._save()
+
+    def ready(self) -> bool:
+        """Индекс загружен и соответствует последней известной версии индекса."""
+        snapshot = self._snapshot
+        return (
+            snapshot is not None
+            and snapshot.version == self._observed_version
+            and time.monotonic() - self._checked_at < LOCAL_ANN_MAX_STALENESS
+        )
+
+    def search(
+        self,
+        query,
+        k: int,
+        filters: dict | None = None,
+        min_score: float | None = None,
+    ) -> list[dict]:
+        """
+        Ищет k ближайших чанков.
+
+        С фильтрами поиск идет точным перебором строк, прошедших фильтр
+        (аналог фильтрации внутри knn в OpenSearch).
+
+        Parameters
+        ----------
+        query : list | np.ndarray
+            Вектор запроса в формате поля vector индекса (после prepare_query_vector).
+        k : int
+            Количество ближайших соседей.
+        filters : dict, optional
+            Значение или список допустимых значений для полей _source.
+        min_score : float, optional
+            Чанки с меньшей оценкой не возвращаются.
+
+        Returns
+        -------
+        list[dict]
+            Найденные чанки в формате hits OpenSearch: _id, _score, _source.
+            Оценки считаются так же, как в OpenSearch для этой метрики.
+        """
+        snapshot = self._snapshot
+        candidates = self._filter_rows(snapshot, filters) if filters else None
+        available = len(snapshot.ids) if candidates is None else len(candidates)
+        k = min(k, available)
+        if k <= 0:
+            return []
+        q = np.asarray(query, dtype=np.float32)
+        if self.space == "cosinesimil":
+            q = q / (np.linalg.norm(q) or 1.0)
+
+        if snapshot.hnsw is not None and candidates is None:
+            labels, distances = snapshot.hnsw.knn_query(q, k=k)
+            top, distances = labels[0], distances[0]
+            if self.space == "innerproduct":
+                scores = self._ip_scores(1.0 - distances)
+            else:
+                # l2: квадрат расстояния; cosine: 1 - cos
+                scores = 1.0 / (1.0 + distances)
+        else:
+            if candidates is None:
+                matrix, sq_norms = snapshot.matrix, snapshot.sq_norms
+            else:
+                matrix, sq_norms = snapshot.matrix[candidates], snapshot.sq_norms[candidates]
+            products = matrix @ q
+            if self.space == "l2":
+                distances = np.maximum(sq_norms - 2.0 * products + q @ q, 0.0)
+                scores = 1.0 / (1.0 + distances)
+            elif self.space == "cosinesimil":
+                scores = 1.0 / (2.0 - products)
+            else:
+                scores = self._ip_scores(products)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            scores = scores[top]
+            if candidates is not None:
+                top = candidates[top]
+
+        self.searches += 1
+        return [
+            {"_id": snapshot.ids[row], "_score": float(score), "_source": snapshot.sources[row]}
+            for row, score in zip(top, scores)
+            if min_score is None or score >= min_score
+        ]
+
+    @staticmethod
+    def _filter_rows(snapshot: _Snapshot, filters: dict) -> np.ndarray:
+        """Номера строк, _source которых проходит все фильтры."""
+        allowed = {
+            field: set(value) if isinstance(value, list) else {value}
+            for field, value in filters.items()
+        }
+        return np.fromiter(
+            (
+                row for row, source in enumerate(snapshot.sources)
+                if all(source.get(field) in values for field, values in allowed.items())
+            ),
+            dtype=np.int64,
+        )
+
+    @staticmethod
+    def _ip_scores(products: np.ndarray) -> np.ndarray:
+        return np.where(products >= 0, products + 1.0, 1.0 / (1.0 - np.minimum(products, 0.0)))
+
+    def _loop(self):
+        self._load()
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Ошибка обновления локального ANN-индекса: {e}", exc_info=True)
+            if self._dirty and time.monotonic() - self._saved_at >= LOCAL_ANN_SNAPSHOT_INTERVAL:
+                self._save()
+            self._stop.wait(LOCAL_ANN_REFRESH_INTERVAL)
+
+    def _index_version(self) -> tuple[list[str], str]:
+        try:
+            targets = sorted(client.indices.get_alias(name=INDEX_NAME))
+        except Exception:
+            # INDEX_NAME - обычный индекс, а не алиас
+            targets = [INDEX_NAME]
+        generation = self.redis.get(INDEX_GENERATION_KEY) or "0"
+        return targets, f"{','.join(targets)}@{generation}"
+
+    def refresh(self):
+        """Проверяет версию индекса и при необходимости обновляет снимок."""
+        targets, version = self._index_version()
+        self._observed_version = version
+        self._checked_at = time.monotonic()
+
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.targets != targets:
+            self._full_load(targets, version)
+        elif snapshot.version != version:
+            self._incremental_load(snapshot, version)
+
+    def _scan(self, query: dict, source) -> Iterator[dict]:
+        return helpers.scan(
+            client,
+            index=INDEX_NAME,
+            query={"query": query, "_source": source},
+            size=LOCAL_ANN_SCAN_SIZE,
+            preserve_order=False,
+        )
+
+    def _read_docs(self, query: dict) -> tuple[list[str], list[dict], list, int]:
+        ids, sources, vectors, watermark = [], [], [], 0
+        for hit in self._scan(query, SOURCE_FIELDS + ["vector", "indexed_at"]):
+            source = hit["_source"]
+            vector = source.pop("vector", None)
+            if vector is None:
+                continue
+            watermark = max(watermark, int(source.pop("indexed_at", 0) or 0))
+            ids.append(hit["_id"])
+            sources.append(source)
+            vectors.append(np.asarray(vector, dtype=np.float32))
+        return ids, sources, vectors, watermark
+
+    def _full_load(self, targets: list[str], version: str):
+        started = time.monotonic()
+        ids, sources, vectors, watermark = self._read_docs({"match_all": {}})
+        matrix = np.stack(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+        self._publish(ids, sources, matrix, version, targets, watermark)
+        self.full_loads += 1
+        logger.info(
+            f"Локальный ANN-индекс загружен: {len(ids)} чанков, версия {version}, "
+            f"{time.monotonic() - started:.1f} с"
+        )
+
+    def _incremental_load(self, snapshot: _Snapshot, version: str):
+        started = time.monotonic()
+        since = max(snapshot.watermark - LOCAL_ANN_WATERMARK_LAG_MS, 0)
+        new_ids, new_sources, new_vectors, watermark = self._read_docs(
+            {"range": {"indexed_at": {"gte": since}}}
+        )
+
+        ids = list(snapshot.ids)
+        sources = list(snapshot.sources)
+        matrix = np.array(snapshot.matrix, dtype=np.float32)
+        if new_vectors and matrix.size and new_vectors[0].shape[0] != matrix.shape[1]:
+            # Размерность изменилась без смены индекса: загружаем заново
+            self._full_load(snapshot.targets, version)
+            return
+
+        rows = {doc_id: row for row, doc_id in enumerate(ids)}
+        appended = []
+        for doc_id, source, vector in zip(new_ids, new_sources, new_vectors):
+            row = rows.get(doc_id)
+            if row is None:
+                rows[doc_id] = len(ids)
+                ids.append(doc_id)
+                sources.append(source)
+                appended.append(vector)
+            else:
+                sources[row] = source
+                matrix[row] = vector
+        if appended:
+            matrix = np.vstack([matrix.reshape(-1, appended[0].shape[0]), np.stack(appended)])
+
+        # Удаленные чанки не видны по indexed_at: сверяем количество и вычищаем лишние
+        expected = client.count(index=INDEX_NAME)["count"]
+        if len(ids) != expected:
+            existing = {hit["_id"] for hit in self._scan({"match_all": {}}, False)}
+            keep = [row for row, doc_id in enumerate(ids) if doc_id in existing]
+            if len(keep) != len(ids):
+                ids = [ids[row] for row in keep]
+                sources = [sources[row] for row in keep]
+                matrix = matrix[keep]
+            if len(ids) != len(existing):
+                logger.warning("Локальный ANN-индекс расходится с индексом, загрузка заново")
+                self._full_load(snapshot.targets, version)
+                return
+
+        self._publish(ids, sources, matrix, version, snapshot.targets, max(watermark, snapshot.watermark))
+        self.incremental_loads += 1
+        logger.info(
+            f"Локальный ANN-индекс обновлен: {len(new_ids)} новых или измененных чанков, "
+            f"всего {len(ids)}, версия {version}, {time.monotonic() - started:.1f} с"
+        )
+
+    def _publish(self, ids, sources, matrix, version, targets, watermark):
+        if self.space == "cosinesimil" and matrix.size:
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix = matrix / np.where(norms == 0, 1.0, norms)
+        sq_norms = np.einsum("ij,ij->i", matrix, matrix) if matrix.size else np.empty(0, np.float32)
+        hnsw = self._build_hnsw(matrix)
+        self._snapshot = _Snapshot(ids, sources, matrix, sq_norms, hnsw, version, targets, watermark)
+        self._dirty = True
+
+    def _build_hnsw(self, matrix: np.ndarray):
+        if hnswlib is None or len(matrix) < LOCAL_ANN_HNSW_MIN_ROWS:
+            return None
+        started = time.monotonic()
+        graph = hnswlib.Index(space=HNSW_SPACES[self.space], dim=matrix.shape[1])
+        graph.init_index(
+            max_elements=len(matrix), ef_construction=LOCAL_ANN_HNSW_EF_CONSTRUCTION, M=LOCAL_ANN_HNSW_M
+        )
+        graph.add_items(matrix, np.arange(len(matrix)))
+        graph.set_ef(LOCAL_ANN_HNSW_EF)
+        logger.info(f"HNSW-граф по {len(matrix)} чанкам построен за {time.monotonic() - started:.1f} с")
+        return graph
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.snapshot_dir, name)
+
+    def _save(self):
+        """
+        Сохраняет снимок.
+
+        Файлы данных получают имена с идентификатором снимка, а state.json,
+        который ссылается на них, заменяется последним, поэтому читатель
+        всегда видит согласованный набор файлов. Пишет один процесс
+        (блокировка директории), остальные пропускают сохранение.
+        """
+        snapshot = self._snapshot
+        if not self.snapshot_dir or snapshot is None:
+            return
+        try:
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            with open(self._path(".lock"), "w") as lock:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    logger.info("Снимок локального ANN-индекса сохраняет другой процесс")
+                    return
+                self._write_snapshot(snapshot)
+            self._dirty = False
+            self._saved_at = time.monotonic()
+            logger.info(f"Снимок локального ANN-индекса сохранен: {len(snapshot.ids)} чанков")
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить снимок локального ANN-индекса: {e}")
+
+    def _write_snapshot(self, snapshot: _Snapshot):
+        snapshot_id = uuid.uuid4().hex
+        files = {"vectors": f"vectors-{snapshot_id}.npy", "docs": f"docs-{snapshot_id}.json"}
+        if snapshot.hnsw is not None:
+            files["hnsw"] = f"hnsw-{snapshot_id}.bin"
+
+        with open(self._path(files["vectors"]), "wb") as f:
+            np.save(f, snapshot.matrix)
+        with open(self._path(files["docs"]), "w", encoding="utf-8") as f:
+            json.dump(
+                {"snapshot": snapshot_id, "ids": snapshot.ids, "sources": snapshot.sources},
+                f, ensure_ascii=False,
+            )
+        if snapshot.hnsw is not None:
+            snapshot.hnsw.save_index(self._path(files["hnsw"]))
+
+        previous = self._read_state()
+        state = {
+            "snapshot": snapshot_id,
+            "files": files,
+            "space": self.space,
+            "rows": len(snapshot.ids),
+            "version": snapshot.version,
+            "targets": snapshot.targets,
+            "watermark": snapshot.watermark,
+        }
+        tmp_path = self._path(f"state.json.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self._path("state.json"))
+
+        # Предыдущий снимок оставляем: его может сейчас читать другой процесс
+        keep = set(files.values())
+        if previous is not None:
+            keep.update(previous.get("files", {}).values())
+        for name in os.listdir(self.snapshot_dir):
+            if name.startswith(("vectors-", "docs-", "hnsw-")) and name not in keep:
+                os.remove(self._path(name))
+
+    def _read_state(self) -> dict | None:
+        try:
+            with open(self._path("state.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _load(self):
+        """Загружает сохраненный снимок; матрица открывается через mmap."""
+        if not self.snapshot_dir or not os.path.exists(self._path("state.json")):
+            return
+        try:
+            with open(self._path("state.json"), encoding="utf-8") as f:
+                state = json.load(f)
+            files = state["files"]
+            with open(self._path(files["docs"]), encoding="utf-8") as f:
+                docs = json.load(f)
+            matrix = np.load(self._path(files["vectors"]), mmap_mode="r")
+            if (
+                state["space"] != self.space
+                or docs.get("snapshot") != state["snapshot"]
+                or not state["rows"] == len(docs["ids"]) == len(matrix)
+            ):
+                logger.warning("Снимок локального ANN-индекса не подходит, индекс будет загружен заново")
+                return
+            hnsw = None
+            if hnswlib is not None and "hnsw" in files and len(matrix):
+                hnsw = hnswlib.Index(space=HNSW_SPACES[self.space], dim=matrix.shape[1])
+                hnsw.load_index(self._path(files["hnsw"]), max_elements=len(matrix))
+                hnsw.set_ef(LOCAL_ANN_HNSW_EF)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Не удалось загрузить снимок локального ANN-индекса: {e}")
+            return
+
+        sq_norms = np.einsum("ij,ij->i", matrix, matrix) if matrix.size else np.empty(0, np.float32)
+        self._snapshot = _Snapshot(
+            docs["ids"], docs["sources"], matrix, sq_norms, hnsw or self._build_hnsw(matrix),
+            state["version"], state["targets"], state["watermark"],
+        )
+        logger.info(f"Загружен снимок локального ANN-индекса: {state['rows']} чанков, версия {state['version']}")
+
+    def stats(self) -> dict:
+        """
+        Возвращает состояние локального индекса.
+
+        Returns
+        -------
+        dict
+            Готовность, количество чанков, версия, поиски и загрузки.
+        """
+        snapshot = self._snapshot
+        return {
+            "ready": self.ready(),
+            "rows": len(snapshot.ids) if snapshot else 0,
+            "hnsw": bool(snapshot and snapshot.hnsw is not None),
+            "version": snapshot.version if snapshot else None,
+            "index_version": self._observed_version,
+            "searches": self.searches,
+            "full_loads": self.full_loads,
+            "incremental_loads": self.incremental_loads,
+        }
@@ -1,11 +1,12 @@
 """
-FastAPI-приложение rag_service (health-check).
+FastAPI-приложение rag_service (health-check и метрики).
 
-Вся основная работа происходит в worker.py, но API можно использовать
-для проверки статуса.
+Вся основная работа происходит в worker.py; воркер сам запускает это
+приложение в фоновом потоке (порт METRICS_PORT).
 """
 
 from fastapi import FastAPI
+import metrics
 from logger import logger
 
 app = FastAPI(title="RAG Service")
@@ -28,3 +29,18 @@ def health():
     """
     return {"status": "ok"}
 
+
+
+@app.get("/metrics")
+def get_metrics():
+    """
+    Возвращает гистограммы воркера.
+
+    Returns
+    -------
+    dict
+        search_batch_size, search_batch_wait_ms, search_batch_latency_ms:
+        count, sum, mean, p50/p95/p99 и количество значений по корзинам;
+        result_cache: статистика кэша результатов поиска.
+    """
+    return metrics.snapshot()
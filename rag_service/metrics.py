@@ -0,0 +1,101 @@
+"""
+Метрики воркера rag_service.
+
+Гистограммы накапливаются в процессе воркера и отдаются эндпоинтом
+GET /metrics приложения main.py, которое воркер запускает в отдельном потоке.
+"""
+
+import bisect
+import threading
+from typing import Callable
+
+
+class Histogram:
+    """
+    Гистограмма с фиксированными границами корзин.
+
+    Parameters
+    ----------
+    buckets : list[float]
+        Верхние границы корзин по возрастанию; значения больше последней
+        границы попадают в корзину "+Inf".
+    """
+
+    def __init__(self, buckets: list[float]):
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def quantile(self, q: float) -> float | None:
+        """Оценка квантиля: верхняя граница корзины, в которую он попадает."""
+        with self._lock:
+            if not self.count:
+                return None
+            rank = q * self.count
+            seen = 0
+            for bound, count in zip(self.buckets + [float("inf")], self._counts):
+                seen += count
+                if seen >= rank:
+                    return bound
+        return float("inf")
+
+    def snapshot(self) -> dict:
+        """
+        Возвращает состояние гистограммы.
+
+        Returns
+        -------
+        dict
+            count, sum, mean, оценки p50/p95/p99 и количество значений
+            по корзинам (ключ - верхняя граница).
+        """
+        quantiles = {f"p{int(q * 100)}": self.quantile(q) for q in (0.5, 0.95, 0.99)}
+        with self._lock:
+            labels = [str(bound) for bound in self.buckets] + ["+Inf"]
+            return {
+                "count": self.count,
+                "sum": round(self.sum, 3),
+                "mean": round(self.sum / self.count, 3) if self.count else None,
+                **quantiles,
+                "buckets": dict(zip(labels, self._counts)),
+            }
+
+
+# Размер пачки _msearch (запросов)
+search_batch_size = Histogram([1, 2, 4, 8, 16, 32, 64, 128])
+# Ожидание запроса в очереди микробатчера до отправки (мс)
+search_batch_wait_ms = Histogram([0.5, 1, 2, 5, 10, 20, 50, 100])
+# Длительность запроса _msearch (мс)
+search_batch_latency_ms = Histogram([1, 2, 5, 10, 20, 50, 100, 200, 500, 1000])
+
+histograms = {
+    "search_batch_size": search_batch_size,
+    "search_batch_wait_ms": search_batch_wait_ms,
+    "search_batch_latency_ms": search_batch_latency_ms,
+}
+
+
+# Прочие компоненты со своей статистикой (например, кэш результатов)
+sources: dict[str, Callable[[], dict]] = {}
+
+
+def register(name: str, stats: Callable[[], dict]):
+    """Добавляет в /metrics статистику компонента под именем name."""
+    sources[name] = stats
+
+
+def snapshot() -> dict:
+    """Возвращает состояние всех гистограмм и статистику компонентов."""
+    result = {name: histogram.snapshot() for name, histogram in histograms.items()}
+    for name, stats in sources.items():
+        result[name] = stats()
+    return result
@@ -0,0 +1,294 @@
+"""
+Источники сообщений воркера rag_service.
+
+- ListQueueSource (QUEUE_BACKEND=list): списки Redis, BRPOP. Взятое сообщение
+  удаляется из очереди сразу, поэтому при падении воркера оно теряется.
+- StreamQueueSource (QUEUE_BACKEND=stream): потоки Redis "<очередь>:stream"
+  с группой потребителей STREAM_GROUP. Сообщение подтверждается (XACK) только
+  после обработки; сообщения упавших воркеров, не подтвержденные дольше
+  STREAM_CLAIM_IDLE_MS, забираются живыми воркерами (XAUTOCLAIM). Сообщения,
+  доставленные STREAM_MAX_DELIVERIES раз, переносятся в поток
+  "<очередь>:stream:dead". Любое число процессов и узлов читает одну группу,
+  и каждое сообщение обрабатывается одним из них.
+
+Источники не выбирают, из какой очереди брать сообщения: это делает
+планировщик (scheduler.py) через take() - неблокирующее чтение одной очереди -
+и wait() - блокирующее ожидание сообщений в нескольких очередях.
+"""
+
+import os
+import socket
+import time
+import redis.asyncio
+from redis.exceptions import ResponseError
+from config import (
+    QUEUE_BACKEND,
+    STREAM_GROUP,
+    STREAM_CONSUMER,
+    STREAM_CLAIM_IDLE_MS,
+    STREAM_CLAIM_INTERVAL,
+    STREAM_MAX_DELIVERIES,
+    STREAM_DEAD_MAXLEN,
+    WORKER_POP_TIMEOUT,
+)
+from logger import logger
+
+
+def stream_key(queue_name: str) -> str:
+    """Имя потока Redis для очереди (как в translator_service)."""
+    return f"{queue_name}:stream"
+
+
+def _text(value: str | bytes) -> str:
+    """Имя ключа или идентификатор записи как str (клиент может не декодировать ответы)."""
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _entry_order(entry_id: str) -> tuple[int, int]:
+    """Ключ сортировки идентификаторов записей потока ("<мс>-<номер>")."""
+    ms, _, seq = entry_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+class QueueMessage:
+    """Сообщение из очереди."""
+
+    __slots__ = ("queue", "body", "id")
+
+    def __init__(self, queue: str, body: str | bytes, id: str | None = None):
+        self.queue = queue
+        # bytes, если клиент Redis не декодирует ответы (двоичные векторы)
+        self.body = body
+        # Идентификатор записи потока (для подтверждения)
+        self.id = id
+
+    def enqueued_at(self) -> float | None:
+        """
+        Время постановки в очередь (с, Unix) по идентификатору записи потока.
+
+        Для списков Redis время постановки не хранится, возвращается None.
+        """
+        if self.id is None:
+            return None
+        return _entry_order(self.id)[0] / 1000
+
+
+class ListQueueSource:
+    """
+    Чтение списков Redis (RPOP, BRPOP).
+
+    Parameters
+    ----------
+    redis_client : redis.asyncio.Redis
+        Асинхронный клиент Redis.
+    queues : list[str]
+        Имена очередей.
+    """
+
+    def __init__(self, redis_client: redis.asyncio.Redis, queues: list[str]):
+        self.redis = redis_client
+        self.queues = queues
+
+    async def start(self):
+        pass
+
+    async def take(self, queue: str, count: int) -> list[QueueMessage]:
+        """Забирает без ожидания до count сообщений из очереди."""
+        bodies = await self.redis.rpop(queue, count)
+        return [QueueMessage(queue, body) for body in bodies or []]
+
+    async def wait(self, queues: list[str], limit: int, timeout: float = WORKER_POP_TIMEOUT) -> list[QueueMessage]:
+        """Ждет сообщение в любой из очередей (не дольше timeout секунд)."""
+        msg = await self.redis.brpop(queues, timeout=timeout)
+        if not msg:
+            return []
+        queue_name, body = msg
+        return [QueueMessage(_text(queue_name), body)]
+
+    async def ack(self, message: QueueMessage):
+        pass
+
+
+class StreamQueueSource:
+    """
+    Чтение потоков Redis группой потребителей.
+
+    Parameters
+    ----------
+    redis_client : redis.asyncio.Redis
+        Асинхронный клиент Redis.
+    queues : list[str]
+        Имена очередей.
+    consumer : str, optional
+        Имя потребителя в группе (по умолчанию STREAM_CONSUMER или <хост>-<pid>).
+    """
+
+    def __init__(self, redis_client: redis.asyncio.Redis, queues: list[str], consumer: str | None = None):
+        self.redis = redis_client
+        self.queues = queues
+        self.streams = {stream_key(queue): queue for queue in queues}
+        self.consumer = consumer or STREAM_CONSUMER or f"{socket.gethostname()}-{os.getpid()}"
+
+        # Сообщения, уже выданные этому потребителю, но еще не отданные воркеру
+        self._buffers: dict[str, list[QueueMessage]] = {queue: [] for queue in queues}
+        # После перезапуска с тем же именем сначала дочитываем свои неподтвержденные
+        # сообщения; значение - идентификатор, после которого читать (None - дочитаны)
+        self._pending_cursors: dict[str, str | None] = {key: "0" for key in self.streams}
+        self._next_claim = 0.0
+        self._claim_cursors = {key: "0-0" for key in self.streams}
+
+        self.claimed = 0
+        self.dead = 0
+
+    async def start(self):
+        for key in self.streams:
+            try:
+                await self.redis.xgroup_create(key, STREAM_GROUP, id="0", mkstream=True)
+            except ResponseError as e:
+                if "BUSYGROUP" not in str(e):
+                    raise
+        logger.info(f"Чтение потоков {list(self.streams)} в группе {STREAM_GROUP} как {self.consumer}")
+
+    async def take(self, queue: str, count: int) -> list[QueueMessage]:
+        """
+        Забирает без ожидания до count сообщений из очереди.
+
+        Сначала отдаются сообщения из буфера (раз в STREAM_CLAIM_INTERVAL
+        в него попадают сообщения, забранные у неактивных потребителей),
+        затем свои неподтвержденные, затем новые.
+        """
+        now = time.monotonic()
+        if now >= self._next_claim:
+            self._next_claim = now + STREAM_CLAIM_INTERVAL
+            await self._claim(count)
+
+        buffer = self._buffers[queue]
+        if not buffer:
+            key = stream_key(queue)
+            buffer.extend(await self._read_pending(key, count))
+            if not buffer:
+                buffer.extend(await self._read({key: ">"}, count, None))
+
+        messages, self._buffers[queue] = buffer[:count], buffer[count:]
+        return messages
+
+    async def wait(self, queues: list[str], limit: int, timeout: float = WORKER_POP_TIMEOUT) -> list[QueueMessage]:
+        """
+        Ждет новые сообщения в любой из очередей (не дольше timeout секунд).
+
+        Возвращает не больше limit сообщений; остальные прочитанные
+        остаются в буфере для следующих take().
+        """
+        received = await self._read(
+            {stream_key(queue): ">" for queue in queues}, limit, max(1, int(timeout * 1000))
+        )
+        messages, rest = received[:limit], received[limit:]
+        for message in rest:
+            self._buffers[message.queue].append(message)
+        return messages
+
+    async def _read(self, streams: dict[str, str], count: int, block: int | None) -> list[QueueMessage]:
+        response = await self.redis.xreadgroup(
+            STREAM_GROUP, self.consumer, streams, count=count, block=block
+        )
+        messages = []
+        for key, entries in response or []:
+            for entry_id, fields in entries:
+                message = await self._message(_text(key), _text(entry_id), fields)
+                if message is not None:
+                    messages.append(message)
+        return messages
+
+    async def _read_pending(self, key: str, count: int) -> list[QueueMessage]:
+        """Читает свои неподтвержденные сообщения после курсора."""
+        while self._pending_cursors[key] is not None:
+            response = await self.redis.xreadgroup(
+                STREAM_GROUP, self.consumer, {key: self._pending_cursors[key]}, count=count
+            )
+            entries = response[0][1] if response else []
+            if not entries:
+                self._pending_cursors[key] = None
+                break
+            self._pending_cursors[key] = _text(entries[-1][0])
+            messages = []
+            for entry_id, fields in entries:
+                message = await self._message(key, _text(entry_id), fields)
+                if message is not None:
+                    messages.append(message)
+            if messages:
+                return messages
+        return []
+
+    async def _claim(self, limit: int):
+        """Забирает в буферы сообщения неактивных потребителей."""
+        messages = []
+        for key in self.streams:
+            if len(messages) >= limit:
+                break
+            cursor, entries, *_ = await self.redis.xautoclaim(
+                key,
+                STREAM_GROUP,
+                self.consumer,
+                min_idle_time=STREAM_CLAIM_IDLE_MS,
+                start_id=self._claim_cursors[key],
+                count=limit - len(messages),
+            )
+            self._claim_cursors[key] = _text(cursor)
+            if not entries:
+                continue
+
+            deliveries = {
+                _text(item["message_id"]): item["times_delivered"]
+                for item in await self.redis.xpending_range(
+                    key, STREAM_GROUP, min=entries[0][0], max=entries[-1][0],
+                    count=len(entries), consumername=self.consumer,
+                )
+            }
+            cursor = self._pending_cursors[key]
+            for entry_id, fields in entries:
+                entry_id = _text(entry_id)
+                if deliveries.get(entry_id, 0) > STREAM_MAX_DELIVERIES:
+                    await self._dead_letter(key, entry_id, fields)
+                    continue
+                if cursor is not None and _entry_order(entry_id) > _entry_order(cursor):
+                    # Запись стала своей неподтвержденной и будет прочитана _read_pending
+                    continue
+                message = await self._message(key, entry_id, fields)
+                if message is not None:
+                    messages.append(message)
+                    self._buffers[message.queue].append(message)
+                    self.claimed += 1
+        if messages:
+            logger.warning(f"Забрано {len(messages)} сообщений неактивных потребителей")
+
+    async def _message(self, key: str, entry_id: str, fields: dict | None) -> QueueMessage | None:
+        body = fields.get("body", fields.get(b"body")) if fields else None
+        if body is None:
+            # Запись обрезана по MAXLEN или повреждена: обрабатывать нечего
+            await self.redis.xack(key, STREAM_GROUP, entry_id)
+            return None
+        return QueueMessage(self.streams[key], body, entry_id)
+
+    async def _dead_letter(self, key: str, entry_id: str, fields: dict | None):
+        logger.error(
+            f"Сообщение {entry_id} из {key} не обработано за {STREAM_MAX_DELIVERIES} попыток, "
+            f"перенесено в {key}:dead"
+        )
+        pipe = self.redis.pipeline()
+        if fields:
+            pipe.xadd(f"{key}:dead", fields, maxlen=STREAM_DEAD_MAXLEN, approximate=True)
+        pipe.xack(key, STREAM_GROUP, entry_id)
+        await pipe.execute()
+        self.dead += 1
+
+    async def ack(self, message: QueueMessage):
+        await self.redis.xack(stream_key(message.queue), STREAM_GROUP, message.id)
+
+
+def make_queue_source(redis_client: redis.asyncio.Redis, queues: list[str]):
+    """Создает источник сообщений по QUEUE_BACKEND."""
+    if QUEUE_BACKEND == "stream":
+        return StreamQueueSource(redis_client, queues)
+    if QUEUE_BACKEND != "list":
+        raise ValueError(f"Неизвестный QUEUE_BACKEND: {QUEUE_BACKEND}")
+    return ListQueueSource(redis_client, queues)
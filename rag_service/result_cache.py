@@ -0,0 +1,207 @@
+"""
+Кэш результатов поиска rag_service.
+
+Одинаковые и почти одинаковые вопросы дают одинаковые векторы запроса;
+кэш позволяет отвечать на них без обращения к OpenSearch.
+
+Ключ строится из квантованного вектора запроса (шаг RESULT_CACHE_QUANT_STEP),
+k, фильтров и прочих параметров запроса и версии индекса. Версия индекса - цели алиаса INDEX_NAME
+и поколение из Redis (INDEX_GENERATION_KEY), которое indexer_service
+увеличивает после каждой индексации. Версия перечитывается раз в
+RESULT_CACHE_VERSION_INTERVAL секунд; при ее изменении локальный уровень
+очищается, а записи общего уровня перестают совпадать по ключу и истекают по TTL.
+
+Уровни кэша:
+- локальный LRU в процессе воркера (RESULT_CACHE_SIZE записей);
+- общий для всех воркеров в Redis (RESULT_CACHE_SHARED).
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+import numpy as np
+import redis.asyncio
+from opensearchpy import AsyncOpenSearch, NotFoundError
+from config import (
+    INDEX_NAME,
+    INDEX_GENERATION_KEY,
+    RESULT_CACHE_SIZE,
+    RESULT_CACHE_TTL,
+    RESULT_CACHE_SHARED,
+    RESULT_CACHE_QUANT_STEP,
+    RESULT_CACHE_VERSION_INTERVAL,
+)
+from logger import logger
+
+KEY_PREFIX = "rag:results:"
+
+
+class ResultCache:
+    """
+    Двухуровневый кэш результатов поиска с TTL.
+
+    Parameters
+    ----------
+    redis_client : redis.asyncio.Redis
+        Асинхронный клиент Redis (поколение индекса и общий уровень).
+    opensearch : AsyncOpenSearch
+        Асинхронный клиент OpenSearch (цели алиаса).
+    max_entries : int
+        Размер локального уровня; 0 - кэш выключен.
+    ttl : float
+        Время жизни записи (с).
+    shared : bool
+        Использовать общий уровень в Redis.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.asyncio.Redis,
+        opensearch: AsyncOpenSearch,
+        max_entries: int = RESULT_CACHE_SIZE,
+        ttl: float = RESULT_CACHE_TTL,
+        shared: bool = RESULT_CACHE_SHARED,
+    ):
+        self.redis = redis_client
+        self.opensearch = opensearch
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared = shared
+        self.enabled = max_entries > 0
+
+        self._entries: OrderedDict[str, tuple[float, object]] = OrderedDict()
+        self._version_task: asyncio.Task | None = None
+        # Последние прочитанные индексы алиаса INDEX_NAME
+        self._targets: list[str] | None = None
+        self.version = ""
+
+        self.hits_local = 0
+        self.hits_shared = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def start(self):
+        """Читает версию индекса и запускает ее периодическую проверку."""
+        if not self.enabled:
+            return
+        try:
+            await self.refresh_version()
+        except Exception as e:
+            logger.warning(f"Не удалось прочитать версию индекса: {e}")
+        self._version_task = asyncio.create_task(self._version_loop())
+
+    async def stop(self):
+        if self._version_task is not None:
+            self._version_task.cancel()
+            await asyncio.gather(self._version_task, return_exceptions=True)
+
+    async def _version_loop(self):
+        while True:
+            await asyncio.sleep(RESULT_CACHE_VERSION_INTERVAL)
+            try:
+                await self.refresh_version()
+            except Exception as e:
+                logger.warning(f"Не удалось проверить версию индекса: {e}")
+
+    async def refresh_version(self):
+        """Перечитывает версию индекса; при изменении сбрасывает локальный уровень."""
+        try:
+            targets = sorted(await self.opensearch.indices.get_alias(name=INDEX_NAME))
+        except NotFoundError:
+            # INDEX_NAME - обычный индекс, а не алиас (или индекса еще нет)
+            targets = [INDEX_NAME]
+        except Exception as e:
+            # Временная ошибка OpenSearch не должна менять версию и сбрасывать кэш:
+            # индексы алиаса остаются прежними, проверяется только поколение
+            logger.warning(f"Не удалось прочитать алиас {INDEX_NAME}: {e}")
+            targets = self._targets if self._targets is not None else [INDEX_NAME]
+        self._targets = targets
+        generation = await self.redis.get(INDEX_GENERATION_KEY) or "0"
+        version = f"{','.join(targets)}@{generation}"
+        if version != self.version:
+            if self.version:
+                logger.info(f"Версия индекса изменилась ({self.version} -> {version}), кэш результатов сброшен")
+                self.invalidations += 1
+            self._entries.clear()
+            self.version = version
+
+    def key(self, vector: list, k: int, options: dict | None = None) -> str:
+        """
+        Строит ключ кэша.
+
+        Близкие векторы (отличающиеся меньше чем на полшага квантования
+        по каждой координате) получают один и тот же ключ. options - прочие
+        параметры запроса (фильтры, поля _source, минимальная оценка).
+        """
+        quantized = np.rint(np.asarray(vector, dtype=np.float32) / RESULT_CACHE_QUANT_STEP)
+        digest = hashlib.blake2b(quantized.astype(np.int32).tobytes(), digest_size=16)
+        digest.update(json.dumps([k, options], sort_keys=True).encode())
+        digest.update(self.version.encode())
+        return digest.hexdigest()
+
+    async def get(self, key: str):
+        """
+        Возвращает сохраненный результат или None.
+        """
+        cached = self._entries.get(key)
+        if cached is not None:
+            expires, value = cached
+            if expires > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits_local += 1
+                return value
+            del self._entries[key]
+
+        if self.shared:
+            try:
+                raw = await self.redis.get(KEY_PREFIX + key)
+            except Exception as e:
+                logger.warning(f"Ошибка чтения общего кэша результатов: {e}")
+                raw = None
+            if raw is not None:
+                value = json.loads(raw)
+                self._put_local(key, value)
+                self.hits_shared += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, value):
+        """Сохраняет результат (значение должно сериализоваться в JSON)."""
+        self._put_local(key, value)
+        if self.shared:
+            try:
+                await self.redis.set(KEY_PREFIX + key, json.dumps(value, ensure_ascii=False), px=int(self.ttl * 1000))
+            except Exception as e:
+                logger.warning(f"Ошибка записи общего кэша результатов: {e}")
+
+    def _put_local(self, key: str, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        """
+        Возвращает статистику кэша.
+
+        Returns
+        -------
+        dict
+            Попадания по уровням, промахи, доля попаданий, записи,
+            количество сбросов и текущая версия индекса.
+        """
+        hits = self.hits_local + self.hits_shared
+        total = hits + self.misses
+        return {
+            "hits_local": self.hits_local,
+            "hits_shared": self.hits_shared,
+            "misses": self.misses,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+            "local_entries": len(self._entries),
+            "invalidations": self.invalidations,
+            "index_version": self.version,
+        }
@@ -0,0 +1,216 @@
+"""
+Пакетная отправка результатов в translator_service.
+
+Результаты, готовые почти одновременно, копятся до RESULT_BATCH_SIZE штук
+или RESULT_BATCH_WAIT_MS миллисекунд и уходят одним запросом
+POST /result/rag/batch по соединению из пула httpx (keep-alive).
+
+submit() ставит результат в очередь и возвращает future, который завершается,
+когда translator_service принял пачку; по нему воркер подтверждает сообщения
+потоков Redis. Пачки отправляются фоновыми задачами. Пачка, которую не удалось
+отправить, повторяется до RESULT_SEND_RETRIES раз с растущей паузой; если
+и это не помогло, future завершается с DeliveryError и сообщение остается
+неподтвержденным. Когда неотправленных результатов RESULT_MAX_PENDING,
+submit() ждет, пока отправка освободит место.
+"""
+
+import asyncio
+import httpx
+from config import (
+    TRANSLATOR_BATCH_URL,
+    RESULT_BATCH_SIZE,
+    RESULT_BATCH_WAIT_MS,
+    RESULT_SEND_RETRIES,
+    RESULT_RETRY_BACKOFF,
+    RESULT_MAX_PENDING,
+)
+from logger import logger
+
+
+class DeliveryError(Exception):
+    """Пачка с результатом не доставлена в translator_service."""
+
+
+class ResultSender:
+    """
+    Собирает результаты в пачки и отправляет их в translator_service.
+
+    Parameters
+    ----------
+    http_client : httpx.AsyncClient
+        Клиент из get_async_http_client().
+    url : str
+        URL пакетного эндпоинта translator_service.
+    max_batch : int
+        Максимальный размер пачки.
+    max_wait_ms : float
+        Сколько ждать заполнения пачки после первого результата (мс).
+    retries : int
+        Количество повторов отправки пачки.
+    backoff : float
+        Пауза перед первым повтором (с); удваивается с каждым повтором.
+    max_pending : int
+        Максимум неотправленных результатов (в очереди и в отправляемых пачках).
+    """
+
+    def __init__(
+        self,
+        http_client: httpx.AsyncClient,
+        url: str = TRANSLATOR_BATCH_URL,
+        max_batch: int = RESULT_BATCH_SIZE,
+        max_wait_ms: float = RESULT_BATCH_WAIT_MS,
+        retries: int = RESULT_SEND_RETRIES,
+        backoff: float = RESULT_RETRY_BACKOFF,
+        max_pending: int = RESULT_MAX_PENDING,
+    ):
+        self.http_client = http_client
+        self.url = url
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000
+        self.retries = retries
+        self.backoff = backoff
+        self.max_pending = max_pending
+
+        # Результаты и future, которые завершаются после отправки пачки
+        self._pending: list[tuple[dict, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._sending: set[asyncio.Task] = set()
+        self._outstanding = 0
+        self._space = asyncio.Event()
+
+        self.sent = 0
+        self.batches = 0
+        self.retried = 0
+        self.failed = 0
+
+    async def submit(self, source_queue: str, result: str) -> asyncio.Future:
+        """
+        Ставит результат в очередь на отправку.
+
+        Если неотправленных результатов уже max_pending, ждет, пока
+        отправка пачек освободит место.
+
+        Parameters
+        ----------
+        source_queue : str
+            Имя очереди Redis, из которой пришло сообщение (chats или email).
+        result : str
+            Текст результата обработки.
+
+        Returns
+        -------
+        asyncio.Future
+            Завершается, когда translator_service принял пачку. Исключение
+            ValueError - translator_service отклонил результат (повтор не
+            поможет), DeliveryError - пачку не удалось отправить.
+        """
+        while self._outstanding >= self.max_pending:
+            self._space.clear()
+            await self._space.wait()
+
+        self._outstanding += 1
+        delivery = asyncio.get_running_loop().create_future()
+        self._pending.append(({"source_queue": source_queue, "result": result}, delivery))
+        if len(self._pending) >= self.max_batch:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._dispatch)
+        return delivery
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.create_task(self._send(batch))
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    async def _send(self, batch: list[tuple[dict, asyncio.Future]]):
+        results = [item for item, _ in batch]
+        try:
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    self.retried += 1
+                    await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+                try:
+                    response = await self.http_client.post(self.url, json={"results": results})
+                    # 429 и 5xx - временные ошибки, остальные 4xx повтор не исправит
+                    if response.status_code < 500 and response.status_code != 429:
+                        response.raise_for_status()
+                        self._delivered(batch, response.json())
+                        return
+                    error = f"HTTP {response.status_code}"
+                except httpx.TransportError as e:
+                    error = str(e) or type(e).__name__
+                except Exception as e:
+                    logger.error(
+                        f"Пачка из {len(batch)} результатов не принята translator_service: {e}"
+                    )
+                    self._undelivered(batch, e)
+                    return
+                logger.warning(
+                    f"Ошибка отправки пачки из {len(batch)} результатов "
+                    f"в translator_service (попытка {attempt + 1}): {error}"
+                )
+
+            logger.error(
+                f"Пачка из {len(batch)} результатов не отправлена в translator_service "
+                f"после {self.retries + 1} попыток"
+            )
+            self._undelivered(batch, error)
+        finally:
+            self._outstanding -= len(batch)
+            self._space.set()
+
+    def _delivered(self, batch: list[tuple[dict, asyncio.Future]], response: dict):
+        rejected = {}
+        for error in response.get("errors", []):
+            logger.error(f"translator_service отклонил результат: {error}")
+            rejected[error.get("index")] = error.get("message", "")
+        for number, (_, delivery) in enumerate(batch):
+            if delivery.done():
+                continue
+            if number in rejected:
+                delivery.set_exception(
+                    ValueError(f"translator_service отклонил результат: {rejected[number]}")
+                )
+            else:
+                delivery.set_result(None)
+        self.batches += 1
+        self.sent += len(batch) - len(rejected)
+        self.failed += len(rejected)
+
+    def _undelivered(self, batch: list[tuple[dict, asyncio.Future]], error):
+        self.failed += len(batch)
+        for _, delivery in batch:
+            if not delivery.done():
+                delivery.set_exception(
+                    DeliveryError(f"Результат не отправлен в translator_service: {error}")
+                )
+
+    async def close(self):
+        """Отправляет накопленные результаты и дожидается отправки всех пачек."""
+        self._dispatch()
+        if self._sending:
+            await asyncio.gather(*self._sending, return_exceptions=True)
+
+    def stats(self) -> dict:
+        """
+        Возвращает статистику отправки.
+
+        Returns
+        -------
+        dict
+            Отправленные результаты и пачки, повторы, неотправленные
+            результаты, размер очереди отправки.
+        """
+        return {
+            "sent": self.sent,
+            "batches": self.batches,
+            "retries": self.retried,
+            "failed": self.failed,
+            "pending": self._outstanding,
+        }
@@ -0,0 +1,209 @@
+"""
+Планировщик чтения очередей воркера rag_service.
+
+Решает, из каких очередей забирать сообщения под свободные слоты воркера:
+- очереди строгого приоритета (QUEUE_PRIORITY) обслуживаются первыми,
+  пока в них есть сообщения;
+- остальные очереди обслуживаются по deficit round robin: при каждом
+  посещении очередь получает кредит, равный ее весу (QUEUE_WEIGHTS),
+  и может забрать столько сообщений, сколько накопила кредита. Поэтому
+  всплеск в одной очереди не останавливает остальные, а доли очередей
+  под нагрузкой пропорциональны весам;
+- очередь не получает новых сообщений, пока обрабатывается
+  QUEUE_MAX_CONCURRENCY ее сообщений.
+
+Сначала очереди опрашиваются без ожидания; если сообщений нет ни в одной,
+планировщик ждет сообщение в любой из очередей, не достигших ограничения.
+
+Для каждой очереди считается время ожидания сообщения в очереди
+(для потоков Redis - по идентификатору записи; в списках Redis время
+постановки сообщения неизвестно).
+"""
+
+import time
+from config import (
+    WORKER_QUEUES,
+    QUEUE_WEIGHTS,
+    QUEUE_PRIORITY,
+    QUEUE_MAX_CONCURRENCY,
+    WORKER_POP_TIMEOUT,
+)
+from logger import logger
+from metrics import Histogram
+from queues import QueueMessage
+
+# Пока часть очередей достигла ограничения, ожидание новых сообщений
+# прерывается чаще, чтобы вовремя вернуться к этим очередям
+CAPPED_WAIT_TIMEOUT = 0.05
+
+
+class QueueScheduler:
+    """
+    Выбирает сообщения из очередей по приоритетам, весам и ограничениям.
+
+    Parameters
+    ----------
+    source : ListQueueSource | StreamQueueSource
+        Источник сообщений (см. queues.py).
+    queues : list[str]
+        Имена очередей.
+    weights : dict[str, float]
+        Веса очередей; очереди без веса получают вес 1.
+    priority : list[str]
+        Очереди строгого приоритета по убыванию приоритета.
+    max_concurrency : dict[str, int]
+        Ограничения числа одновременно обрабатываемых сообщений по очередям.
+    """
+
+    def __init__(
+        self,
+        source,
+        queues: list[str] = WORKER_QUEUES,
+        weights: dict[str, float] = QUEUE_WEIGHTS,
+        priority: list[str] = QUEUE_PRIORITY,
+        max_concurrency: dict[str, int] = QUEUE_MAX_CONCURRENCY,
+    ):
+        unknown = (set(priority) | set(weights) | set(max_concurrency)) - set(queues)
+        if unknown:
+            # Настройки могут быть общими для воркеров с разными WORKER_QUEUES
+            logger.warning(f"Настройки планировщика для нечитаемых очередей пропущены: {sorted(unknown)}")
+            priority = [queue for queue in priority if queue in queues]
+            weights = {queue: weight for queue, weight in weights.items() if queue in queues}
+            max_concurrency = {queue: limit for queue, limit in max_concurrency.items() if queue in queues}
+        if any(weight <= 0 for weight in weights.values()):
+            raise ValueError("Веса очередей должны быть положительными")
+        if any(limit <= 0 for limit in max_concurrency.values()):
+            raise ValueError("Ограничения одновременной обработки очередей должны быть положительными")
+
+        self.source = source
+        self.queues = queues
+        self.priority = priority
+        self.weighted = [queue for queue in queues if queue not in priority]
+        self.weights = {queue: weights.get(queue, 1.0) for queue in queues}
+        self.max_concurrency = max_concurrency
+
+        # Кредит за посещение нормирован так, что наименьший вес дает одно сообщение
+        lightest = min((self.weights[queue] for queue in self.weighted), default=1.0)
+        self._quantum = {queue: self.weights[queue] / lightest for queue in self.weighted}
+        self._deficit = {queue: 0.0 for queue in self.weighted}
+        self._position = 0
+        # Кредит текущей очереди еще не начислен
+        self._fresh = True
+
+        self._in_flight = {queue: 0 for queue in queues}
+        self._taken = {queue: 0 for queue in queues}
+        self._wait_ms = {
+            queue: Histogram([1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000])
+            for queue in queues
+        }
+
+    def _room(self, queue: str) -> int:
+        limit = self.max_concurrency.get(queue)
+        if limit is None:
+            return 1 << 30
+        return limit - self._in_flight[queue]
+
+    def eligible(self) -> list[str]:
+        """Очереди, из которых сейчас можно брать сообщения."""
+        return [queue for queue in self.queues if self._room(queue) > 0]
+
+    async def fetch(self, limit: int) -> list[QueueMessage]:
+        """
+        Забирает до limit сообщений для обработки.
+
+        Returns
+        -------
+        list[QueueMessage]
+            Сообщения; пустой список, если за время ожидания
+            (WORKER_POP_TIMEOUT) сообщений не появилось.
+        """
+        messages = []
+        for queue in self.priority:
+            want = min(limit - len(messages), self._room(queue))
+            if want > 0:
+                messages += self._start(await self.source.take(queue, want))
+
+        if len(messages) < limit:
+            messages += await self._round_robin(limit - len(messages))
+
+        if not messages:
+            queues = self.eligible()
+            if queues:
+                timeout = WORKER_POP_TIMEOUT if len(queues) == len(self.queues) else CAPPED_WAIT_TIMEOUT
+                # Одно сообщение, чтобы не превысить ограничение очереди; остальные
+                # заберет опрос без ожидания на следующем вызове
+                messages = self._start(await self.source.wait(queues, 1, timeout))
+        return messages
+
+    async def _round_robin(self, limit: int) -> list[QueueMessage]:
+        messages = []
+        # Посещения подряд без сообщений; полный круг таких посещений - очереди пусты
+        idle = 0
+        while len(messages) < limit and idle < len(self.weighted):
+            queue = self.weighted[self._position]
+            room = self._room(queue)
+            if self._fresh:
+                if room <= 0:
+                    self._advance(queue)
+                    idle += 1
+                    continue
+                self._deficit[queue] += self._quantum[queue]
+                self._fresh = False
+
+            want = min(int(self._deficit[queue]), limit - len(messages), room)
+            taken = self._start(await self.source.take(queue, want)) if want > 0 else []
+            messages += taken
+            self._deficit[queue] -= len(taken)
+            idle = 0 if taken else idle + 1
+
+            if len(taken) < want:
+                # Очередь опустела: неизрасходованный кредит не копится
+                self._deficit[queue] = 0.0
+                self._advance(queue)
+            elif self._deficit[queue] < 1 or len(taken) >= room:
+                self._advance(queue)
+            # Иначе слоты кончились раньше кредита: очередь продолжит следующий вызов
+        return messages
+
+    def _advance(self, queue: str):
+        self._deficit[queue] = min(self._deficit[queue], self._quantum[queue])
+        self._position = (self._position + 1) % len(self.weighted)
+        self._fresh = True
+
+    def _start(self, messages: list[QueueMessage]) -> list[QueueMessage]:
+        now = time.time()
+        for message in messages:
+            self._in_flight[message.queue] += 1
+            self._taken[message.queue] += 1
+            enqueued_at = message.enqueued_at()
+            if enqueued_at is not None:
+                self._wait_ms[message.queue].observe(max(0.0, (now - enqueued_at) * 1000))
+        return messages
+
+    def done(self, message: QueueMessage):
+        """Сообщает, что обработка сообщения завершена."""
+        self._in_flight[message.queue] -= 1
+
+    def stats(self) -> dict:
+        """
+        Возвращает статистику по очередям.
+
+        Returns
+        -------
+        dict
+            Для каждой очереди: вес (или признак строгого приоритета),
+            ограничение, число обрабатываемых и взятых сообщений,
+            гистограмма времени ожидания в очереди (мс; заполняется только
+            при QUEUE_BACKEND=stream).
+        """
+        return {
+            queue: {
+                "weight": None if queue in self.priority else self.weights[queue],
+                "priority": queue in self.priority,
+                "max_concurrency": self.max_concurrency.get(queue),
+                "in_flight": self._in_flight[queue],
+                "taken": self._taken[queue],
+                "wait_ms": self._wait_ms[queue].snapshot(),
+            }
+            for queue in self.queues
+        }
@@ -0,0 +1,130 @@
+"""
+Микробатчинг KNN-запросов в OpenSearch.
+
+Запросы, пришедшие почти одновременно, копятся до SEARCH_BATCH_SIZE штук
+или SEARCH_BATCH_WAIT_MS миллисекунд и отправляются одним запросом _msearch.
+Ответы раздаются ожидающим запросам по порядку; ошибка одного запроса
+в пачке (элемент с "error") не влияет на остальные.
+"""
+
+import asyncio
+import time
+from opensearchpy import AsyncOpenSearch
+from config import INDEX_NAME, SEARCH_BATCH_SIZE, SEARCH_BATCH_WAIT_MS
+from metrics import search_batch_size, search_batch_wait_ms, search_batch_latency_ms
+from logger import logger
+
+
+class SearchError(Exception):
+    """Ошибка отдельного запроса из пачки _msearch."""
+
+
+class SearchBatcher:
+    """
+    Собирает поисковые запросы в пачки _msearch.
+
+    Parameters
+    ----------
+    client : AsyncOpenSearch
+        Асинхронный клиент OpenSearch.
+    max_batch : int
+        Максимальный размер пачки; 1 - отправлять каждый запрос отдельно.
+    max_wait_ms : float
+        Сколько ждать заполнения пачки после первого запроса (мс).
+    index : str
+        Индекс (или алиас) для поиска.
+    """
+
+    def __init__(
+        self,
+        client: AsyncOpenSearch,
+        max_batch: int = SEARCH_BATCH_SIZE,
+        max_wait_ms: float = SEARCH_BATCH_WAIT_MS,
+        index: str = INDEX_NAME,
+    ):
+        self.client = client
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.index = index
+
+        self._pending: list[tuple[dict, asyncio.Future, float]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._sending: set[asyncio.Task] = set()
+
+    async def search(self, body: dict) -> dict:
+        """
+        Выполняет поисковый запрос в составе пачки.
+
+        Parameters
+        ----------
+        body : dict
+            Тело запроса _search.
+
+        Returns
+        -------
+        dict
+            Ответ OpenSearch на этот запрос (как у client.search).
+
+        Raises
+        ------
+        SearchError
+            Если OpenSearch вернул ошибку для этого запроса.
+        """
+        if self.max_batch <= 1:
+            return await self.client.search(index=self.index, body=body)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((body, future, time.perf_counter()))
+        if len(self._pending) >= self.max_batch:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._dispatch)
+        return await future
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.create_task(self._send(batch))
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    async def _send(self, batch: list[tuple[dict, asyncio.Future, float]]):
+        started = time.perf_counter()
+        search_batch_size.observe(len(batch))
+        for _, _, queued in batch:
+            search_batch_wait_ms.observe((started - queued) * 1000)
+
+        lines = []
+        for body, _, _ in batch:
+            lines.append({"index": self.index})
+            lines.append(body)
+        try:
+            resp = await self.client.msearch(body=lines)
+        except Exception as e:
+            logger.error(f"Ошибка _msearch для пачки из {len(batch)} запросов: {e}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            search_batch_latency_ms.observe((time.perf_counter() - started) * 1000)
+
+        for (_, future, _), item in zip(batch, resp["responses"]):
+            # Запрос мог быть отменен, пока пачка выполнялась
+            if future.done():
+                continue
+            if "error" in item:
+                future.set_exception(SearchError(item["error"]))
+            else:
+                future.set_result(item)
+
+    async def close(self):
+        """Отправляет накопленные запросы и дожидается всех пачек."""
+        self._dispatch()
+        if self._sending:
+            await asyncio.gather(*self._sending, return_exceptions=True)
@@ -5,16 +5,32 @@ TaskIQ-задачи для rag_service.
 ответы в translator_service.
 """
 
-import json
+import asyncio
 from taskiq_redis import ListQueueBroker
-from config import TASKIQ_BROKER_URL, QUEUE_CHATS, QUEUE_EMAIL
-from vector_search import search_knn
+from config import TASKIQ_BROKER_URL, WORKER_QUEUES
+from vector_search import SearchQuery, search, search_async
+from search_batcher import SearchBatcher
+from result_cache import ResultCache
+from local_ann import LocalAnnIndex
+from result_sender import ResultSender
 from clients.translator_service_internal import send_result_to_translator
 from logger import logger
 
 broker = ListQueueBroker(TASKIQ_BROKER_URL)
 
 
+def format_response(hits: list[dict]) -> str:
+    """Формирует текст ответа по найденным фрагментам (по строке на фрагмент)."""
+    if not hits:
+        return "Подходящие документы не найдены"
+    return "\n".join(
+        f"Документ: {hit['_source'].get('doc_id')}, "
+        f"фрагмент #{hit['_source'].get('chunk_id')}, "
+        f"текст: {hit['_source'].get('content')}"
+        for hit in hits
+    )
+
+
 @broker.task
 def process_vector_message(message: str, source_queue: str):
     """
@@ -24,22 +40,18 @@ def process_vector_message(message: str, source_queue: str):
     Параметры
     ---------
     message : str
-        JSON-строка со списком чисел (вектор запроса).
+        JSON-строка со списком чисел (вектор запроса) или объект
+        с вектором и параметрами поиска (см. SearchQuery.from_message).
     source_queue : str
         Имя очереди Redis, из которой пришло сообщение (chats или email).
     """
     logger.info(f"Получено сообщение для обработки из {source_queue}: {message}")
 
-    vector = json.loads(message)
-    result = search_knn(vector)
+    hits = search(SearchQuery.from_message(message))
 
-    response_text = (
-        f"Документ: {result['doc_id']}, "
-        f"фрагмент #{result['chunk_id']}, "
-        f"текст: {result['content']}"
-    )
+    response_text = format_response(hits)
 
-    if source_queue not in [QUEUE_CHATS, QUEUE_EMAIL]:
+    if source_queue not in WORKER_QUEUES:
         logger.warning(
             f"Неожиданная очередь-источник: {source_queue}, "
             f"ответ не отправлен."
@@ -51,3 +63,53 @@ def process_vector_message(message: str, source_queue: str):
     )
     send_result_to_translator(source_queue, response_text)
 
+
+async def process_vector_message_async(
+    message: str | bytes,
+    source_queue: str,
+    batcher: SearchBatcher,
+    sender: ResultSender,
+    cache: ResultCache | None = None,
+    local_index: LocalAnnIndex | None = None,
+) -> asyncio.Future | None:
+    """
+    Асинхронный вариант process_vector_message для воркера.
+
+    Поиск не блокирует цикл событий, поэтому воркер обрабатывает много
+    сообщений одновременно. Ответ ставится в очередь отправки ResultSender
+    и уходит в translator_service в составе пачки; функция не ждет отправки,
+    чтобы медленный translator_service не занимал слоты обработки.
+
+    Параметры
+    ---------
+    message : str | bytes
+        JSON-строка со списком чисел (вектор запроса), объект с вектором
+        и параметрами поиска или вектор в двоичном формате
+        (см. SearchQuery.from_message).
+    source_queue : str
+        Имя очереди Redis, из которой пришло сообщение (chats или email).
+    batcher : SearchBatcher
+        Микробатчер поисковых запросов.
+    sender : ResultSender
+        Пакетная отправка результатов в translator_service.
+    cache : ResultCache, optional
+        Кэш результатов поиска.
+    local_index : LocalAnnIndex, optional
+        Локальный ANN-индекс.
+
+    Возвращает
+    ----------
+    asyncio.Future | None
+        Future доставки результата (см. ResultSender.submit) или None,
+        если сообщение пропущено.
+    """
+    if source_queue not in WORKER_QUEUES:
+        logger.warning(
+            f"Неожиданная очередь-источник: {source_queue}, "
+            f"сообщение пропущено."
+        )
+        return
+
+    query = SearchQuery.from_message(message)
+    hits = await search_async(batcher, query, cache=cache, local_index=local_index)
+    return await sender.submit(source_queue, format_response(hits))
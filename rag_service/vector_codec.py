@@ -0,0 +1,103 @@
+"""
+Двоичный формат векторов запросов в очередях Redis.
+
+Формат (все числа little-endian; совпадает с translator_service/vector_codec.py):
+
+    смещение  размер     поле
+    0         2          сигнатура b"RV"
+    2         1          версия формата (1)
+    3         1          тип элементов: 1 - float32, 2 - float16
+    4         4          размерность вектора (uint32)
+    8         dim * 4|2  элементы вектора
+    ...       остаток    необязательно: JSON-объект с параметрами запроса
+                         (k, filters, source_includes, source_excludes, min_score)
+
+Вектор float32 из 1024 элементов занимает 4 КБ против ~10 КБ JSON-текста
+и читается через np.frombuffer без разбора и копирования. JSON-сообщения
+начинаются с "[" или "{", поэтому отличаются от двоичных по сигнатуре.
+"""
+
+import json
+import struct
+import numpy as np
+
+MAGIC = b"RV"
+VERSION = 1
+HEADER = struct.Struct("<2sBBI")
+
+FLOAT32 = 1
+FLOAT16 = 2
+DTYPES = {FLOAT32: np.dtype("<f4"), FLOAT16: np.dtype("<f2")}
+
+
+def is_binary(message: str | bytes) -> bool:
+    """Проверяет, что сообщение в двоичном формате (а не JSON)."""
+    return isinstance(message, (bytes, bytearray, memoryview)) and bytes(message[:2]) == MAGIC
+
+
+def encode(vector, dtype: int = FLOAT32, options: dict | None = None) -> bytes:
+    """
+    Кодирует вектор запроса.
+
+    Параметры
+    ---------
+    vector : list | np.ndarray
+        Вектор запроса.
+    dtype : int
+        FLOAT32 или FLOAT16.
+    options : dict, optional
+        Параметры запроса, которые передаются вместе с вектором.
+
+    Возвращает
+    ----------
+    bytes
+        Сообщение в двоичном формате.
+    """
+    data = np.asarray(vector, dtype=DTYPES[dtype])
+    message = HEADER.pack(MAGIC, VERSION, dtype, len(data)) + data.tobytes()
+    if options:
+        message += json.dumps(options, ensure_ascii=False).encode()
+    return message
+
+
+def decode(message: bytes) -> tuple[np.ndarray, dict]:
+    """
+    Декодирует сообщение в двоичном формате.
+
+    Параметры
+    ---------
+    message : bytes
+        Сообщение из очереди.
+
+    Возвращает
+    ----------
+    tuple[np.ndarray, dict]
+        Вектор float32 (для float32 - представление поверх message без копирования,
+        только для чтения) и параметры запроса (пустой словарь, если их нет).
+
+    Raises
+    ------
+    ValueError
+        Если сообщение повреждено или версия формата не поддерживается.
+    """
+    if len(message) < HEADER.size:
+        raise ValueError("Двоичное сообщение короче заголовка")
+    magic, version, dtype, dim = HEADER.unpack_from(message)
+    if magic != MAGIC:
+        raise ValueError("Сообщение не в двоичном формате векторов")
+    if version != VERSION:
+        raise ValueError(f"Неподдерживаемая версия двоичного формата: {version}")
+    if dtype not in DTYPES:
+        raise ValueError(f"Неизвестный тип элементов вектора: {dtype}")
+
+    end = HEADER.size + dim * DTYPES[dtype].itemsize
+    if len(message) < end:
+        raise ValueError(f"Двоичное сообщение короче вектора размерности {dim}")
+    vector = np.frombuffer(message, dtype=DTYPES[dtype], count=dim, offset=HEADER.size)
+    if dtype != FLOAT32:
+        vector = vector.astype(np.float32)
+
+    options = json.loads(message[end:]) if len(message) > end else {}
+    if not isinstance(options, dict):
+        raise ValueError("Параметры запроса должны быть объектом")
+    return vector, options
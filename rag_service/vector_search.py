@@ -2,10 +2,211 @@
 Функции для векторного поиска в OpenSearch.
 """
 
+import asyncio
+import json
+from fnmatch import fnmatchcase
+import numpy as np
 from clients.opensearch import client
-from config import INDEX_NAME
+from config import (
+    INDEX_NAME,
+    VECTOR_QUANTIZATION,
+    VECTOR_BYTE_SCALE,
+    KNN_ENGINE,
+    SEARCH_TOP_K,
+    SEARCH_MAX_K,
+    SEARCH_MIN_SCORE,
+)
+from search_batcher import SearchBatcher
+from result_cache import ResultCache
+from local_ann import LocalAnnIndex
+import vector_codec
 from logger import logger
 
+# Поля _source, которые не возвращаются по умолчанию: вектор в ответе не нужен,
+# а его передача и разбор растут с размерностью
+DEFAULT_SOURCE_EXCLUDES = ["vector"]
+
+
+def prepare_query_vector(vector: list | np.ndarray) -> list | np.ndarray:
+    """
+    Приводит вектор запроса к формату поля vector в индексе.
+
+    При VECTOR_QUANTIZATION=byte индекс хранит int8-векторы,
+    поэтому запрос квантуется так же, как при индексации.
+    """
+    if VECTOR_QUANTIZATION == "byte":
+        if isinstance(vector, np.ndarray):
+            return np.clip(np.rint(vector * VECTOR_BYTE_SCALE), -128, 127).astype(np.int8)
+        return [max(-128, min(127, round(v * VECTOR_BYTE_SCALE))) for v in vector]
+    return vector
+
+
+class SearchQuery:
+    """
+    Параметры поискового запроса.
+
+    Parameters
+    ----------
+    vector : list | np.ndarray
+        Вектор запроса (np.ndarray - из двоичного сообщения).
+    k : int
+        Количество возвращаемых чанков (не больше SEARCH_MAX_K).
+    filters : dict, optional
+        Фильтры по полям документа: значение или список допустимых значений,
+        например {"doc_id": ["a.txt", "b.txt"]}.
+    includes : list[str], optional
+        Поля _source, которые нужно вернуть (допускаются шаблоны "*").
+    excludes : list[str], optional
+        Поля _source, которые не нужно возвращать; по умолчанию - vector.
+    min_score : float, optional
+        Чанки с меньшей оценкой не возвращаются.
+    """
+
+    __slots__ = ("vector", "k", "filters", "includes", "excludes", "min_score")
+
+    def __init__(
+        self,
+        vector: list | np.ndarray,
+        k: int = SEARCH_TOP_K,
+        filters: dict | None = None,
+        includes: list[str] | None = None,
+        excludes: list[str] | None = None,
+        min_score: float | None = SEARCH_MIN_SCORE,
+    ):
+        self.vector = vector
+        self.k = max(1, min(int(k), SEARCH_MAX_K))
+        self.filters = filters or None
+        self.includes = includes or None
+        self.excludes = DEFAULT_SOURCE_EXCLUDES if excludes is None else excludes
+        self.min_score = min_score
+
+    @classmethod
+    def from_message(cls, message: str | bytes) -> "SearchQuery":
+        """
+        Разбирает сообщение из очереди.
+
+        Сообщение - JSON-список чисел (вектор запроса), JSON-объект
+        {"vector": [...], "k": 3, "filters": {...}, "source_includes": [...],
+        "source_excludes": [...], "min_score": 0.5} или вектор в двоичном
+        формате (vector_codec.py) с теми же параметрами; отсутствующие
+        параметры берутся по умолчанию.
+
+        Raises
+        ------
+        ValueError
+            Если сообщение не содержит вектора.
+        """
+        if vector_codec.is_binary(message):
+            vector, payload = vector_codec.decode(message)
+            return cls._from_payload(vector, payload)
+        payload = json.loads(message)
+        if isinstance(payload, list):
+            return cls(payload)
+        if not isinstance(payload, dict) or not isinstance(payload.get("vector"), list):
+            raise ValueError("Сообщение должно быть вектором или объектом с полем vector")
+        return cls._from_payload(payload["vector"], payload)
+
+    @classmethod
+    def _from_payload(cls, vector: list | np.ndarray, payload: dict) -> "SearchQuery":
+        filters = payload.get("filters")
+        if filters is not None and not isinstance(filters, dict):
+            raise ValueError("filters должен быть объектом")
+        return cls(
+            vector,
+            k=payload.get("k", SEARCH_TOP_K),
+            filters=filters,
+            includes=payload.get("source_includes"),
+            excludes=payload.get("source_excludes"),
+            min_score=payload.get("min_score", SEARCH_MIN_SCORE),
+        )
+
+    def options(self) -> dict:
+        """Параметры запроса кроме вектора (для ключа кэша результатов)."""
+        return {
+            "filters": self.filters,
+            "includes": self.includes,
+            "excludes": self.excludes,
+            "min_score": self.min_score,
+        }
+
+
+def _filter_clause(filters: dict) -> dict:
+    return {
+        "bool": {
+            "filter": [
+                {"terms": {field: value}} if isinstance(value, list) else {"term": {field: value}}
+                for field, value in filters.items()
+            ]
+        }
+    }
+
+
+def build_knn_query(query: SearchQuery) -> dict:
+    """
+    Формирует тело KNN-запроса.
+
+    Фильтры передаются внутрь knn-запроса (движки faiss и lucene выбирают
+    k ближайших среди документов, прошедших фильтр). nmslib так не умеет,
+    поэтому для него фильтр применяется к найденным k чанкам, и результатов
+    может оказаться меньше k.
+
+    Параметры
+    ---------
+    query : SearchQuery
+        Параметры запроса.
+
+    Returns
+    -------
+    dict
+        Тело запроса _search.
+    """
+    vector = prepare_query_vector(query.vector)
+    if isinstance(vector, np.ndarray):
+        vector = vector.tolist()
+    knn = {"vector": vector, "k": query.k}
+    knn_query = {"knn": {"vector": knn}}
+    if query.filters:
+        if KNN_ENGINE in ("faiss", "lucene"):
+            knn["filter"] = _filter_clause(query.filters)
+        else:
+            knn_query = {"bool": {"must": [knn_query], "filter": _filter_clause(query.filters)["bool"]["filter"]}}
+
+    source = {"excludes": query.excludes}
+    if query.includes:
+        source["includes"] = query.includes
+    body = {"size": query.k, "query": knn_query, "_source": source}
+    if query.min_score is not None:
+        body["min_score"] = query.min_score
+    return body
+
+
+def _project(source: dict, query: SearchQuery) -> dict:
+    """Применяет includes и excludes к _source чанка из локального индекса."""
+    return {
+        field: value for field, value in source.items()
+        if (not query.includes or any(fnmatchcase(field, p) for p in query.includes))
+        and not any(fnmatchcase(field, p) for p in query.excludes)
+    }
+
+
+def search(query: SearchQuery) -> list[dict]:
+    """
+    Выполняет поиск ближайших чанков.
+
+    Параметры
+    ---------
+    query : SearchQuery
+        Параметры запроса.
+
+    Returns
+    -------
+    list[dict]
+        Найденные чанки (hits): _id, _score, _source, по убыванию оценки.
+    """
+    logger.info(f"Выполнение KNN-поиска: k={query.k}, фильтры={query.filters}")
+    resp = client.search(index=INDEX_NAME, body=build_knn_query(query))
+    return resp["hits"]["hits"]
+
 
 def search_knn(vector: list, k: int = 1) -> dict:
     """
@@ -23,19 +224,62 @@ def search_knn(vector: list, k: int = 1) -> dict:
     dict
         _source найденного документа.
     """
-    body = {
-        "size": k,
-        "query": {
-            "knn": {
-                "vector": {
-                    "vector": vector,
-                    "k": k,
-                }
-            }
-        }
-    }
+    return search(SearchQuery(vector, k=k))[0]["_source"]
+
+
+async def search_async(
+    batcher: SearchBatcher,
+    query: SearchQuery,
+    cache: ResultCache | None = None,
+    local_index: LocalAnnIndex | None = None,
+) -> list[dict]:
+    """
+    Асинхронный вариант search для воркера.
+
+    Запрос отправляется в составе пачки _msearch (см. search_batcher).
+    Если передан кэш результатов, повторный запрос с тем же (квантованным)
+    вектором и параметрами не доходит до OpenSearch. Если передан готовый
+    локальный ANN-индекс, поиск выполняется в процессе воркера.
+
+    Параметры
+    ---------
+    batcher : SearchBatcher
+        Микробатчер поисковых запросов.
+    query : SearchQuery
+        Параметры запроса.
+    cache : ResultCache, optional
+        Кэш результатов поиска.
+    local_index : LocalAnnIndex, optional
+        Локальный ANN-индекс; пока он не готов, поиск идет в OpenSearch.
+
+    Returns
+    -------
+    list[dict]
+        Найденные чанки (hits): _id, _score, _source, по убыванию оценки.
+    """
+    key = None
+    if cache is not None and cache.enabled:
+        key = cache.key(query.vector, query.k, query.options())
+        cached = await cache.get(key)
+        if cached is not None:
+            return cached
 
-    logger.info(f"Выполнение KNN-поиска по вектору: {vector}")
-    resp = client.search(index=INDEX_NAME, body=body)
-    return resp["hits"]["hits"][0]["_source"]
+    logger.debug(f"Выполнение KNN-поиска: размерность {len(query.vector)}, k={query.k}")
+    if local_index is not None and local_index.ready():
+        # Перебор матрицы освобождает GIL (BLAS), цикл событий не блокируется
+        hits = await asyncio.to_thread(
+            local_index.search,
+            prepare_query_vector(query.vector),
+            query.k,
+            query.filters,
+            query.min_score,
+        )
+        for hit in hits:
+            hit["_source"] = _project(hit["_source"], query)
+    else:
+        resp = await batcher.search(build_knn_query(query))
+        hits = resp["hits"]["hits"]
 
+    if key is not None:
+        await cache.put(key, hits)
+    return hits
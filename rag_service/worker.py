@@ -1,46 +1,271 @@
 """
-Воркер, читающий очереди Redis и отправляющий задачи в TaskIQ.
+Воркер, читающий очереди Redis и обрабатывающий сообщения.
+
+Цикл работает на asyncio: очереди читаются через redis.asyncio, поиск
+выполняется асинхронным клиентом OpenSearch, результаты отправляются
+пачками асинхронным HTTP-клиентом (result_sender.py). Одновременно обрабатывается не больше
+WORKER_CONCURRENCY сообщений; новое сообщение забирается из очереди,
+только когда есть свободный слот, поэтому необработанные сообщения
+остаются в Redis, а не в памяти воркера. Из какой очереди взять сообщение
+под свободный слот, решает планировщик (scheduler.py).
+
+По SIGTERM/SIGINT воркер перестает читать очереди и дожидается
+обработки уже взятых сообщений (не дольше WORKER_DRAIN_TIMEOUT).
+
+Очереди читаются из списков или потоков Redis (QUEUE_BACKEND, см. queues.py).
+С потоками воркеры масштабируются горизонтально: процессы (WORKER_PROCESSES)
+и реплики читают одну группу потребителей, сообщение подтверждается после
+доставки результата в translator_service, а сообщения упавших воркеров
+забирают оставшиеся.
 """
 
 import asyncio
-from clients.redis import get_redis_client
-from config import QUEUE_CHATS, QUEUE_EMAIL, TASKIQ_BROKER_URL
-from tasks import broker, process_vector_message
+import multiprocessing
+import signal
+import threading
+import uvicorn
+from clients.redis import get_async_redis_client
+from clients.opensearch import get_async_client
+from clients.translator_service_internal import get_async_http_client
+from config import (
+    WORKER_QUEUES,
+    WORKER_CONCURRENCY,
+    WORKER_POP_TIMEOUT,
+    WORKER_DRAIN_TIMEOUT,
+    METRICS_PORT,
+    LOCAL_ANN_ENABLED,
+    WORKER_PROCESSES,
+    QUEUE_BACKEND,
+)
+from search_batcher import SearchBatcher
+from result_cache import ResultCache
+from local_ann import LocalAnnIndex
+from result_sender import ResultSender
+from queues import QueueMessage, make_queue_source
+from scheduler import QueueScheduler
+import metrics
+from tasks import process_vector_message_async
 from logger import logger
 
 
-async def redis_poll_loop():
+class RagWorker:
+    """
+    Асинхронный воркер с ограничением числа одновременно обрабатываемых сообщений.
+
+    Parameters
+    ----------
+    concurrency : int
+        Максимальное число одновременно обрабатываемых сообщений.
+    """
+
+    def __init__(self, concurrency: int = WORKER_CONCURRENCY):
+        self.concurrency = concurrency
+        self._stopping = asyncio.Event()
+        self._slot_freed = asyncio.Event()
+        self._in_flight: set[asyncio.Task] = set()
+        # Сообщение из списка Redis уже удалено из очереди: ждать доставки
+        # результата для подтверждения имеет смысл только для потоков
+        self._ack_after_delivery = QUEUE_BACKEND == "stream"
+        self._acks: set[asyncio.Task] = set()
+
+    def stop(self):
+        """Прекращает чтение очередей; начатые сообщения дообрабатываются."""
+        if not self._stopping.is_set():
+            logger.info("Остановка воркера: ожидание обработки начатых сообщений")
+        self._stopping.set()
+        # Прерывает ожидание свободного слота в цикле чтения
+        self._slot_freed.set()
+
+    async def run(self):
+        """
+        Основной цикл чтения из очередей Redis (WORKER_QUEUES).
+        """
+        redis = get_async_redis_client()
+        # Очереди читаются без декодирования: сообщения могут быть двоичными векторами
+        queue_redis = get_async_redis_client(decode_responses=False)
+        self._source = make_queue_source(queue_redis, WORKER_QUEUES)
+        self._scheduler = QueueScheduler(self._source)
+        metrics.register("queues", self._scheduler.stats)
+        opensearch = get_async_client()
+        self._batcher = SearchBatcher(opensearch)
+        self._cache = ResultCache(redis, opensearch)
+        metrics.register("result_cache", self._cache.stats)
+        await self._cache.start()
+        self._local_index = LocalAnnIndex() if LOCAL_ANN_ENABLED else None
+        if self._local_index is not None:
+            metrics.register("local_ann", self._local_index.stats)
+            self._local_index.start()
+        self._http = get_async_http_client()
+        self._sender = ResultSender(self._http)
+        metrics.register("result_sender", self._sender.stats)
+        logger.info(
+            f"Старт цикла чтения Redis очередей: {', '.join(WORKER_QUEUES)} "
+            f"(одновременно до {self.concurrency} сообщений)"
+        )
+
+        try:
+            await self._source.start()
+            while not self._stopping.is_set():
+                # Сообщения забираются только под свободные слоты
+                while len(self._in_flight) >= self.concurrency or not self._scheduler.eligible():
+                    if self._stopping.is_set():
+                        break
+                    self._slot_freed.clear()
+                    await self._slot_freed.wait()
+                if self._stopping.is_set():
+                    break
+                try:
+                    messages = await self._scheduler.fetch(self.concurrency - len(self._in_flight))
+                except Exception as e:
+                    logger.error(f"Ошибка чтения очередей Redis: {e}")
+                    # Не занимаем Redis повторными попытками, пока он недоступен
+                    await self._wait_stopping(WORKER_POP_TIMEOUT)
+                    continue
+
+                for message in messages:
+                    task = asyncio.create_task(self._handle(message))
+                    self._in_flight.add(task)
+                    task.add_done_callback(lambda task, message=message: self._done(task, message))
+        finally:
+            await self._drain()
+            await self._sender.close()
+            if self._acks:
+                await asyncio.gather(*self._acks, return_exceptions=True)
+            await self._batcher.close()
+            await self._cache.stop()
+            if self._local_index is not None:
+                await asyncio.to_thread(self._local_index.stop)
+            await redis.aclose()
+            await queue_redis.aclose()
+            await opensearch.close()
+            await self._http.aclose()
+            logger.info("Воркер остановлен")
+
+    async def _handle(self, message: QueueMessage):
+        try:
+            delivery = await process_vector_message_async(
+                message.body, message.queue, self._batcher, self._sender, self._cache, self._local_index
+            )
+        except ValueError as e:
+            # Некорректное сообщение: повторная обработка не поможет
+            logger.error(f"Некорректное сообщение из '{message.queue}': {e}")
+            delivery = None
+        except Exception as e:
+            # Сообщение потока не подтверждается и будет обработано повторно
+            logger.error(f"Ошибка при обработке сообщения из '{message.queue}': {e}")
+            return
+        if delivery is None:
+            await self._ack(message)
+        else:
+            # Слот освобождается сразу, подтверждение ждет доставки результата
+            delivery.add_done_callback(lambda delivery, message=message: self._delivered(delivery, message))
+
+    def _delivered(self, delivery: asyncio.Future, message: QueueMessage):
+        if delivery.cancelled():
+            return
+        error = delivery.exception()
+        if not self._ack_after_delivery:
+            return
+        if error is not None and not isinstance(error, ValueError):
+            # Результат не доставлен: сообщение потока будет обработано повторно
+            return
+        task = asyncio.create_task(self._ack(message))
+        self._acks.add(task)
+        task.add_done_callback(self._acks.discard)
+
+    async def _ack(self, message: QueueMessage):
+        try:
+            await self._source.ack(message)
+        except Exception as e:
+            logger.error(f"Не удалось подтвердить сообщение из '{message.queue}': {e}")
+
+    def _done(self, task: asyncio.Task, message: QueueMessage):
+        self._in_flight.discard(task)
+        self._scheduler.done(message)
+        self._slot_freed.set()
+
+    async def _drain(self):
+        if not self._in_flight:
+            return
+        logger.info(f"Ожидание обработки {len(self._in_flight)} сообщений")
+        _, pending = await asyncio.wait(self._in_flight, timeout=WORKER_DRAIN_TIMEOUT)
+        if pending:
+            logger.warning(f"Не дождались обработки {len(pending)} сообщений, они прерваны")
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _wait_stopping(self, timeout: float):
+        try:
+            await asyncio.wait_for(self._stopping.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start_metrics_server(port: int = METRICS_PORT):
     """
-    Основной цикл чтения из двух очередей Redis (chats, email).
+    Запускает HTTP-сервер воркера (main.app: /health, /metrics) в фоновом потоке.
 
-    Каждое считанное сообщение отправляется в TaskIQ-задачу.
+    В отдельном потоке uvicorn не перехватывает сигналы, поэтому SIGTERM
+    по-прежнему останавливает воркер штатно.
     """
-    redis = get_redis_client()
-    logger.info(
-        f"Старт цикла чтения Redis очередей: {QUEUE_CHATS}, {QUEUE_EMAIL}"
-    )
+    if not port:
+        return
+    from main import app
 
-    while True:
-        msg = redis.brpop([QUEUE_CHATS, QUEUE_EMAIL], timeout=1)
-        if msg:
-            queue_name, body = msg
-            logger.info(f"Получено сообщение из Redis '{queue_name}': {body}")
-            # Вызываем функцию напрямую (она синхронная)
-            try:
-                process_vector_message(body, queue_name)
-            except Exception as e:
-                logger.error(f"Ошибка при обработке сообщения: {e}")
-        await asyncio.sleep(0.1)
+    config = uvicorn.Config(app, host="0.0.0.0", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, name="metrics-server", daemon=True).start()
+    logger.info(f"HTTP-сервер метрик воркера запущен на порту {port}")
+
+
+async def redis_poll_loop():
+    """
+    Запускает воркер и останавливает его по SIGTERM/SIGINT.
+    """
+    worker = RagWorker()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, worker.stop)
+    await worker.run()
+
+
+def _run_process(number: int):
+    # Каждый процесс отдает свои метрики на METRICS_PORT + номер процесса
+    start_metrics_server(METRICS_PORT + number if METRICS_PORT else 0)
+    asyncio.run(redis_poll_loop())
 
 
 def start_worker():
     """
     Запускает асинхронный цикл воркера.
+
+    При WORKER_PROCESSES > 1 запускает несколько процессов воркера
+    и передает им SIGTERM/SIGINT.
     """
     logger.info("Запуск воркера rag_service...")
-    asyncio.run(redis_poll_loop())
+    if WORKER_PROCESSES <= 1:
+        _run_process(0)
+        return
+
+    processes = [
+        multiprocessing.Process(target=_run_process, args=(number,), name=f"rag-worker-{number}")
+        for number in range(WORKER_PROCESSES)
+    ]
+    for process in processes:
+        process.start()
+
+    def forward(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    logger.info(f"Запущено процессов воркера: {WORKER_PROCESSES}")
+    for process in processes:
+        process.join()
 
 
 if __name__ == "__main__":
     start_worker()
-
@@ -46,3 +46,42 @@ def send_to_artemis(queue: str, body: str):
     sender = _OneShotSender(queue, body)
     Container(sender).run()
 
+
+class _BatchSender:
+    """
+    Вспомогательный класс для отправки пачки сообщений
+    по одному соединению с Artemis (по одному sender на очередь).
+    """
+
+    def __init__(self, messages: list[tuple[str, str]]):
+        self.messages = messages
+
+    def on_start(self, event):
+        """
+        Устанавливает соединение и отправляет все сообщения.
+        """
+        conn = event.container.connect(ARTEMIS_URL)
+        senders = {}
+        for queue, body in self.messages:
+            if queue not in senders:
+                senders[queue] = event.container.create_sender(conn, queue)
+            senders[queue].send(Message(body=body))
+        logger.info(
+            f"Отправка {len(self.messages)} сообщений в Artemis очереди {', '.join(senders)}"
+        )
+        conn.close()
+        event.container.stop()
+
+
+def send_many_to_artemis(messages: list[tuple[str, str]]):
+    """
+    Отправляет несколько сообщений в Artemis за одно соединение.
+
+    Параметры
+    ---------
+    messages : list[tuple[str, str]]
+        Пары (очередь, тело сообщения).
+    """
+    if messages:
+        Container(_BatchSender(messages)).run()
+
@@ -7,22 +7,31 @@ from logger import logger
 from config import INDEXER_URL
 
 
-def trigger_indexing() -> dict:
+def trigger_indexing(mode: str | None = None) -> dict:
     """
-    Отправляет HTTP-запрос в сервис indexer_service для запуска индексации.
+    Ставит задание индексации в indexer_service.
+
+    indexer_service сразу возвращает id задания; результат индексации
+    приходит позже в /result/indexer.
+
+    Parameters
+    ----------
+    mode : str, optional
+        Режим индексации: "incremental", "full" или "rebuild". По умолчанию выбирает indexer_service.
 
     Returns
     -------
     dict
-        Ответ сервера indexer_service.
+        Ответ сервера indexer_service: {"status": "accepted", "job_id": ..., "coalesced": ...}.
     """
     logger.info(f"Отправка запроса на индексацию: {INDEXER_URL}")
 
     try:
-        response = requests.post(INDEXER_URL, timeout=300)  # 5 минут таймаут для индексации
+        params = {"mode": mode} if mode else None
+        response = requests.post(INDEXER_URL, params=params, timeout=10)
         response.raise_for_status()
         data = response.json()
-        logger.info(f"Индексация завершена. Ответ сервиса: {data}")
+        logger.info(f"Задание индексации поставлено: {data}")
         return data
     except Exception as e:
         logger.error(f"Ошибка при вызове indexer_service: {e}", exc_info=True)
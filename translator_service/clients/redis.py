@@ -5,7 +5,7 @@
 """
 
 import redis
-from config import REDIS_HOST, REDIS_PORT
+from config import REDIS_HOST, REDIS_PORT, QUEUE_BACKEND, QUEUE_STREAM_MAXLEN
 from logger import logger
 
 
@@ -13,22 +13,41 @@ from logger import logger
 redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
 
 
-def push_to_queue(queue_name: str, message: str):
+def stream_key(queue_name: str) -> str:
+    """Имя потока Redis для очереди (отдельный ключ, чтобы не конфликтовать со списком)."""
+    return f"{queue_name}:stream"
+
+
+def push_to_queue(queue_name: str, message: str | bytes):
     """
     Добавляет сообщение в указанную очередь Redis.
 
+    При QUEUE_BACKEND=stream сообщение добавляется в поток Redis,
+    который rag_service читает группой потребителей.
+
     Параметры
     ---------
     queue_name : str
         Название очереди Redis.
-    message : str
-        Тело сообщения.
+    message : str | bytes
+        Тело сообщения (bytes - вектор в двоичном формате).
 
     Возвращает
     ----------
-    int
-        Новый размер списка после добавления элемента.
+    int | str
+        Новый размер списка после добавления элемента
+        или идентификатор записи потока.
     """
-    logger.info(f"Запись сообщения в очередь Redis '{queue_name}': {message}")
+    if isinstance(message, bytes):
+        logger.info(f"Запись сообщения в очередь Redis '{queue_name}': {len(message)} байт")
+    else:
+        logger.info(f"Запись сообщения в очередь Redis '{queue_name}': {message}")
+    if QUEUE_BACKEND == "stream":
+        return redis_client.xadd(
+            stream_key(queue_name),
+            {"body": message},
+            maxlen=QUEUE_STREAM_MAXLEN,
+            approximate=True,
+        )
     return redis_client.lpush(queue_name, message)
 
@@ -3,21 +3,26 @@
 и маршрутизация в соответствующие сервисы.
 """
 
-from config import QUEUE_CHATS, QUEUE_EMAIL
+import json
+from config import QUEUE_CHATS, QUEUE_EMAIL, VECTOR_WIRE_FORMAT
 from clients.redis import push_to_queue
+from vector_codec import FORMATS, encode_message, is_binary
 from logger import logger
 from clients.indexer_service_internal import trigger_indexing
 
 
-def route_message(source_queue: str, body: str) -> str:
+def route_message(source_queue: str, body: str | bytes) -> str:
     """
     Определяет тип сообщения и направляет его в нужную очередь Redis.
 
+    При VECTOR_WIRE_FORMAT=f32|f16 JSON-вектор переводится в двоичный формат
+    (vector_codec.py); сообщения, не похожие на вектор, передаются как есть.
+
     Параметры
     ---------
     source_queue : str
         Имя очереди Artemis, из которой пришло сообщение (chat.in или email.in).
-    body : str
+    body : str | bytes
         Содержимое сообщения.
 
     Возвращает
@@ -34,6 +39,11 @@ def route_message(source_queue: str, body: str) -> str:
         logger.warning(f"Неизвестная очередь Artemis: {source_queue}. Сообщение игнорируется.")
         return "ignored"
 
+    if VECTOR_WIRE_FORMAT in FORMATS and not is_binary(body):
+        encoded = encode_message(body, FORMATS[VECTOR_WIRE_FORMAT])
+        if encoded is not None:
+            body = encoded
+
     push_to_queue(redis_queue, body)
 
     logger.info(f"Сообщение направлено в Redis очередь: {redis_queue}")
@@ -47,11 +57,18 @@ def route_index_message(body: str):
     Параметры
     ---------
     body : str
-        Содержимое сообщения (может содержать параметры индексации).
+        Содержимое сообщения (может содержать параметры индексации,
+        например {"mode": "full"}).
     """
     logger.info(f"Получен запрос на индексацию: {body}")
     try:
-        trigger_indexing()
+        params = json.loads(body) if body else {}
+    except (TypeError, ValueError):
+        params = {}
+    mode = params.get("mode") if isinstance(params, dict) else None
+
+    try:
+        trigger_indexing(mode)
         logger.info("Индексация успешно запущена")
     except Exception as e:
         logger.error(f"Ошибка при запуске индексации: {e}", exc_info=True)
@@ -5,9 +5,11 @@ HTTP-маршруты сервиса translator_service.
 """
 
 import json
+from typing import Any
 from fastapi import APIRouter
+from pydantic import BaseModel, ValidationError
 from logic import route_message, route_index_message
-from clients.artemis_producer import send_to_artemis
+from clients.artemis_producer import send_to_artemis, send_many_to_artemis
 from config import (
     ARTEMIS_QUEUE_CHAT_OUT,
     ARTEMIS_QUEUE_EMAIL_OUT,
@@ -18,6 +20,17 @@ from logger import logger
 router = APIRouter()
 
 
+class RagResult(BaseModel):
+    source_queue: str
+    result: str
+
+
+class RagResultBatch(BaseModel):
+    # Элементы проверяются по отдельности: некорректный элемент попадает
+    # в errors ответа, а не отклоняет всю пачку
+    results: list[Any]
+
+
 @router.post("/ingest")
 def ingest_message(payload: dict):
     """
@@ -137,6 +150,15 @@ def process_index_direct(payload: dict = None):
     }
 
 
+def _rag_out_queue(source_queue: str) -> str | None:
+    """Возвращает очередь Artemis для результата из очереди Redis source_queue."""
+    if source_queue == "chats":
+        return ARTEMIS_QUEUE_CHAT_OUT
+    if source_queue == "email":
+        return ARTEMIS_QUEUE_EMAIL_OUT
+    return None
+
+
 @router.post("/result/rag")
 def receive_rag_result(payload: dict):
     """
@@ -162,11 +184,8 @@ def receive_rag_result(payload: dict):
     logger.info(f"Получен результат от rag_service из очереди {source_queue}: {result}")
     
     # Определяем целевую очередь Artemis
-    if source_queue == "chats":
-        out_queue = ARTEMIS_QUEUE_CHAT_OUT
-    elif source_queue == "email":
-        out_queue = ARTEMIS_QUEUE_EMAIL_OUT
-    else:
+    out_queue = _rag_out_queue(source_queue)
+    if out_queue is None:
         logger.warning(f"Неизвестная очередь-источник: {source_queue}")
         return {
             "status": "error",
@@ -182,6 +201,64 @@ def receive_rag_result(payload: dict):
     }
 
 
+@router.post("/result/rag/batch")
+def receive_rag_results(payload: RagResultBatch):
+    """
+    Принимает пачку результатов от rag_service и отправляет их в Artemis
+    за одно соединение.
+
+    Параметры
+    ---------
+    payload : RagResultBatch
+        Формат:
+        {
+            "results": [
+                {"source_queue": "chats" или "email", "result": "текст результата"},
+                ...
+            ]
+        }
+
+    Возвращает
+    ----------
+    dict
+        Статус обработки: количество отправленных результатов и ошибки
+        отдельных результатов (номер в пачке и описание).
+    """
+    results = payload.results
+    logger.info(f"Получена пачка из {len(results)} результатов от rag_service")
+
+    messages = []
+    errors = []
+    for number, item in enumerate(results):
+        try:
+            item = RagResult.model_validate(item)
+        except ValidationError as e:
+            logger.warning(f"Некорректный результат #{number} в пачке: {e}")
+            errors.append({
+                "index": number,
+                "message": f"Некорректный результат: {e.errors(include_url=False, include_input=False)}"
+            })
+            continue
+        out_queue = _rag_out_queue(item.source_queue)
+        if out_queue is None:
+            logger.warning(f"Неизвестная очередь-источник: {item.source_queue}")
+            errors.append({
+                "index": number,
+                "message": f"Неизвестная очередь-источник: {item.source_queue}"
+            })
+            continue
+        messages.append((out_queue, item.result))
+
+    # Отправляем в Artemis; при ошибке пачка целиком будет отправлена повторно
+    send_many_to_artemis(messages)
+
+    return {
+        "status": "ok",
+        "sent": len(messages),
+        "errors": errors
+    }
+
+
 @router.post("/result/indexer")
 def receive_indexer_result(payload: dict):
     """
@@ -0,0 +1,100 @@
+"""
+Двоичный формат векторов запросов в очередях Redis.
+
+Формат (все числа little-endian; совпадает с rag_service/vector_codec.py):
+
+    смещение  размер     поле
+    0         2          сигнатура b"RV"
+    2         1          версия формата (1)
+    3         1          тип элементов: 1 - float32, 2 - float16
+    4         4          размерность вектора (uint32)
+    8         dim * 4|2  элементы вектора
+    ...       остаток    необязательно: JSON-объект с параметрами запроса
+                         (k, filters, source_includes, source_excludes, min_score)
+
+translator_service только кодирует векторы, поэтому модуль обходится без NumPy.
+"""
+
+import json
+import struct
+
+MAGIC = b"RV"
+VERSION = 1
+HEADER = struct.Struct("<2sBBI")
+
+FLOAT32 = 1
+FLOAT16 = 2
+# Формат элемента для struct
+_ELEMENTS = {FLOAT32: "f", FLOAT16: "e"}
+FORMATS = {"f32": FLOAT32, "f16": FLOAT16}
+
+
+def is_binary(message: str | bytes) -> bool:
+    """Проверяет, что сообщение уже в двоичном формате."""
+    return isinstance(message, (bytes, bytearray)) and message[:2] == MAGIC
+
+
+def encode(vector: list, dtype: int = FLOAT32, options: dict | None = None) -> bytes:
+    """
+    Кодирует вектор запроса.
+
+    Параметры
+    ---------
+    vector : list
+        Вектор запроса (числа).
+    dtype : int
+        FLOAT32 или FLOAT16.
+    options : dict, optional
+        Параметры запроса, которые передаются вместе с вектором.
+
+    Возвращает
+    ----------
+    bytes
+        Сообщение в двоичном формате.
+
+    Raises
+    ------
+    struct.error
+        Если элементы вектора не числа или не помещаются в float16.
+    """
+    message = HEADER.pack(MAGIC, VERSION, dtype, len(vector))
+    message += struct.pack(f"<{len(vector)}{_ELEMENTS[dtype]}", *vector)
+    if options:
+        message += json.dumps(options, ensure_ascii=False).encode()
+    return message
+
+
+def encode_message(body: str, dtype: int = FLOAT32) -> bytes | None:
+    """
+    Переводит JSON-сообщение с вектором в двоичный формат.
+
+    Параметры
+    ---------
+    body : str
+        JSON-список чисел или объект с полем vector и параметрами запроса.
+    dtype : int
+        FLOAT32 или FLOAT16.
+
+    Возвращает
+    ----------
+    bytes | None
+        Двоичное сообщение или None, если body не похоже на вектор
+        (такое сообщение передается как есть).
+    """
+    try:
+        payload = json.loads(body)
+    except (TypeError, ValueError):
+        return None
+
+    if isinstance(payload, list):
+        vector, options = payload, None
+    elif isinstance(payload, dict) and isinstance(payload.get("vector"), list):
+        options = {key: value for key, value in payload.items() if key != "vector"}
+        vector = payload["vector"]
+    else:
+        return None
+
+    try:
+        return encode(vector, dtype, options)
+    except (struct.error, OverflowError):
+        return None